@@ -0,0 +1,160 @@
+"""Замеры запросов к сайту через WSGI-обработчик Django.
+
+Запрос проходит тот же путь, что под gunicorn: все middleware, сессии,
+кеш страниц и шаблоны, а тело ответа читается до конца. ``measure``
+считает перцентили времени и число запросов к базе, а память — в
+отдельном проходе под ``tracemalloc``: трассировка замедляет код в
+разы и испортила бы время. Результаты пишутся в JSON, ``compare``
+сравнивает два таких файла.
+"""
+import math
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.utils.http import urlencode
+
+from core.queries import capture
+
+
+def percentile(samples, fraction):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class WSGIRunner:
+    """Выполняет запросы к WSGI-приложению с заданными cookie.
+
+    С ``csrf_token`` токен кладется в cookie и отправляется заголовком
+    с каждым POST, как это делает браузер со страницы с формой.
+    """
+
+    def __init__(self, cookies=None, csrf_token=None, application=None):
+        self.application = application or WSGIHandler()
+        cookies = dict(cookies or {})
+        self.csrf_token = csrf_token
+        if csrf_token:
+            cookies[settings.CSRF_COOKIE_NAME] = csrf_token
+        self.cookie = '; '.join(
+            f'{name}={value}' for name, value in cookies.items()
+        )
+
+    def environ(self, path, query='', method='GET', body=b''):
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_ACCEPT_ENCODING': 'gzip',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': BytesIO(),
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if body:
+            environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+            environ['CONTENT_LENGTH'] = str(len(body))
+        if self.cookie:
+            environ['HTTP_COOKIE'] = self.cookie
+        if self.csrf_token and method == 'POST':
+            environ['HTTP_X_CSRFTOKEN'] = self.csrf_token
+        return environ
+
+    def __call__(self, path, query='', method='GET', data=None):
+        """Статус и размер тела ответа; ``data`` — поля формы POST."""
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(status)
+
+        body = urlencode(data or {}).encode()
+        chunks = self.application(
+            self.environ(path, query, method, body), start_response
+        )
+        try:
+            size = sum(len(chunk) for chunk in chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return int(statuses[0].split()[0]), size
+
+
+def _reset_peak():
+    """Сбрасывает пик памяти; до Python 3.9 — перезапуском трассировки."""
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+def measure(request, repeat=50, warmup=3, alloc_repeat=5):
+    """Замеряет ``request`` — функцию без аргументов, как у ``WSGIRunner``.
+
+    Прогрев не учитывается: первые запросы наполняют кеши.
+    """
+    for _ in range(warmup):
+        request()
+    times, queries = [], []
+    for _ in range(repeat):
+        with capture() as log:
+            started = time.perf_counter()
+            status, size = request()
+            times.append((time.perf_counter() - started) * 1000)
+        queries.append(log.count)
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_repeat):
+            _reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            request()
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        'status': status,
+        'bytes': size,
+        'p50_ms': round(percentile(times, 0.5), 3),
+        'p95_ms': round(percentile(times, 0.95), 3),
+        'mean_ms': round(statistics.mean(times), 3),
+        'queries': max(queries),
+        'alloc_peak_kb': round(statistics.median(peaks) / 1024, 1)
+        if peaks else None,
+        'alloc_retained_kb': round(statistics.median(retained) / 1024, 1)
+        if retained else None,
+    }
+
+
+def compare(old, new, fields=('p50_ms', 'p95_ms', 'queries')):
+    """Изменения маршрутов между двумя результатами, в процентах.
+
+    Возвращает ``{маршрут: {поле: (было, стало, процент)}}`` для
+    маршрутов, которые есть в обоих результатах.
+    """
+    changes = {}
+    for name, result in new['routes'].items():
+        before = old['routes'].get(name)
+        if before is None:
+            continue
+        changes[name] = {}
+        for field in fields:
+            was, now = before.get(field), result.get(field)
+            if was is None or now is None:
+                continue
+            delta = (now - was) / was * 100 if was else 0.0
+            changes[name][field] = (was, now, round(delta, 1))
+    return changes
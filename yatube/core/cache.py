@@ -0,0 +1,61 @@
+"""Поколения кеша для точечной инвалидации.
+
+Каждый источник данных (лента, группа, пост) имеет поколение — метку,
+которая входит в ключи зависящих от него записей кеша. Сброс поколения
+делает все такие записи недостижимыми без перебора ключей, а при
+следующем чтении источник получает новую, заведомо большую метку.
+"""
+import time
+
+from django.core.cache import cache
+
+from core import metrics
+
+KEY_PREFIX = 'generation:'
+BUMPS = 'generation.bumps'
+
+
+def _key(name):
+    return f'{KEY_PREFIX}{name}'
+
+
+def get_generations(names):
+    """Возвращает словарь {источник: поколение} за один запрос к кешу."""
+    keys = {_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    generations = {}
+    for key, name in keys.items():
+        value = found.get(key)
+        if value is None:
+            value = time.time_ns()
+            if not cache.add(key, value, None):
+                value = cache.get(key, value)
+        generations[name] = value
+    return generations
+
+
+def get_generation(name):
+    return get_generations([name])[name]
+
+
+def depend_on(request, names):
+    """Читает поколения источников и запоминает их как зависимости
+    страницы для полностраничного кеша.
+
+    Вызывать нужно до чтения данных страницы: тогда запись, случившаяся
+    во время отрисовки, сбросит поколение, и устаревшая копия страницы
+    не будет отдана.
+    """
+    generations = get_generations(names)
+    dependencies = getattr(request, 'cache_generations', {})
+    dependencies.update(generations)
+    request.cache_generations = dependencies
+    return generations
+
+
+def bump_generations(names):
+    """Сбрасывает поколения источников одним запросом к кешу."""
+    keys = [_key(name) for name in names]
+    if keys:
+        cache.delete_many(keys)
+        metrics.incr(BUMPS, len(keys))
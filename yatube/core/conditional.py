@@ -0,0 +1,100 @@
+"""Условные GET-запросы для HTML-страниц.
+
+Представление объявляет функцию свежести: она по аргументам запроса
+возвращает источники кеша (``core.cache``), от которых зависит страница,
+и время новейшей записи на ней. Из поколений источников, времени записи
+и того, что на странице зависит от посетителя, складывается ``ETag``;
+``Last-Modified`` — время новейшей записи. Если браузер или прокси
+прислали совпадающие валидаторы, ответ ``304`` уходит без отрисовки.
+
+Правка записи не меняет ее времени, зато сбрасывает поколение
+источника, поэтому свежесть по-настоящему проверяет ``ETag``, а
+``Last-Modified`` нужен клиентам, которые умеют только его. Время
+новейшей записи страхует от изменений, прошедших мимо сигналов
+(``bulk_create``, ``update()``).
+"""
+import hashlib
+import json
+import os
+from calendar import timegm
+from datetime import datetime
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from core.cache import depend_on
+
+
+@lru_cache(maxsize=None)
+def templates_version():
+    """Отпечаток файлов шаблонов: выкладка новой верстки меняет ETag."""
+    digest = hashlib.md5()
+    for engine in settings.TEMPLATES:
+        for directory in engine.get('DIRS', ()):
+            for root, _, files in sorted(os.walk(directory)):
+                for name in sorted(files):
+                    stat = os.stat(os.path.join(root, name))
+                    digest.update(
+                        f'{root}/{name}:{stat.st_mtime_ns}:{stat.st_size}'
+                        .encode()
+                    )
+    return digest.hexdigest()
+
+
+def page_etag(request, generations, newest):
+    """ETag страницы для этого посетителя.
+
+    Кроме данных, страница зависит от пользователя (шапка, кнопки
+    автора и подписки), от CSRF-куки (токен в формах) и от года в
+    подвале.
+    """
+    state = [
+        templates_version(),
+        request.user.pk,
+        request.META.get('CSRF_COOKIE'),
+        datetime.now().year,
+        sorted(generations.items()),
+        newest and newest.isoformat(),
+    ]
+    digest = hashlib.md5(json.dumps(state).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional_page(freshness):
+    """Декоратор представления: ``304`` для неизменившейся страницы.
+
+    ``freshness(request, *args, **kwargs)`` возвращает пару из
+    источников кеша страницы и времени новейшей записи (или ``None``).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            feeds, newest = freshness(request, *args, **kwargs)
+            generations = depend_on(request, feeds)
+            etag = page_etag(request, generations, newest)
+            last_modified = newest and timegm(newest.utctimetuple())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                # Форма на странице могла впервые выдать CSRF-куку:
+                # следующий запрос придет уже с ней.
+                etag = page_etag(request, generations, newest)
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            # Хранить можно, но отдавать только после проверки;
+            # страницы пользователя — только в его браузере.
+            patch_cache_control(response, no_cache=True)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,181 @@
+"""Раздача статики и медиафайлов самим приложением.
+
+Для небольших узлов без отдельного файлового сервера. Ответ — это
+``FileResponse`` над открытым файлом: gunicorn и uWSGI отдают его через
+``wsgi.file_wrapper`` системным вызовом ``sendfile`` без копирования в
+процесс, а без него файл читается кусками по ``CHUNK_SIZE``.
+
+Поддерживаются ``ETag`` и ``Last-Modified`` (ответ ``304``), один
+диапазон ``Range`` (ответ ``206``, с проверкой ``If-Range``) и заранее
+сжатые копии статики (``core.staticfiles``).
+"""
+import mimetypes
+import os
+import re
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotAllowed, HttpResponseNotFound
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+CHUNK_SIZE = 64 * 1024
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileSlice:
+    """Часть открытого файла от текущей позиции длиной ``length``.
+
+    ``fileno`` и позиция файла нужны серверу для ``sendfile``, длину
+    он берет из ``Content-Length``.
+    """
+
+    def __init__(self, handle, length):
+        self.handle = handle
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.handle.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.handle.fileno()
+
+    def close(self):
+        self.handle.close()
+
+
+def accepted_encodings(request):
+    """Кодировки из ``Accept-Encoding``, кроме запрещенных ``q=0``."""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def choose_variant(request, path, precompressed):
+    """Кодировка, путь и ``stat`` копии файла, которую стоит отдать."""
+    if precompressed:
+        accepted = accepted_encodings(request)
+        for coding, suffix in ENCODINGS:
+            if coding in accepted:
+                try:
+                    return coding, path + suffix, os.stat(path + suffix)
+                except FileNotFoundError:
+                    pass
+    return None, path, os.stat(path)
+
+
+def byte_range(request, etag, last_modified, size):
+    """Диапазон ``(начало, конец включительно)`` или ``None`` — весь файл.
+
+    Несколько диапазонов и непонятный заголовок дают весь файл, как
+    разрешает RFC 7233; диапазон за концом файла — ``ValueError``.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header or request.method != 'GET':
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        return None
+    match = BYTE_RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last or int(last) == 0 or size == 0:
+            raise ValueError(header)
+        return max(0, size - int(last)), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise ValueError(header)
+    end = min(int(last), size - 1) if last else size - 1
+    return first, end
+
+
+def locate(request, name, root, precompressed):
+    """Путь файла и выбранная копия или ``None``, если файла нет."""
+    try:
+        path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+    try:
+        return (path, *choose_variant(request, path, precompressed))
+    except FileNotFoundError:
+        return None
+
+
+def file_response(request, path, filename, coding, size, span):
+    """Ответ с файлом целиком или с диапазоном ``span``."""
+    start, end = span or (0, size - 1)
+    length = end - start + 1 if size else 0
+    status = 206 if span else 200
+    if request.method == 'HEAD':
+        response = HttpResponse(status=status)
+    else:
+        handle = open(filename, 'rb')
+        handle.seek(start)
+        response = FileResponse(FileSlice(handle, length), status=status)
+        response.block_size = CHUNK_SIZE
+    if span:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = length
+    content_type, _ = mimetypes.guess_type(path)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if coding:
+        response['Content-Encoding'] = coding
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve(request, name, root, cache_control, precompressed=False):
+    """Отдает файл ``name`` из каталога ``root``."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    found = locate(request, name, root, precompressed)
+    if found is None:
+        return HttpResponseNotFound()
+    path, coding, filename, stat = found
+    # Сжатая копия — другое представление файла со своим ETag.
+    version = f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+    etag = quote_etag(f'{version}-{coding}' if coding else version)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        try:
+            span = byte_range(request, etag, last_modified, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        response = file_response(
+            request, path, filename, coding, stat.st_size, span
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    if precompressed:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,55 @@
+"""Полнотекстовый поиск на SQLite FTS5.
+
+``FullTextField`` — колонка виртуальной таблицы FTS5 с поиском
+``field__match=...``. Пользовательский ввод в запрос FTS5 превращает
+``to_query``: каждое слово берется в кавычки, чтобы операторы и знаки
+препинания из строки поиска не ломали синтаксис.
+"""
+import re
+
+from django.db import connection, models
+from django.db.models import Lookup
+
+WORD = re.compile(r'\w+')
+MAX_TERMS = 16
+MIN_PREFIX = 3
+
+
+class Match(Lookup):
+    """``MATCH`` по колонке FTS5: поиск ограничивается этой колонкой."""
+
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class FullTextField(models.TextField):
+    """Текстовая колонка виртуальной таблицы FTS5."""
+
+
+FullTextField.register_lookup(Match)
+
+
+def available():
+    """Есть ли у базы FTS5."""
+    return connection.vendor == 'sqlite'
+
+
+def terms(query):
+    """Слова строки поиска без знаков препинания."""
+    return WORD.findall(query)[:MAX_TERMS]
+
+
+def to_query(words, prefix=False):
+    """Запрос FTS5, в котором обязательны все слова.
+
+    С ``prefix`` последнее слово ищется как начало слова, если в нем
+    не меньше ``MIN_PREFIX`` букв: так находятся другие формы слова.
+    """
+    quoted = [f'"{word}"' for word in words]
+    if prefix and quoted and len(words[-1]) >= MIN_PREFIX:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
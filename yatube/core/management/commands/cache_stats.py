@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core import metrics, tiered
+from core.cache import BUMPS
+from core.middleware import PAGE_CACHE_METRICS
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий и сбросов кеша.'
+
+    @property
+    def names(self):
+        return PAGE_CACHE_METRICS + (BUMPS,) + tuple(tiered.METRICS)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счетчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        values = metrics.snapshot(self.names)
+        for name in self.names:
+            self.stdout.write(f'{name}: {values[name]}')
+        if options['reset']:
+            metrics.reset(self.names)
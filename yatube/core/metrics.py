@@ -0,0 +1,71 @@
+"""Счетчики метрик в общем кеше.
+
+Счетчики живут в кеше по умолчанию, поэтому их видят все процессы,
+которые делят кеш, а команда ``cache_stats`` показывает их значения.
+Частые события считаются через ``count`` в памяти процесса и уходят
+в общий кеш пачкой не чаще раза в ``METRICS_FLUSH_INTERVAL`` секунд.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'metrics:'
+FLUSH_INTERVAL = 10
+
+_local = Counter()
+_lock = threading.Lock()
+_flushed = time.monotonic()
+
+
+def incr(name, delta=1):
+    """Атомарно увеличивает счетчик ``name``."""
+    key = f'{KEY_PREFIX}{name}'
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def count(name, delta=1):
+    """Увеличивает счетчик ``name`` в памяти процесса.
+
+    Накопленное переносится в общий кеш, когда с прошлого переноса
+    прошло ``METRICS_FLUSH_INTERVAL`` секунд.
+    """
+    interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', FLUSH_INTERVAL)
+    with _lock:
+        _local[name] += delta
+        due = time.monotonic() - _flushed >= interval
+    if due:
+        flush()
+
+
+def flush():
+    """Переносит счетчики процесса в общий кеш."""
+    global _flushed
+    with _lock:
+        pending = dict(_local)
+        _local.clear()
+        _flushed = time.monotonic()
+    for name, delta in pending.items():
+        incr(name, delta)
+
+
+def snapshot(names):
+    """Текущие значения счетчиков одним запросом к кешу."""
+    flush()
+    found = cache.get_many([f'{KEY_PREFIX}{name}' for name in names])
+    return {
+        name: found.get(f'{KEY_PREFIX}{name}', 0) for name in names
+    }
+
+
+def reset(names):
+    with _lock:
+        for name in names:
+            _local.pop(name, None)
+    cache.delete_many([f'{KEY_PREFIX}{name}' for name in names])
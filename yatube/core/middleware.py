@@ -0,0 +1,168 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from core import files, metrics
+from core.cache import get_generations
+from core.queries import QueryBudgetExceeded, budget_for, capture
+
+logger = logging.getLogger('yatube.queries')
+
+PAGE_CACHE_HIT = 'page_cache.hit'
+PAGE_CACHE_MISS = 'page_cache.miss'
+PAGE_CACHE_STALE = 'page_cache.stale'
+PAGE_CACHE_STORE = 'page_cache.store'
+PAGE_CACHE_METRICS = (
+    PAGE_CACHE_HIT, PAGE_CACHE_MISS, PAGE_CACHE_STALE, PAGE_CACHE_STORE
+)
+
+
+class AnonymousPageCacheMiddleware:
+    """Полностраничный кеш GET-запросов анонимных пользователей.
+
+    Страница кешируется, только если представление объявило, от каких
+    источников она зависит (``core.cache.depend_on``). Вместе с ответом
+    хранятся поколения этих источников; сигналы моделей сбрасывают
+    поколения, и копия страницы перестает совпадать, так что срок
+    хранения ``PAGE_CACHE_TIMEOUT`` нужен лишь для вытеснения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 3600)
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') or (
+            request.user.is_authenticated
+        ):
+            return self.get_response(request)
+        key = self.cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            generations = entry['generations']
+            if get_generations(generations) == generations:
+                metrics.incr(PAGE_CACHE_HIT)
+                return self.restore(entry)
+            metrics.incr(PAGE_CACHE_STALE)
+        else:
+            metrics.incr(PAGE_CACHE_MISS)
+        response = self.get_response(request)
+        if request.method == 'GET' and self.cacheable(request, response):
+            cache.set(key, self.store(request, response), self.timeout)
+            metrics.incr(PAGE_CACHE_STORE)
+        return response
+
+    @staticmethod
+    def cache_key(request):
+        url = request.build_absolute_uri().encode()
+        return f'page:{hashlib.md5(url).hexdigest()}'
+
+    @staticmethod
+    def cacheable(request, response):
+        cache_control = response.get('Cache-Control', '')
+        return (
+            getattr(request, 'cache_generations', None)
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in cache_control
+            and 'no-store' not in cache_control
+        )
+
+    @staticmethod
+    def store(request, response):
+        return {
+            'generations': request.cache_generations,
+            'status': response.status_code,
+            'content': response.content,
+            'headers': list(response.items()),
+        }
+
+    @staticmethod
+    def restore(entry):
+        response = HttpResponse(entry['content'], status=entry['status'])
+        for header, value in entry['headers']:
+            response[header] = value
+        return response
+
+
+class QueryBudgetMiddleware:
+    """Считает запросы к базе каждого запроса к сайту и следит за бюджетом.
+
+    Статистика пишется в лог ``yatube.queries`` и в заголовок
+    ``Server-Timing``. Превышение бюджета маршрута из ``QUERY_BUDGETS``
+    логируется как предупреждение, а при ``QUERY_BUDGET_RAISE``
+    превращается в ошибку ``QueryBudgetExceeded``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.raise_on_exceed = getattr(settings, 'QUERY_BUDGET_RAISE', False)
+
+    def __call__(self, request):
+        with capture() as log:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        response['Server-Timing'] = (
+            f'db;desc="{log.count} queries";dur={log.time * 1000:.1f}'
+        )
+        logger.debug('%s %s: %s', request.method, request.path,
+                     log.describe())
+        budget = budget_for(view_name) if view_name else None
+        if budget is not None and log.count > budget:
+            message = (
+                f'{view_name} exceeded its query budget of {budget}: '
+                f'{log.describe()}'
+            )
+            if self.raise_on_exceed:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class FileServingMiddleware:
+    """Раздает ``STATIC_URL`` и ``MEDIA_URL`` до сессий и авторизации.
+
+    Файлы статики с отпечатком в имени (из манифеста ``collectstatic``)
+    не меняются и кешируются на ``STATIC_MAX_AGE``, остальные браузер
+    перепроверяет по ``ETag``. Медиафайлы названы по содержимому и
+    кешируются на ``MEDIA_MAX_AGE``. Выключается ``SERVE_FILES``, если
+    файлы раздает отдельный сервер.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_FILES', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.fingerprinted = frozenset(
+            getattr(staticfiles_storage, 'hashed_files', {}).values()
+        )
+        self.static_cache = (
+            f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+        )
+        self.media_cache = f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+    def __call__(self, request):
+        path = request.path_info
+        if settings.STATIC_ROOT and path.startswith(settings.STATIC_URL):
+            name = path[len(settings.STATIC_URL):]
+            cache_control = (
+                self.static_cache if name in self.fingerprinted
+                else 'public, no-cache'
+            )
+            return files.serve(
+                request, name, settings.STATIC_ROOT, cache_control,
+                precompressed=True
+            )
+        if settings.MEDIA_ROOT and path.startswith(settings.MEDIA_URL):
+            return files.serve(
+                request, path[len(settings.MEDIA_URL):], settings.MEDIA_ROOT,
+                self.media_cache
+            )
+        return self.get_response(request)
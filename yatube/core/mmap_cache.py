@@ -0,0 +1,342 @@
+"""Кеш в отображаемом в память файле, общий для всех процессов узла.
+
+Файл разбит на наборы (sets). Ключ по хешу попадает в один набор, а в
+наборе есть несколько классов слотов разного размера с несколькими
+слотами (ways) в каждом — как в наборно-ассоциативном кеше процессора.
+Значение кладется в самый маленький класс, куда оно помещается; если
+свободного слота нет, вытесняется давно не читанный (LRU внутри набора).
+
+Каждый набор защищен своей блокировкой: ``fcntl`` между процессами и
+``threading.Lock`` между потоками одного процесса. Операции над разными
+ключами почти никогда не ждут друг друга, а чтение и запись значения
+занимают один набор на время копирования байтов.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'YTMC0001'
+# magic, число наборов, затем пары (размер слота, число слотов) классов.
+HEADER = struct.Struct('<8sI')
+CLASS = struct.Struct('<II')
+HEADER_SIZE = 4096
+# digest ключа, срок годности (0 — бессрочно), время чтения, длина.
+SLOT = struct.Struct('<16sddI')
+EMPTY = bytes(16)
+DEFAULT_SIZE = 64 * 1024 * 1024
+DEFAULT_CLASSES = ((512, 8), (4096, 4), (16384, 2), (65536, 1))
+THREAD_LOCK_STRIPES = 256
+
+
+class MmapCache(BaseCache):
+    """Бэкенд кеша Django поверх общего файла в памяти.
+
+    Параметры ``OPTIONS``:
+    ``SIZE`` — примерный размер файла в байтах;
+    ``CLASSES`` — пары (размер слота, слотов в наборе) по возрастанию.
+    Значения больше самого крупного слота не кешируются.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.classes = tuple(
+            (int(size), int(ways))
+            for size, ways in options.get('CLASSES', DEFAULT_CLASSES)
+        )
+        set_bytes = sum(size * ways for size, ways in self.classes)
+        size = int(options.get('SIZE', DEFAULT_SIZE))
+        self.sets = max(1, size // set_bytes)
+        self.set_bytes = set_bytes
+        self.max_value = self.classes[-1][0] - SLOT.size
+        self._pid = None
+        self._open_lock = threading.Lock()
+
+    # Файл и блокировки.
+
+    def _open(self):
+        if self._pid == os.getpid():
+            return
+        with self._open_lock:
+            if self._pid == os.getpid():
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            length = HEADER_SIZE + self.sets * self.set_bytes
+            fcntl.lockf(fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+            try:
+                if not self._header_matches(fd):
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, length)
+                    os.pwrite(fd, self._header(), 0)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+            self._fd = fd
+            self._map = mmap.mmap(fd, length)
+            self._thread_locks = [
+                threading.Lock() for _ in range(THREAD_LOCK_STRIPES)
+            ]
+            self._pid = os.getpid()
+
+    def _header(self):
+        header = HEADER.pack(MAGIC, self.sets)
+        for size, ways in self.classes:
+            header += CLASS.pack(size, ways)
+        return header
+
+    def _header_matches(self, fd):
+        header = self._header()
+        length = HEADER_SIZE + self.sets * self.set_bytes
+        return (
+            os.fstat(fd).st_size == length
+            and os.pread(fd, len(header), 0) == header
+        )
+
+    def _lock(self, index):
+        """Блокирует набор ``index`` для потоков и процессов."""
+        thread_lock = self._thread_locks[index % THREAD_LOCK_STRIPES]
+        thread_lock.acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, index)
+        return thread_lock
+
+    def _unlock(self, index, thread_lock):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, index)
+        thread_lock.release()
+
+    # Раскладка слотов.
+
+    def _locate(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        return digest, int.from_bytes(digest[:8], 'little') % self.sets
+
+    def _slots(self, index):
+        """Все слоты набора: (смещение, размер слота, номер класса)."""
+        offset = HEADER_SIZE + index * self.set_bytes
+        for number, (size, ways) in enumerate(self.classes):
+            for way in range(ways):
+                yield offset + way * size, size, number
+            offset += size * ways
+
+    def _find(self, digest, index, now):
+        """Смещение и заголовок живого слота с ключом или ``None``."""
+        for offset, _, _ in self._slots(index):
+            header = SLOT.unpack_from(self._map, offset)
+            if header[0] != digest:
+                continue
+            if header[1] and header[1] <= now:
+                self._map[offset:offset + SLOT.size] = bytes(SLOT.size)
+                return None
+            return offset, header
+        return None
+
+    def _read(self, digest, index, now):
+        found = self._find(digest, index, now)
+        if found is None:
+            return None
+        offset, (_, expires, _, length) = found
+        SLOT.pack_into(self._map, offset, digest, expires, now, length)
+        start = offset + SLOT.size
+        return self._map[start:start + length]
+
+    def _write(self, digest, index, payload, expires, now):
+        # Значение могло поменять класс: прежний слот освобождаем.
+        self._clear(digest, index)
+        if len(payload) > self.max_value:
+            return
+        # Свободный слот берем в любом подходящем классе, начиная с
+        # меньшего, а вытесняем только из самого маленького подходящего.
+        victim = victim_class = victim_access = None
+        for offset, size, number in self._slots(index):
+            if size - SLOT.size < len(payload):
+                continue
+            header = SLOT.unpack_from(self._map, offset)
+            if header[0] == EMPTY or (header[1] and header[1] <= now):
+                victim = offset
+                break
+            if victim_class is None:
+                victim_class = number
+            if number == victim_class and (
+                victim is None or header[2] < victim_access
+            ):
+                victim, victim_access = offset, header[2]
+        SLOT.pack_into(self._map, victim, digest, expires, now, len(payload))
+        start = victim + SLOT.size
+        self._map[start:start + len(payload)] = payload
+
+    def _clear(self, digest, index):
+        cleared = False
+        for offset, _, _ in self._slots(index):
+            if self._map[offset:offset + 16] == digest:
+                self._map[offset:offset + SLOT.size] = bytes(SLOT.size)
+                cleared = True
+        return cleared
+
+    # API кеша Django.
+
+    def _expires(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return 0.0
+        return timeout
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _group(self, keys):
+        """Группирует ключи по наборам, чтобы брать каждый замок раз."""
+        groups = {}
+        for key in keys:
+            digest, index = self._locate(key)
+            groups.setdefault(index, []).append((key, digest))
+        return groups
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._open()
+        names = {self._key(key, version): key for key in keys}
+        now = time.time()
+        raw = {}
+        for index, items in sorted(self._group(names).items()):
+            thread_lock = self._lock(index)
+            try:
+                for key, digest in items:
+                    payload = self._read(digest, index, now)
+                    if payload is not None:
+                        raw[names[key]] = payload
+            finally:
+                self._unlock(index, thread_lock)
+        return {key: pickle.loads(payload) for key, payload in raw.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._open()
+        expires = self._expires(timeout)
+        payloads = {
+            self._key(key, version): pickle.dumps(
+                value, pickle.HIGHEST_PROTOCOL
+            )
+            for key, value in data.items()
+        }
+        now = time.time()
+        for index, items in sorted(self._group(payloads).items()):
+            thread_lock = self._lock(index)
+            try:
+                for key, digest in items:
+                    if expires and expires <= now:
+                        self._clear(digest, index)
+                    else:
+                        self._write(
+                            digest, index, payloads[key], expires, now
+                        )
+            finally:
+                self._unlock(index, thread_lock)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._open()
+        key = self._key(key, version)
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        digest, index = self._locate(key)
+        now = time.time()
+        thread_lock = self._lock(index)
+        try:
+            if self._find(digest, index, now) is not None:
+                return False
+            self._write(digest, index, payload, self._expires(timeout), now)
+            return True
+        finally:
+            self._unlock(index, thread_lock)
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарное увеличение: чтение и запись под одним замком."""
+        self._open()
+        key = self._key(key, version)
+        digest, index = self._locate(key)
+        now = time.time()
+        thread_lock = self._lock(index)
+        try:
+            found = self._find(digest, index, now)
+            if found is None:
+                raise ValueError(f"Key '{key}' not found")
+            offset, (_, expires, _, length) = found
+            start = offset + SLOT.size
+            value = pickle.loads(self._map[start:start + length]) + delta
+            self._write(
+                digest, index, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                expires, now
+            )
+            return value
+        finally:
+            self._unlock(index, thread_lock)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._open()
+        key = self._key(key, version)
+        digest, index = self._locate(key)
+        now = time.time()
+        thread_lock = self._lock(index)
+        try:
+            found = self._find(digest, index, now)
+            if found is None:
+                return False
+            offset, (_, _, _, length) = found
+            SLOT.pack_into(
+                self._map, offset, digest, self._expires(timeout), now, length
+            )
+            return True
+        finally:
+            self._unlock(index, thread_lock)
+
+    def has_key(self, key, version=None):
+        self._open()
+        key = self._key(key, version)
+        digest, index = self._locate(key)
+        thread_lock = self._lock(index)
+        try:
+            return self._find(digest, index, time.time()) is not None
+        finally:
+            self._unlock(index, thread_lock)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        self._open()
+        names = [self._key(key, version) for key in keys]
+        for index, items in sorted(self._group(names).items()):
+            thread_lock = self._lock(index)
+            try:
+                for _, digest in items:
+                    self._clear(digest, index)
+            finally:
+                self._unlock(index, thread_lock)
+
+    def clear(self):
+        self._open()
+        zeros = bytes(self.set_bytes)
+        for index in range(self.sets):
+            thread_lock = self._lock(index)
+            try:
+                offset = HEADER_SIZE + index * self.set_bytes
+                self._map[offset:offset + self.set_bytes] = zeros
+            finally:
+                self._unlock(index, thread_lock)
+
+    def close(self, **kwargs):
+        """Файл остается открытым на все время жизни процесса."""
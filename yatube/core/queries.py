@@ -0,0 +1,76 @@
+"""Учет запросов к базе: число, повторы и время.
+
+``capture`` подключает ``QueryLog`` ко всем соединениям через
+``execute_wrapper``, поэтому учет работает и без ``DEBUG`` и не копит
+``connection.queries``. Бюджеты запросов задаются в настройке
+``QUERY_BUDGETS`` по имени маршрута (``posts:index``), для остальных
+маршрутов действует ``QUERY_BUDGET_DEFAULT``.
+"""
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос к сайту сделал больше запросов к базе, чем разрешено."""
+
+
+class QueryLog:
+    """Обертка выполнения запросов, которая собирает статистику.
+
+    Повторами считаются запросы с одинаковым текстом SQL без учета
+    параметров: именно так выглядит N+1 при ленивой загрузке связей.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return sum(
+            number - 1 for number in self.statements.values() if number > 1
+        )
+
+    def most_common(self, limit=5):
+        return self.statements.most_common(limit)
+
+    def describe(self):
+        lines = [
+            f'{self.count} queries, {self.duplicates} duplicates, '
+            f'{self.time * 1000:.1f} ms'
+        ]
+        for sql, number in self.most_common():
+            lines.append(f'  {number} x {sql}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def capture():
+    """Собирает статистику запросов ко всем базам внутри блока."""
+    log = QueryLog()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(log))
+        yield log
+
+
+def budget_for(view_name):
+    """Бюджет маршрута или ``None``, если он не ограничен."""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(
+        view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+    )
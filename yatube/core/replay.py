@@ -0,0 +1,113 @@
+"""Воспроизведение смеси запросов к WSGI-приложению под нагрузкой.
+
+Сценарий — список запросов (имя, метод, путь, строка запроса, поля
+формы, пользователь) делится между ``concurrency`` исполнителями:
+потоками одного процесса, как у воркера gunicorn ``gthread``, или
+процессами, как у нескольких синхронных воркеров. Каждый исполнитель
+шлет свою часть подряд, без пауз, через ``core.bench.WSGIRunner``.
+
+Ошибки блокировки SQLite (``database is locked``) превращаются
+обработчиком в ответ 500; их отличает от прочих ошибок приемник
+``got_request_exception``, который помечает текущий запрос.
+"""
+import multiprocessing
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+
+from core.bench import percentile
+
+MODES = ('thread', 'process')
+_state = threading.local()
+# Исполнители по пользователям; процессы получают их при fork.
+_runners = {}
+
+
+def is_lock_error(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def _remember(sender, request=None, **kwargs):
+    if is_lock_error(sys.exc_info()[1]):
+        _state.locked = True
+
+
+def _run(requests):
+    """Выполняет запросы подряд; отдает (имя, статус, мс, блокировка)."""
+    samples = []
+    for spec in requests:
+        _state.locked = False
+        started = time.perf_counter()
+        status, _ = _runners[spec.get('user')](
+            spec['path'], spec.get('query', ''), spec.get('method', 'GET'),
+            spec.get('data')
+        )
+        samples.append((
+            spec['name'], status, (time.perf_counter() - started) * 1000,
+            _state.locked
+        ))
+    return samples
+
+
+def _stats(samples):
+    latencies = [sample[2] for sample in samples]
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(latencies, 0.5), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'errors': sum(sample[1] >= 500 for sample in samples),
+        'lock_errors': sum(sample[3] for sample in samples),
+    }
+
+
+def summarize(samples, elapsed):
+    """Пропускная способность и хвосты задержек, всего и по именам."""
+    summary = _stats(samples)
+    summary['seconds'] = round(elapsed, 3)
+    summary['throughput_rps'] = round(len(samples) / elapsed, 1)
+    kinds = defaultdict(list)
+    for sample in samples:
+        kinds[sample[0]].append(sample)
+    summary['kinds'] = {
+        name: _stats(group) for name, group in sorted(kinds.items())
+    }
+    return summary
+
+
+def replay(requests, runners, concurrency, mode='thread'):
+    """Выполняет сценарий ``concurrency`` исполнителями и сводит итоги.
+
+    ``runners`` — ``WSGIRunner`` по имени пользователя, ``None`` — для
+    анонимных запросов.
+    """
+    if mode not in MODES:
+        raise ValueError(f'Неизвестный режим: {mode}')
+    _runners.clear()
+    _runners.update(runners)
+    parts = [requests[index::concurrency] for index in range(concurrency)]
+    got_request_exception.connect(_remember, dispatch_uid='core.replay')
+    try:
+        if mode == 'thread':
+            pool = ThreadPoolExecutor(concurrency)
+        else:
+            # Дочерние процессы не должны делить открытые соединения.
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                concurrency, mp_context=multiprocessing.get_context('fork')
+            )
+        started = time.perf_counter()
+        with pool:
+            results = list(pool.map(_run, parts))
+        elapsed = time.perf_counter() - started
+    finally:
+        got_request_exception.disconnect(dispatch_uid='core.replay')
+        _runners.clear()
+    return summarize(
+        [sample for part in results for sample in part], elapsed
+    )
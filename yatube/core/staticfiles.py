@@ -0,0 +1,78 @@
+"""Статика с отпечатками в именах и заранее сжатыми копиями.
+
+``collectstatic`` копирует файлы под именами с хешем содержимого
+(манифест ``staticfiles.json``), а текстовые файлы еще и сжимает рядом
+в ``.gz`` и, если установлен пакет ``brotli``, в ``.br``. Раздача
+(``core.files``) выбирает копию по ``Accept-Encoding`` и ничего не
+сжимает на лету.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = frozenset((
+    '.css', '.html', '.ico', '.js', '.json', '.map', '.svg', '.txt', '.xml',
+))
+# Копия, которая почти не меньше файла, не стоит лишнего чтения с диска.
+MIN_RATIO = 0.95
+
+
+def compressors():
+    """Пары (суффикс, функция сжатия) в порядке предпочтения."""
+    pairs = []
+    if brotli is not None:
+        pairs.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    pairs.append(
+        ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+    )
+    return pairs
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Манифест с отпечатками и сжатые копии текстовых файлов."""
+
+    def stored_name(self, name):
+        # Без собранной статики (разработка, тесты) ссылка ведет на
+        # исходное имя, его раздает ``runserver``.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                continue
+            for compressed in self.compress(name):
+                yield name, compressed, True
+
+    def compress(self, name):
+        """Пишет сжатые копии файла; отдает имена записанных."""
+        path = self.path(name)
+        modified = os.stat(path).st_mtime
+        data = None
+        for suffix, compress in compressors():
+            target = path + suffix
+            if os.path.exists(target) and os.stat(target).st_mtime >= modified:
+                continue
+            if data is None:
+                with open(path, 'rb') as source:
+                    data = source.read()
+            packed = compress(data)
+            if len(packed) >= len(data) * MIN_RATIO:
+                if os.path.exists(target):
+                    os.remove(target)
+                continue
+            with open(target, 'wb') as handle:
+                handle.write(packed)
+            yield name + suffix
@@ -0,0 +1,74 @@
+"""Хранилище файлов с именами по содержимому.
+
+Файл сохраняется под SHA-256 своих байтов, поэтому одинаковые загрузки
+занимают место один раз, а имя файла никогда не меняет содержимого.
+Запись идет во временный файл рядом и подменяет цель через
+``os.replace``: параллельная загрузка тех же байтов лишь перезапишет
+файл таким же.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+FILE_MODE = 0o644
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл как ``<каталог>/<ab>/<sha256>.<расширение>``.
+
+    Каталог берется из ``upload_to`` поля, расширение — из исходного
+    имени.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        hexdigest = digest.hexdigest()
+        return os.path.join(
+            directory, hexdigest[:2], f'{hexdigest}{extension}'
+        ).replace('\\', '/')
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым в ``_save``; занятое имя значит,
+        # что такой файл уже есть, и подбирать другое не нужно.
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        self.ensure(name, content)
+        return name
+
+    def ensure(self, name, content):
+        """Записывает ``content`` под готовым именем ``name``, если файла
+        еще нет; возвращает, была ли запись."""
+        if self.exists(name):
+            return False
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, 'wb') as target:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    target.write(chunk)
+            # mkstemp создает файл только для владельца.
+            os.chmod(temporary, self.file_permissions_mode or FILE_MODE)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return True
+
+
+content_storage = ContentAddressedStorage()
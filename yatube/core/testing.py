@@ -0,0 +1,21 @@
+"""Проверки бюджета запросов для тестов Django и pytest."""
+from core.queries import budget_for, capture
+
+
+def assert_query_budget(client, path, method='get', budget=None, **kwargs):
+    """Выполняет запрос клиентом и проверяет число запросов к базе.
+
+    Без явного ``budget`` берется бюджет маршрута из ``QUERY_BUDGETS``.
+    Возвращает ответ, чтобы тест мог проверить и его.
+    """
+    with capture() as log:
+        response = getattr(client, method)(path, **kwargs)
+    view_name = response.resolver_match.view_name
+    if budget is None:
+        budget = budget_for(view_name)
+    assert budget is not None, f'{view_name} has no query budget'
+    assert log.count <= budget, (
+        f'{view_name} ({method.upper()} {path}) exceeded its query budget '
+        f'of {budget}: {log.describe()}'
+    )
+    return response
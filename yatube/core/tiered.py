@@ -0,0 +1,122 @@
+"""Двухуровневый кеш для мелких и часто читаемых объектов.
+
+Первый уровень — LRU в памяти процесса с коротким сроком жизни, второй —
+общий кеш Django. Сброс ключа чистит оба уровня в текущем процессе и
+второй уровень для всех; в других процессах первый уровень доживает
+свой срок ``LOOKUP_CACHE_L1_TTL``, поэтому он выбирается коротким.
+
+Значения хранятся сериализованными, чтобы каждый вызов получал свою
+копию объекта и изменения в одном запросе не протекали в другой.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+
+L1_SIZE = 1024
+L1_TTL = 10
+L2_TIMEOUT = 60 * 60
+# Метрики всех созданных кешей, их показывает команда cache_stats.
+METRICS = []
+
+
+class LocalLRU:
+    """Потокобезопасный LRU со сроком жизни записей."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache:
+    """Кеш ``name`` из локального LRU перед общим кешем Django.
+
+    Счетчики попаданий и промахов обоих уровней копятся в процессе
+    (``metrics.count``) и пишутся в метрики ``<name>.l1.hit``,
+    ``<name>.l1.miss``, ``<name>.l2.hit``, ``<name>.l2.miss``.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.local = LocalLRU(
+            getattr(settings, 'LOOKUP_CACHE_L1_SIZE', L1_SIZE),
+            getattr(settings, 'LOOKUP_CACHE_L1_TTL', L1_TTL),
+        )
+        self.timeout = getattr(settings, 'LOOKUP_CACHE_TIMEOUT', L2_TIMEOUT)
+        self.metrics = tuple(
+            f'{name}.{tier}.{outcome}'
+            for tier in ('l1', 'l2') for outcome in ('hit', 'miss')
+        )
+        METRICS.extend(self.metrics)
+
+    def _key(self, key):
+        # slug и имена могут быть не ASCII, а ключ кеша должен им быть.
+        return f'{self.name}:{hashlib.md5(key.encode()).hexdigest()}'
+
+    def get_or_load(self, key, loader):
+        """Значение по ключу; при промахе обоих уровней зовет ``loader``.
+
+        Исключение из ``loader`` (например, ``DoesNotExist``) не
+        кешируется и передается вызывающему.
+        """
+        key = self._key(key)
+        payload = self.local.get(key)
+        if payload is not None:
+            metrics.count(f'{self.name}.l1.hit')
+            return pickle.loads(payload)
+        metrics.count(f'{self.name}.l1.miss')
+        payload = cache.get(key)
+        if payload is not None:
+            metrics.count(f'{self.name}.l2.hit')
+        else:
+            metrics.count(f'{self.name}.l2.miss')
+            payload = pickle.dumps(loader(), pickle.HIGHEST_PROTOCOL)
+            cache.set(key, payload, self.timeout)
+        self.local.set(key, payload)
+        return pickle.loads(payload)
+
+    def delete_many(self, keys):
+        keys = [self._key(key) for key in keys if key is not None]
+        for key in keys:
+            self.local.delete(key)
+        if keys:
+            cache.delete_many(keys)
+
+    def clear_local(self):
+        self.local.clear()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from posts.models import Post, Group
+from posts.search import matching
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -12,6 +13,18 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по индексу FTS5 вместо LIKE по всему тексту.
+
+        Модератору нужны все совпадения, поэтому предел кандидатов
+        публичного поиска здесь не действует.
+        """
+        if not search_term:
+            return queryset, False
+        return queryset.filter(
+            pk__in=matching(search_term).values('pk')
+        ), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     """Модель группы для отображения ее в админ панели."""
@@ -0,0 +1,150 @@
+"""JSON API лент только для чтения.
+
+Ленты те же, что у HTML-страниц, но без шаблонов: из базы читаются
+лишь поля ответа (``values()``), страницы листаются курсором.
+
+Проверка ``If-None-Match`` и ``If-Modified-Since`` идет до запроса
+страницы. ``Last-Modified`` — дата самого нового поста ленты, ``ETag``
+складывается из нее и поколений кеша ленты, которые сигналы сбрасывают
+и при правке или удалении постов. Поэтому неизменившаяся лента
+отвечает ``304`` после одного запроса по индексу; у лент группы и
+автора тот же запрос находит и саму группу или автора.
+"""
+import hashlib
+import json
+from calendar import timegm
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from django.views.decorators.http import require_safe
+
+from core.cache import get_generations
+from core.storage import content_storage
+from posts import fragments, freshness
+from posts.feeds import (
+    FOLLOW_FEED_ORDERING, follow_feed, followed_celebrities
+)
+from posts.models import Group, Post, User
+from posts.utils import CURSOR_PARAM, FEED_ORDERING, CursorPaginator
+
+LIMIT = 10
+# Время новейшего поста еще не прочитано.
+UNKNOWN = object()
+API_FIELDS = (
+    'id', 'text', 'pub_date', 'author__username', 'group__slug', 'image',
+)
+
+
+def api_view(view):
+    """Только GET и HEAD, ошибки отдаются в JSON."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404 as error:
+            return JsonResponse({'detail': str(error)}, status=404)
+    return wrapper
+
+
+def serialize(request, row):
+    image = row['image']
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': request.build_absolute_uri(
+            content_storage.url(image)
+        ) if image else None,
+    }
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    return request.build_absolute_uri(
+        f'{request.path}?{urlencode({CURSOR_PARAM: cursor})}'
+    )
+
+
+def feed_response(request, posts, feeds, ordering=FEED_ORDERING,
+                  newest=UNKNOWN):
+    """Страница ленты в JSON или ``304``, если лента не менялась.
+
+    ``newest`` — уже известное время новейшего поста ленты.
+    """
+    if newest is UNKNOWN:
+        newest = freshness.newest(posts, ordering)
+    state = json.dumps(
+        [sorted(get_generations(feeds).items()), str(newest)]
+    )
+    etag = quote_etag(hashlib.md5(state.encode()).hexdigest())
+    last_modified = newest and timegm(newest.utctimetuple())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        fields = API_FIELDS + tuple(
+            name.lstrip('-') for name in ordering
+            if name.lstrip('-') not in API_FIELDS + ('pk',)
+        )
+        paginator = CursorPaginator(posts.values(*fields), LIMIT, ordering)
+        page = paginator.get_page(request.GET.get(CURSOR_PARAM))
+        response = JsonResponse({
+            'results': [serialize(request, row) for row in page],
+            'next': _page_url(request, page.next_cursor),
+            'previous': _page_url(request, page.previous_cursor),
+        })
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@api_view
+def index(request):
+    return feed_response(request, Post.objects.all(), [fragments.INDEX])
+
+
+def _owner_or_404(model, related, **lookup):
+    row = freshness.owner_row(model, related, 'pk', **lookup)
+    if row is None:
+        raise Http404(
+            f'No {model._meta.object_name} matches the given query.'
+        )
+    return row
+
+
+@api_view
+def group_posts(request, slug):
+    group_id, newest = _owner_or_404(Group, 'group', slug=slug)
+    return feed_response(
+        request, Post.objects.filter(group_id=group_id),
+        [fragments.group_key(group_id)], newest=newest
+    )
+
+
+@api_view
+def profile(request, username):
+    user_id, newest = _owner_or_404(User, 'author', username=username)
+    return feed_response(
+        request, Post.objects.filter(author_id=user_id),
+        [fragments.profile_key(user_id)], newest=newest
+    )
+
+
+@api_view
+def follow_index(request):
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Нужно войти.'}, status=401)
+    celebrities = followed_celebrities(user)
+    feeds = [fragments.follow_key(user.pk)]
+    feeds.extend(fragments.profile_key(author) for author in celebrities)
+    return feed_response(
+        request, follow_feed(user, celebrities), feeds, FOLLOW_FEED_ORDERING
+    )
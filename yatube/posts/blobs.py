@@ -0,0 +1,138 @@
+"""Учет ссылок постов на файлы картинок и сборка мусора.
+
+Картинки лежат в ``content_storage`` под хешем содержимого, и одну
+картинку могут делить несколько постов. Сигналы постов меняют число
+ссылок в ``ImageBlob`` через ``F()``; когда ссылок не остается, после
+фиксации транзакции удаляются строка, файл и его миниатюры. Команда
+``collect_images`` сверяет ссылки с постами и убирает файлы, на которые
+нет ни одной строки, например от загрузок, чья транзакция откатилась.
+
+Хранилище не пишет файл, который уже есть, поэтому загрузка может
+застать файл, который сборка вот-вот удалит. Сборка удаляет строку и
+файл в одной транзакции, а ``acquire`` сначала берет ссылку, блокируя
+строку, и только потом проверяет файл и при нужде записывает его снова.
+"""
+import logging
+import os
+import time
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import content_storage
+from posts.models import ImageBlob, Post
+
+logger = logging.getLogger(__name__)
+IMAGE_DIRECTORY = 'posts'
+
+
+def acquire(name, content=None):
+    """Добавляет ссылку на файл ``name``.
+
+    ``content`` — только что загруженные байты файла: если сборка успела
+    удалить файл, он записывается снова.
+    """
+    if not name:
+        return
+    with transaction.atomic():
+        # UPDATE первым: он ждет сборку, которая удаляет эту строку.
+        if not ImageBlob.objects.filter(name=name).update(
+            refs=F('refs') + 1
+        ):
+            _, created = ImageBlob.objects.get_or_create(
+                name=name, defaults={'refs': 1}
+            )
+            if not created:
+                ImageBlob.objects.filter(name=name).update(
+                    refs=F('refs') + 1
+                )
+        if content is not None:
+            content_storage.ensure(name, content)
+
+
+def release(name):
+    """Снимает ссылку на файл; последняя ссылка уносит и сам файл."""
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1
+    )
+    transaction.on_commit(lambda: collect(name))
+
+
+def remove_file(name):
+    """Удаляет файл картинки вместе с миниатюрами и записями sorl."""
+    try:
+        delete_thumbnails(ImageFile(name, content_storage))
+    except SuspiciousFileOperation:
+        logger.warning('Image %s is outside of the media storage', name)
+
+
+def collect(name):
+    """Удаляет файл, если ссылок на него не осталось.
+
+    Строка удаляется условием ``refs = 0``: если файл успели загрузить
+    снова, ссылка уже есть, строка остается, и файл не трогается. Файл
+    удаляется до фиксации, пока ``acquire`` ждет строку.
+    """
+    with transaction.atomic():
+        deleted, _ = ImageBlob.objects.filter(name=name, refs=0).delete()
+        if deleted:
+            remove_file(name)
+    return bool(deleted)
+
+
+def _stored_files(directory):
+    """Имена всех файлов каталога хранилища с подкаталогами."""
+    directories, files = content_storage.listdir(directory)
+    for file_name in files:
+        yield f'{directory}/{file_name}'
+    for subdirectory in directories:
+        yield from _stored_files(f'{directory}/{subdirectory}')
+
+
+def reconcile_refs():
+    """Сверяет число ссылок с постами; возвращает число исправлений."""
+    actual = dict(
+        Post.objects.exclude(image='').order_by().values(
+            'image'
+        ).annotate(total=Count('pk')).values_list('image', 'total')
+    )
+    fixed = 0
+    for blob in ImageBlob.objects.iterator():
+        refs = actual.pop(blob.name, 0)
+        if blob.refs != refs:
+            ImageBlob.objects.filter(name=blob.name).update(refs=refs)
+            fixed += 1
+    ImageBlob.objects.bulk_create(
+        ImageBlob(name=name, refs=refs) for name, refs in actual.items()
+    )
+    return fixed + len(actual)
+
+
+def reconcile(min_age=60 * 60):
+    """Сверяет ссылки с постами и удаляет картинки без ссылок.
+
+    Файлы без строки удаляются, только если они старше ``min_age``
+    секунд, чтобы не задеть загрузку, чья транзакция еще идет.
+    Возвращает число исправленных строк и число удаленных файлов.
+    """
+    fixed = reconcile_refs()
+    removed = sum(
+        collect(name) for name in ImageBlob.objects.filter(
+            refs=0
+        ).values_list('name', flat=True)
+    )
+    if not content_storage.exists(IMAGE_DIRECTORY):
+        return fixed, removed
+    known = set(ImageBlob.objects.values_list('name', flat=True))
+    deadline = time.time() - min_age
+    for name in _stored_files(IMAGE_DIRECTORY):
+        path = content_storage.path(name)
+        if name not in known and os.path.getmtime(path) < deadline:
+            remove_file(name)
+            removed += 1
+    return fixed, removed
@@ -0,0 +1,115 @@
+"""Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики меняются атомарно через ``F()`` в сигналах моделей, а команда
+``reconcile_counters`` сверяет их с реальными данными, если они разошлись.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+BATCH_SIZE = 500
+
+
+def add(model, pk, field, delta):
+    """Атомарно прибавляет ``delta`` к счетчику строки.
+
+    Счетчик не уходит ниже нуля, даже если успел разойтись с данными.
+    """
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    return rows.update(**{field: F(field) + delta})
+
+
+def add_user(user_id, field, delta):
+    """Меняет счетчик пользователя, создавая строку счетчиков при нужде.
+
+    Уменьшение при отсутствии строки пропускается: так бывает, когда
+    удаляется сам пользователь и его счетчики уже удалены каскадом.
+    """
+    if not add(UserCounters, user_id, field, delta) and delta > 0:
+        # Сигналы срабатывают после записи, поэтому подсчет уже точный.
+        reconcile_users(User.objects.filter(pk=user_id))
+
+
+def for_user(user):
+    """Счетчики пользователя; при отсутствии строка создается."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        reconcile_users(User.objects.filter(pk=user.pk))
+        return UserCounters.objects.get(pk=user.pk)
+
+
+def _actual(queryset, field):
+    """Подзапрос с числом строк, ссылающихся на внешний объект."""
+    counted = queryset.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted), Value(0))
+
+
+def _fix(queryset, actual):
+    """Переписывает разошедшиеся счетчики; возвращает число исправлений."""
+    drifted = queryset.annotate(
+        **{f'actual_{name}': value for name, value in actual.items()}
+    )
+    fixed = 0
+    batch = []
+    model = queryset.model
+    for row in drifted.iterator():
+        changed = False
+        for name in actual:
+            value = getattr(row, f'actual_{name}')
+            if getattr(row, name) != value:
+                setattr(row, name, value)
+                changed = True
+        if changed:
+            batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_update(batch, list(actual))
+            fixed += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, list(actual))
+        fixed += len(batch)
+    return fixed
+
+
+def reconcile_groups(queryset=None):
+    if queryset is None:
+        queryset = Group.objects.all()
+    return _fix(queryset, {'posts_count': _actual(Post.objects, 'group')})
+
+
+def reconcile_posts(queryset=None):
+    if queryset is None:
+        queryset = Post.objects.all()
+    return _fix(
+        queryset.only('pk', 'comments_count'),
+        {'comments_count': _actual(Comment.objects, 'post')}
+    )
+
+
+def reconcile_users(queryset=None):
+    if queryset is None:
+        queryset = User.objects.all()
+    missing = queryset.filter(counters__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=pk) for pk in missing.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    return _fix(
+        UserCounters.objects.filter(user__in=queryset.values('pk')),
+        {
+            'posts_count': _actual(Post.objects, 'author'),
+            'followers_count': _actual(Follow.objects, 'author'),
+            'following_count': _actual(Follow.objects, 'user'),
+        }
+    )
@@ -0,0 +1,339 @@
+"""Лента подписок: гибрид раскладки при записи и подмешивания при чтении.
+
+Посты обычных авторов раскладываются по материализованным лентам
+подписчиков (``Timeline``). Посты популярных авторов (``CelebrityAuthor``)
+не раскладываются — их читают напрямую по индексу автора и сливают
+с материализованной лентой по дате публикации.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Func, IntegerField, Subquery
+
+from posts.models import CelebrityAuthor, Follow, Post, Timeline, User
+
+BATCH_SIZE = 500
+FOLLOW_FEED_ORDERING = ('-feed_date', '-feed_post')
+
+
+def _bulk_add(entries):
+    Timeline.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def has_more_followers(author_id, limit):
+    """Проверяет, что подписчиков больше ``limit``, не считая их всех."""
+    return Follow.objects.filter(
+        author_id=author_id
+    ).values('pk')[limit:limit + 1].exists()
+
+
+def is_celebrity(author_id):
+    return CelebrityAuthor.objects.filter(author_id=author_id).exists()
+
+
+def push_followers(author_id):
+    """Подписчики, в ленты которых раскладываются посты автора.
+
+    Популярным авторам посты не раскладываются, для них список пуст.
+    Автор, у которого подписчиков больше порога, тут же отмечается
+    популярным, поэтому список не длиннее ``FEED_CELEBRITY_FOLLOWERS``.
+    """
+    if is_celebrity(author_id):
+        return []
+    threshold = settings.FEED_CELEBRITY_FOLLOWERS
+    followers = list(Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)[:threshold + 1])
+    if len(followers) > threshold:
+        # Подписки пришли в обход сигналов, а mark_celebrities еще не
+        # запускали: отмечаем автора, как это сделал бы follow_added.
+        CelebrityAuthor.objects.get_or_create(author_id=author_id)
+        return []
+    return followers
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Возвращает подписчиков, чьи ленты изменились.
+    """
+    followers = push_followers(post.author_id)
+    for start in range(0, len(followers), BATCH_SIZE):
+        _bulk_add([
+            Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+            for user_id in followers[start:start + BATCH_SIZE]
+        ])
+    return followers
+
+
+def backfill_follow(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    batch = []
+    for post_id, pub_date in posts.iterator():
+        batch.append(
+            Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        )
+        if len(batch) >= BATCH_SIZE:
+            _bulk_add(batch)
+            batch = []
+    if batch:
+        _bulk_add(batch)
+
+
+def prune_follow(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    Timeline.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def follow_added(user_id, author_id):
+    """Обновляет ленты после новой подписки."""
+    if is_celebrity(author_id):
+        return
+    threshold = settings.FEED_CELEBRITY_FOLLOWERS
+    if has_more_followers(author_id, threshold):
+        # Старые записи в лентах остаются, при чтении они отфильтруются.
+        CelebrityAuthor.objects.get_or_create(author_id=author_id)
+        return
+    backfill_follow(user_id, author_id)
+
+
+def follow_removed(user_id, author_id):
+    """Обновляет ленты после отписки."""
+    prune_follow(user_id, author_id)
+    threshold = settings.FEED_CELEBRITY_FOLLOWERS
+    # Гистерезис: автор возвращается к раскладке, только когда подписчиков
+    # стало заметно меньше порога, чтобы не пересобирать ленты туда-обратно.
+    if not is_celebrity(author_id) or has_more_followers(
+        author_id, threshold // 2
+    ):
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for follower_id in followers.iterator():
+        backfill_follow(follower_id, author_id)
+    CelebrityAuthor.objects.filter(author_id=author_id).delete()
+
+
+def mark_celebrities():
+    """Отмечает популярными авторов, у которых подписчиков больше порога.
+
+    Сигналы подписок делают это по одной; здесь — для подписок,
+    загруженных в обход сигналов. Возвращает число новых отметок.
+    """
+    authors = Follow.objects.order_by().values('author').annotate(
+        total=Count('pk')
+    ).filter(
+        total__gt=settings.FEED_CELEBRITY_FOLLOWERS,
+        author__celebrity__isnull=True
+    ).values_list('author', flat=True)
+    marked = [CelebrityAuthor(author_id=pk) for pk in authors]
+    CelebrityAuthor.objects.bulk_create(
+        marked, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    return len(marked)
+
+
+def rebuild_timeline(user_id):
+    """Собирает ленту пользователя заново по его подпискам."""
+    Timeline.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(
+        user_id=user_id,
+        author__celebrity__isnull=True
+    ).values_list('author_id', flat=True)
+    for author_id in authors:
+        backfill_follow(user_id, author_id)
+
+
+def rebuild_timelines(user_ids):
+    """Пересобирает ленты пользователей одним ``INSERT ... SELECT``.
+
+    То же, что ``rebuild_timeline`` для каждого, но строки лент не
+    проходят через процесс: для данных, загруженных в обход сигналов.
+    """
+    Timeline.objects.filter(user_id__in=user_ids).delete()
+    # Условие на посты в том же filter(): иначе Django присоединил бы
+    # их второй раз и размножил строки.
+    entries = Follow.objects.filter(
+        user_id__in=user_ids,
+        author__celebrity__isnull=True,
+        author__posts__isnull=False
+    ).order_by().values_list(
+        'user_id', 'author__posts__id', 'author__posts__pub_date'
+    )
+    select, params = entries.query.sql_with_params()
+    columns = ', '.join(
+        Timeline._meta.get_field(name).column
+        for name in ('user', 'post', 'pub_date')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Timeline._meta.db_table} ({columns}) {select}',
+            params
+        )
+
+
+class MergedFeed:
+    """Слияние нескольких упорядоченных выборок в одну ленту.
+
+    Поддерживает ту часть интерфейса QuerySet, которая нужна
+    ``Paginator``, ``CursorPaginator``, шаблонам и API: фильтрацию,
+    сортировку, ``values()``, срезы и подсчет. Каждая выборка читается
+    по своему индексу не дальше нужного среза.
+
+    ``anchor`` — выборка ровно из одной строки (пользователь ленты): к
+    ней ``newest`` и ``count`` подставляют начала и размеры всех выборок
+    подзапросами, чтобы прочитать их одним запросом.
+    """
+
+    ordered = True
+
+    def __init__(self, *querysets, ordering=FOLLOW_FEED_ORDERING,
+                 anchor=None):
+        self.querysets = tuple(
+            queryset.order_by(*ordering) for queryset in querysets
+        )
+        self.ordering = tuple(ordering)
+        self.anchor = anchor
+
+    def _clone(self, method, *args, **kwargs):
+        return MergedFeed(
+            *(
+                getattr(queryset, method)(*args, **kwargs)
+                for queryset in self.querysets
+            ),
+            ordering=self.ordering,
+            anchor=self.anchor
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._clone('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._clone('exclude', *args, **kwargs)
+
+    def order_by(self, *ordering):
+        return MergedFeed(
+            *self.querysets, ordering=ordering, anchor=self.anchor
+        )
+
+    def _per_stream(self, subqueries):
+        """Значения подзапросов по выборкам одной строкой ``anchor``."""
+        aliases = [f'stream_{index}' for index in range(len(subqueries))]
+        return self.anchor.annotate(**{
+            alias: Subquery(subquery)
+            for alias, subquery in zip(aliases, subqueries)
+        }).values_list(*aliases).first() or ()
+
+    def newest(self):
+        """Первое значение первого поля сортировки во всей ленте."""
+        name = self.ordering[0].lstrip('-')
+        if self.anchor is None:
+            heads = [
+                row[name] for queryset in self.querysets
+                for row in queryset.values(name)[:1]
+            ]
+        else:
+            heads = [
+                value for value in self._per_stream([
+                    queryset.values(name)[:1] for queryset in self.querysets
+                ]) if value is not None
+            ]
+        if not heads:
+            return None
+        return max(heads) if self.ordering[0].startswith('-') else min(heads)
+
+    def values(self, *fields):
+        return self._clone('values', *fields)
+
+    def count(self):
+        if self.anchor is None:
+            return sum(queryset.count() for queryset in self.querysets)
+        # COUNT как обычная функция: Django не добавит GROUP BY.
+        total = Func(F('pk'), function='COUNT', output_field=IntegerField())
+        return sum(value or 0 for value in self._per_stream([
+            queryset.order_by().annotate(stream_total=total).values(
+                'stream_total'
+            )
+            for queryset in self.querysets
+        ]))
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def _merge(self, streams):
+        fields = tuple(name.lstrip('-') for name in self.ordering)
+
+        def key(obj):
+            if isinstance(obj, dict):
+                return tuple(obj[name] for name in fields)
+            return tuple(getattr(obj, name) for name in fields)
+
+        return heapq.merge(
+            *streams,
+            key=key,
+            reverse=self.ordering[0].startswith('-')
+        )
+
+    def __iter__(self):
+        return self._merge(self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self[key:key + 1])[0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            return list(islice(self, start, None))
+        return list(islice(
+            self._merge(queryset[:stop] for queryset in self.querysets),
+            start, stop
+        ))
+
+
+def followed_celebrities(user):
+    """Популярные авторы, на которых подписан пользователь."""
+    return list(CelebrityAuthor.objects.filter(
+        author__following__user=user
+    ).values_list('author_id', flat=True))
+
+
+def follow_feed(user, celebrities=None):
+    """Посты ленты подписок пользователя.
+
+    Посты обычных авторов читаются из материализованной ленты, посты
+    популярных — по индексу автора, и оба потока сливаются по дате.
+    """
+    pushed = Post.objects.filter(
+        timeline_entries__user=user
+    ).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    ).select_related('author', 'group')
+    if celebrities is None:
+        celebrities = followed_celebrities(user)
+    if not celebrities:
+        return pushed.order_by(*FOLLOW_FEED_ORDERING)
+    pulled = Post.objects.filter(
+        author_id__in=celebrities
+    ).annotate(
+        feed_date=F('pub_date'),
+        feed_post=F('pk'),
+    ).select_related('author', 'group')
+    return MergedFeed(
+        pushed.exclude(author_id__in=celebrities),
+        pulled,
+        anchor=User.objects.filter(pk=user.pk)
+    )
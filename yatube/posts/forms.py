@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from posts.images import prepare_upload
 from posts.models import Post, Comment
 
 
@@ -16,6 +18,13 @@ class PostForm(forms.ModelForm):
 
         return data
 
+    def clean_image(self):
+        """Заменяет новую картинку ее каноническим оригиналом."""
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        return prepare_upload(image)
+
 
 class CommentForm(forms.ModelForm):
     """Форма создания комментария."""
@@ -0,0 +1,65 @@
+"""Ключи фрагментного кеша лент и их инвалидация.
+
+Ключ фрагмента складывается из поколений лент, от которых он зависит,
+и из номера страницы или курсора. Сигналы моделей сбрасывают поколения,
+поэтому закешированные страницы не переживают изменений в данных.
+"""
+from core.cache import bump_generations, depend_on
+from posts.utils import CURSOR_PARAM
+
+INDEX = 'feed:index'
+# Рейтинг обсуждаемого и похожие посты пересчитывают команды.
+HOT = 'feed:hot'
+RELATED = 'posts:related'
+
+
+def group_key(group_id):
+    return f'feed:group:{group_id}'
+
+
+def profile_key(user_id):
+    return f'feed:profile:{user_id}'
+
+
+def follow_key(user_id):
+    return f'feed:follow:{user_id}'
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def fragment_key(request, feeds):
+    """Ключ фрагмента страницы для набора лент, от которых она зависит.
+
+    Ленты заодно записываются в зависимости всей страницы.
+    """
+    generations = depend_on(request, feeds)
+    parts = [f'{name}@{generations[name]}' for name in sorted(generations)]
+    parts.append(f'page={request.GET.get("page", "")}')
+    parts.append(f'{CURSOR_PARAM}={request.GET.get(CURSOR_PARAM, "")}')
+    return '|'.join(parts)
+
+
+def post_feeds(post, followers=(), old_group_id=None):
+    """Ленты, на которых виден пост."""
+    feeds = {INDEX, profile_key(post.author_id), post_key(post.pk)}
+    for group_id in (post.group_id, old_group_id):
+        if group_id:
+            feeds.add(group_key(group_id))
+    feeds.update(follow_key(user_id) for user_id in followers)
+    return feeds
+
+
+def invalidate(feeds):
+    bump_generations(sorted(feeds))
+
+
+def follow_feeds(follow):
+    """Страницы, которые меняет подписка: лента подписчика и счетчики
+    подписок в профилях обоих пользователей."""
+    return {
+        follow_key(follow.user_id),
+        profile_key(follow.user_id),
+        profile_key(follow.author_id),
+    }
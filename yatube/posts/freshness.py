@@ -0,0 +1,109 @@
+"""Свежесть HTML-страниц для условных GET-запросов.
+
+Каждая функция принимает аргументы своего представления и возвращает
+источники кеша страницы (``posts.fragments``) и время новейшего поста
+или комментария на ней. Время читается по индексу ленты, источники —
+одним запросом к кешу (``core.conditional``).
+"""
+from django.db.models import OuterRef, Subquery
+
+from posts import fragments
+from posts.feeds import (
+    FOLLOW_FEED_ORDERING, MergedFeed, follow_feed, followed_celebrities
+)
+from posts.lookups import get_group_or_404, get_user_or_404
+from posts.models import Comment, Group, Post
+from posts.utils import FEED_ORDERING
+
+
+def newest(posts, ordering=FEED_ORDERING):
+    """Время первой записи ленты в ее порядке."""
+    if isinstance(posts, MergedFeed):
+        return posts.order_by(*ordering).newest()
+    fields = [name.lstrip('-') for name in ordering]
+    rows = list(posts.order_by(*ordering).values(*fields)[:1])
+    return rows[0][fields[0]] if rows else None
+
+
+def owner_row(model, related, *fields, **lookup):
+    """Поля владельца ленты (группы, автора) и время его новейшего поста
+    одним запросом; ``None``, если такой строки нет."""
+    last_post = Post.objects.filter(
+        **{related: OuterRef('pk')}
+    ).order_by(*FEED_ORDERING).values('pub_date')[:1]
+    return model.objects.filter(**lookup).annotate(
+        last_post=Subquery(last_post)
+    ).values_list(*fields, 'last_post').first()
+
+
+def index(request):
+    return [fragments.INDEX], newest(Post.objects.all())
+
+
+def group_posts(request, slug):
+    """Число постов группы из ее строки остается представлению.
+
+    Группа из кеша поиска может отставать, поэтому число читается тем
+    же запросом, что и время новейшего поста.
+    """
+    group = get_group_or_404(slug)
+    row = owner_row(Group, 'group', 'posts_count', pk=group.pk)
+    request.group_posts_count, last = row or (None, None)
+    return [fragments.group_key(group.pk)], last
+
+
+def profile(request, username):
+    user = get_user_or_404(username)
+    return [fragments.profile_key(user.pk)], newest(user.posts.all())
+
+
+def follow_index(request):
+    """Список популярных авторов остается представлению на запросе."""
+    user = request.user
+    celebrities = followed_celebrities(user)
+    request.followed_celebrities = celebrities
+    feed = follow_feed(user, celebrities)
+    feeds = [fragments.follow_key(user.pk)]
+    feeds.extend(fragments.profile_key(author) for author in celebrities)
+    return feeds, newest(feed, FOLLOW_FEED_ORDERING)
+
+
+def _post_row(post_id, *fields):
+    """Поля поста и время его последнего комментария по индексу."""
+    last_comment = Comment.objects.filter(post=OuterRef('pk')).order_by(
+        '-created', '-id'
+    ).values('created')[:1]
+    rows = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).order_by().values_list(*fields, 'last_comment')[:1]
+    return rows[0] if rows else None
+
+
+def post_detail(request, post_id):
+    """Пост, его комментарии, группа и автор и похожие посты."""
+    row = _post_row(post_id, 'author_id', 'group_id', 'pub_date')
+    if row is None:
+        return [fragments.post_key(post_id)], None
+    author_id, group_id, pub_date, last_comment = row
+    feeds = [
+        fragments.post_key(post_id),
+        fragments.profile_key(author_id),
+        fragments.RELATED,
+    ]
+    if group_id:
+        feeds.append(fragments.group_key(group_id))
+    return feeds, max(filter(None, (pub_date, last_comment)))
+
+
+def post_comments(request, post_id):
+    row = _post_row(post_id, 'pk')
+    return [fragments.post_key(post_id)], row and row[1]
+
+
+def hot(request):
+    """Рейтинг меняет команда, а тексты постов — их правки."""
+    return [fragments.HOT, fragments.INDEX], None
+
+
+def search(request):
+    return [fragments.INDEX], newest(Post.objects.all())
@@ -0,0 +1,103 @@
+"""Лента обсуждаемого: посты по скорости комментариев и свежести.
+
+Пост и каждый комментарий к нему дают вклад, который затухает вдвое за
+``HOT_FEED_HALF_LIFE`` секунд; рейтинг поста — сумма вкладов. Чтобы не
+пересчитывать все рейтинги с ходом времени, хранится логарифм суммы
+``exp((t - EPOCH) / tau)``: все вклады затухают одинаково, поэтому
+порядок по нему совпадает с порядком по текущей сумме, а новый
+комментарий только прибавляется к рейтингу своего поста.
+
+Команда ``update_hot_posts`` заводит рейтинг новым постам и учитывает
+комментарии после последнего учтенного. Удаленные комментарии из
+рейтинга не вычитаются, их убирает полный пересчет.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from posts import fragments
+from posts.models import Comment, HotPost, Post
+
+HOT_ORDERING = ('-hot_score', '-hot_post')
+EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+BATCH_SIZE = 500
+
+
+def _exponent(moment, weight):
+    """Логарифм вклада с весом ``weight``, сделанного в ``moment``."""
+    tau = settings.HOT_FEED_HALF_LIFE / math.log(2)
+    return math.log(weight) + (moment - EPOCH).total_seconds() / tau
+
+
+def _log_add(score, exponent):
+    """``log(exp(score) + exp(exponent))`` без переполнения."""
+    high, low = max(score, exponent), min(score, exponent)
+    return high + math.log1p(math.exp(low - high))
+
+
+def hot_posts():
+    """Посты с рейтингом; сортировка ``HOT_ORDERING`` идет по индексу."""
+    return Post.objects.filter(hot__isnull=False).annotate(
+        hot_score=F('hot__score'), hot_post=F('hot__post')
+    )
+
+
+def _add_comments(entry, exponents, last_comment_id):
+    for exponent in exponents:
+        entry.score = _log_add(entry.score, exponent)
+    entry.last_comment_id = last_comment_id
+
+
+def update(full=False):
+    """Заводит рейтинг новым постам и учитывает новые комментарии.
+
+    Возвращает число новых постов и учтенных комментариев.
+    """
+    with transaction.atomic():
+        if full:
+            HotPost.objects.all().delete()
+        watermark = HotPost.objects.aggregate(
+            last=Max('last_comment_id')
+        )['last'] or 0
+        exponents = defaultdict(list)
+        last_comment = {}
+        counted = 0
+        comments = Comment.objects.filter(pk__gt=watermark).order_by(
+            'pk'
+        ).values_list('pk', 'post_id', 'created')
+        for pk, post_id, created in comments.iterator():
+            exponents[post_id].append(
+                _exponent(created, settings.HOT_FEED_COMMENT_WEIGHT)
+            )
+            last_comment[post_id] = pk
+            counted += 1
+        fresh = []
+        for pk, pub_date in Post.objects.filter(
+            hot__isnull=True
+        ).order_by().values_list('pk', 'pub_date').iterator():
+            entry = HotPost(post_id=pk, score=_exponent(pub_date, 1))
+            if pk in exponents:
+                _add_comments(entry, exponents.pop(pk), last_comment[pk])
+            fresh.append(entry)
+        HotPost.objects.bulk_create(fresh, batch_size=BATCH_SIZE)
+        # Остались комментарии к постам, у которых рейтинг уже был.
+        post_ids = list(exponents)
+        for start in range(0, len(post_ids), BATCH_SIZE):
+            entries = HotPost.objects.in_bulk(
+                post_ids[start:start + BATCH_SIZE]
+            ).values()
+            for entry in entries:
+                _add_comments(
+                    entry, exponents[entry.pk], last_comment[entry.pk]
+                )
+            HotPost.objects.bulk_update(
+                entries, ['score', 'last_comment_id']
+            )
+    if fresh or counted:
+        fragments.invalidate({fragments.HOT})
+    return len(fresh), counted
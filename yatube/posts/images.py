@@ -0,0 +1,102 @@
+"""Подготовка загруженных картинок постов.
+
+Вместо присланного файла хранится канонический оригинал: не больше
+``IMAGE_MAX_SIDE`` по большей стороне, с примененным поворотом из EXIF
+и без метаданных. Проверки размера файла и числа пикселей идут до
+декодирования, а сама картинка декодируется сразу уменьшенной:
+JPEG через ``draft`` (масштаб 1/2–1/8 прямо в декодере), остальные
+форматы через ``reduce``, который дешевле полного ресемплинга.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+DECODED_MODES = ('RGB', 'RGBA', 'L', 'LA', 'CMYK')
+TRANSPARENT_MODES = ('RGBA', 'LA')
+ORIENTATION = 0x0112
+
+
+def check_limits(file_):
+    """Открывает картинку по заголовку и проверяет лимиты загрузки."""
+    if file_.size > settings.FILE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.FILE_UPLOAD_MAX_SIZE)},
+        )
+    file_.seek(0)
+    try:
+        image = Image.open(file_)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image'
+        )
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)d мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+    return image
+
+
+def fit(size, side):
+    """Размер, вписанный в квадрат ``side`` с сохранением пропорций."""
+    width, height = size
+    scale = min(1, side / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def decode(image, side):
+    """Декодирует картинку не крупнее ``side`` по большей стороне."""
+    target = fit(image.size, side)
+    # Для JPEG декодер сам уменьшает картинку в 2, 4 или 8 раз, не
+    # опускаясь ниже ``target``; у других форматов вызов ничего не делает.
+    image.draft('RGB', target)
+    if image.mode not in DECODED_MODES:
+        # Палитру и 16-битные режимы ``reduce`` не умеет.
+        transparent = 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+    factor = min(image.width // target[0], image.height // target[1])
+    if factor > 1:
+        image = image.reduce(factor)
+    image.thumbnail((side, side), Image.LANCZOS)
+    # Поворачиваем уже уменьшенную картинку: копия выходит маленькой.
+    if image.getexif().get(ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    return image
+
+
+def canonical(image):
+    """Кодирует картинку в JPEG или, если есть прозрачность, в PNG.
+
+    Метаданные не переносятся, кроме цветового профиля.
+    """
+    buffer = io.BytesIO()
+    if image.mode in TRANSPARENT_MODES:
+        # PNG иначе перенесет EXIF из ``image.info``, JPEG так не делает.
+        image.save(buffer, 'PNG', optimize=True, exif=b'')
+        return buffer.getvalue(), 'png'
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(
+        buffer, 'JPEG',
+        quality=settings.IMAGE_JPEG_QUALITY,
+        optimize=True,
+        icc_profile=image.info.get('icc_profile'),
+    )
+    return buffer.getvalue(), 'jpg'
+
+
+def prepare_upload(file_):
+    """Канонический оригинал загруженной картинки для поля модели."""
+    image = check_limits(file_)
+    content, extension = canonical(decode(image, settings.IMAGE_MAX_SIDE))
+    stem = os.path.splitext(os.path.basename(file_.name))[0] or 'image'
+    return ContentFile(content, name=f'{stem}.{extension}')
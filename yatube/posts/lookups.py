@@ -0,0 +1,51 @@
+"""Кешированный поиск групп по slug и пользователей по username.
+
+Эти строки читаются почти на каждой странице и меняются редко, поэтому
+в устоявшемся режиме поиск обходится без запросов к базе. Записи
+сбрасывают сигналы моделей (``posts.signals``).
+
+В кеш попадают только поля, которые показывают страницы: общий кеш
+может лежать в файле в ``/dev/shm``, и хешам паролей и почте там не
+место. Остальные поля отложены и при обращении читаются из базы.
+"""
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+
+from core.tiered import TwoTierCache
+from posts.models import Group, User
+
+groups = TwoTierCache('lookup.group')
+users = TwoTierCache('lookup.user')
+LOOKUP_METRICS = groups.metrics + users.metrics
+GROUP_FIELDS = ('id', 'title', 'slug', 'description')
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name')
+
+
+def _get_or_404(tiered, model, fields, key, **lookup):
+    try:
+        row = tiered.get_or_load(
+            key, lambda: model.objects.values_list(*fields).get(**lookup)
+        )
+    except model.DoesNotExist:
+        raise Http404(
+            f'No {model._meta.object_name} matches the given query.'
+        )
+    return model.from_db(DEFAULT_DB_ALIAS, fields, row)
+
+
+def get_group_or_404(slug):
+    return _get_or_404(groups, Group, GROUP_FIELDS, slug, slug=slug)
+
+
+def get_user_or_404(username):
+    return _get_or_404(
+        users, User, USER_FIELDS, username, username=username
+    )
+
+
+def forget_groups(slugs):
+    groups.delete_many(slugs)
+
+
+def forget_users(usernames):
+    users.delete_many(usernames)
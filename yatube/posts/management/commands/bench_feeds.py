@@ -0,0 +1,104 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from posts.feeds import (
+    FOLLOW_FEED_ORDERING, follow_feed, rebuild_timeline
+)
+from posts.models import CelebrityAuthor, Follow, Post
+from posts.utils import get_page
+
+User = get_user_model()
+PAGE_SIZE = 10
+
+
+def _timed(func, repeat):
+    """Медиана времени выполнения в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость записи и чтения ленты подписок при раскладке '
+        'постов по лентам и при подмешивании постов популярных авторов. '
+        'Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers', type=int, nargs='+',
+            default=[10, 100, 1000, 10000],
+            help='Число подписчиков автора для каждого прогона.'
+        )
+        parser.add_argument(
+            '--posts', type=int, default=200,
+            help='Сколько постов у автора до замера.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторять каждый замер.'
+        )
+
+    def handle(self, *args, **options):
+        header = (
+            f'{"подписчики":>10} {"запись push":>12} {"запись pull":>12} '
+            f'{"чтение push":>12} {"чтение pull":>12} {"join":>8}  (мс)'
+        )
+        self.stdout.write(header)
+        for followers in options['followers']:
+            with transaction.atomic():
+                row = self.run(followers, options['posts'], options['repeat'])
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f'{followers:>10} {row[0]:>12.2f} {row[1]:>12.2f} '
+                f'{row[2]:>12.2f} {row[3]:>12.2f} {row[4]:>8.2f}'
+            )
+
+    def run(self, followers, posts, repeat):
+        author = User.objects.create_user(username='bench_author')
+        User.objects.bulk_create(
+            User(username=f'bench_reader_{i}') for i in range(followers)
+        )
+        readers = User.objects.filter(username__startswith='bench_reader_')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i}') for i in range(posts)
+        )
+        # Подписки создаются в обход сигналов, чтобы автор не стал
+        # популярным раньше времени; ленту собираем только читателю.
+        Follow.objects.bulk_create(
+            Follow(user=follower, author=author) for follower in readers
+        )
+        reader = readers.first()
+        rebuild_timeline(reader.pk)
+        request = RequestFactory().get('/follow/', {'cursor': ''})
+
+        def write():
+            Post.objects.create(author=author, text='Новый пост')
+
+        def read():
+            list(get_page(
+                request, follow_feed(reader), PAGE_SIZE, FOLLOW_FEED_ORDERING
+            ))
+
+        def read_join():
+            list(Post.objects.filter(
+                author__following__user=reader
+            )[:PAGE_SIZE])
+
+        write_push = _timed(write, repeat)
+        read_push = _timed(read, repeat)
+        CelebrityAuthor.objects.get_or_create(author=author)
+        write_pull = _timed(write, repeat)
+        read_pull = _timed(read, repeat)
+        return write_push, write_pull, read_push, read_pull, _timed(
+            read_join, repeat
+        )
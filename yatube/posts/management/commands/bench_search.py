@@ -0,0 +1,113 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.search import SEARCH_ORDERING, search
+from posts.utils import CursorPaginator
+
+User = get_user_model()
+PAGE_SIZE = 10
+BATCH_SIZE = 5000
+SYLLABLES = (
+    'ба', 'ве', 'го', 'да', 'ек', 'жи', 'зо', 'ил', 'ка', 'ло', 'ми',
+    'но', 'ос', 'пу', 'ра', 'се', 'ти', 'ут', 'фа', 'хо', 'це', 'чи',
+)
+
+
+def _timed(func, repeat):
+    """Медиана времени выполнения в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def make_vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = (
+        'Засевает базу постами со случайным текстом и сравнивает поиск '
+        'по индексу FTS5 с поиском LIKE. Данные создаются в транзакции '
+        'и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=100000,
+            help='Сколько постов засеять.'
+        )
+        parser.add_argument(
+            '--words', type=int, default=40,
+            help='Слов в посте.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторять каждый замер.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['posts'], options['words'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, posts, words, rng):
+        vocabulary = make_vocabulary(5000, rng)
+        # Частоты слов по Ципфу, как в живом тексте.
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        author = User.objects.create_user(username='bench_search_author')
+        started = time.perf_counter()
+        for start in range(0, posts, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(
+                    author=author,
+                    text=' '.join(rng.choices(vocabulary, weights, k=words))
+                )
+                for _ in range(min(BATCH_SIZE, posts - start))
+            )
+        self.stdout.write(
+            f'Засеяно постов: {posts} за '
+            f'{time.perf_counter() - started:.1f} с'
+        )
+        return vocabulary
+
+    def run(self, posts, words, repeat):
+        vocabulary = self.seed(posts, words, random.Random(0))
+        queries = (
+            ('частое слово', vocabulary[0]),
+            ('редкое слово', vocabulary[-1]),
+            ('два слова', f'{vocabulary[10]} {vocabulary[200]}'),
+            ('префикс', vocabulary[50][:3]),
+        )
+        self.stdout.write(
+            f'{"запрос":>14} {"найдено":>9} {"FTS5":>9} {"LIKE":>9}  (мс)'
+        )
+        for title, query in queries:
+            found = search(query).count()
+
+            def fts_page():
+                list(CursorPaginator(
+                    search(query), PAGE_SIZE, SEARCH_ORDERING
+                ).page())
+
+            def like_page():
+                posts = Post.objects.all()
+                for word in query.split():
+                    posts = posts.filter(text__icontains=word)
+                list(posts.order_by('-pub_date', '-pk')[:PAGE_SIZE])
+
+            self.stdout.write(
+                f'{title:>14} {found:>9} {_timed(fts_page, repeat):>9.2f} '
+                f'{_timed(like_page, repeat):>9.2f}'
+            )
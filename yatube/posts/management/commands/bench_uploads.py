@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from posts.images import prepare_upload
+
+# ru_maxrss в Linux считается в килобайтах, в macOS — в байтах.
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def make_photo(path, width, height):
+    """Снимок с размытым шумом: JPEG весит как фотография с телефона."""
+    noise = [
+        Image.effect_noise((width // 4, height // 4), 48 + 16 * band)
+        for band in range(3)
+    ]
+    photo = Image.merge('RGB', noise).resize((width, height), Image.BICUBIC)
+    photo.save(path, 'JPEG', quality=85)
+
+
+def naive(path):
+    """Как раньше: картинка декодируется целиком, потом уменьшается."""
+    with Image.open(path) as image:
+        image.load()
+        side = settings.IMAGE_MAX_SIDE
+        image.thumbnail((side, side), Image.LANCZOS)
+
+
+def pipeline(path):
+    with open(path, 'rb') as handle:
+        prepare_upload(File(handle, name=os.path.basename(path)))
+
+
+def peak_rss():
+    """Пиковый RSS процесса в байтах.
+
+    В Linux берется VmHWM: в отличие от ``ru_maxrss`` он не переживает
+    ``exec`` и относится только к текущей программе.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+def _measure(func, path, conn):
+    before = peak_rss()
+    started = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - started
+    conn.send((peak_rss() - before, elapsed))
+    conn.close()
+
+
+def measure(func, path):
+    """Прирост пикового RSS и время обработки в отдельном процессе.
+
+    Пик RSS процесса не убывает, а после ``fork`` достается от родителя,
+    поэтому каждая загрузка обрабатывается в свежем процессе ``spawn``.
+    """
+    context = multiprocessing.get_context('spawn')
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_measure, args=(func, path, child))
+    process.start()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пиковую память и время обработки загруженной '
+        'фотографии: полное декодирование против конвейера загрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+',
+            default=['2000x1500', '4032x3024', '6000x4000'],
+            help='Размеры фотографий в виде ШИРИНАxВЫСОТА.'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"размер":>11} {"файл":>8} {"целиком":>9} {"конвейер":>9} '
+            f'{"целиком":>9} {"конвейер":>9}'
+        )
+        self.stdout.write(f'{"":>11} {"МБ":>8} {"МБ RSS":>19} {"мс":>19}')
+        for size in options['sizes']:
+            width, height = map(int, size.split('x'))
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'photo.jpg')
+                make_photo(path, width, height)
+                megabytes = os.path.getsize(path) / 2 ** 20
+                naive_rss, naive_time = measure(naive, path)
+                rss, elapsed = measure(pipeline, path)
+            self.stdout.write(
+                f'{size:>11} {megabytes:>8.1f} '
+                f'{naive_rss / 2 ** 20:>9.1f} {rss / 2 ** 20:>9.1f} '
+                f'{naive_time * 1000:>9.0f} {elapsed * 1000:>9.0f}'
+            )
@@ -0,0 +1,211 @@
+import json
+import logging
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from core import bench
+from core.queries import budget_for
+from posts import urls
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _login(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет каждый маршрут posts.urls через WSGI-обработчик и '
+        'пишет в JSON p50/p95 времени, число запросов к базе и память. '
+        'Подписку, которую меняют маршруты подписки, команда возвращает.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Замеров времени на маршрут.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Запросов прогрева перед замерами.'
+        )
+        parser.add_argument(
+            '--alloc-repeat', type=int, default=5,
+            help='Запросов под tracemalloc на маршрут.'
+        )
+        parser.add_argument(
+            '--routes', nargs='+', metavar='NAME',
+            help='Только эти маршруты (index, post_detail...).'
+        )
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Запросы без входа на сайт.'
+        )
+        parser.add_argument(
+            '--output', default='bench_views.json',
+            help='Файл для результатов.'
+        )
+        parser.add_argument(
+            '--compare', metavar='PATH',
+            help='Прежний файл результатов для сравнения.'
+        )
+
+    def samples(self):
+        """Типичные объекты для аргументов маршрутов: самые нагруженные."""
+        author = UserCounters.objects.order_by('-posts_count').first()
+        reader = UserCounters.objects.order_by('-following_count').first()
+        group = Group.objects.order_by('-posts_count').first()
+        post = Post.objects.filter(
+            author_id=author.user_id
+        ).order_by('-comments_count').first() if author else None
+        if post is None or reader is None or group is None:
+            raise CommandError(
+                'Нужны посты, группы и подписки: сначала seed_data.'
+            )
+        return {
+            'author': User.objects.get(pk=author.user_id),
+            'reader': User.objects.get(pk=reader.user_id),
+            'kwargs': {
+                'slug': group.slug,
+                'username': post.author.username,
+                'post_id': post.pk,
+            },
+            'query': urlencode({'q': post.text.split()[0].strip('.,')}),
+        }
+
+    def routes(self, samples, names):
+        """Имя, путь и строка запроса каждого маршрута."""
+        for pattern in urls.urlpatterns:
+            if names and pattern.name not in names:
+                continue
+            try:
+                kwargs = {
+                    key: samples['kwargs'][key]
+                    for key in pattern.pattern.converters
+                }
+            except KeyError as error:
+                raise CommandError(f'{pattern.name}: нет образца {error}')
+            query = samples['query'] if pattern.name == 'search' else ''
+            yield (
+                f'{urls.app_name}:{pattern.name}',
+                reverse(f'{urls.app_name}:{pattern.name}', kwargs=kwargs),
+                query,
+            )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля.')
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                previous = json.load(stream)
+        samples = self.samples()
+        clients = {}
+        if not options['anonymous']:
+            # Правка поста открывается только его автору.
+            clients = {
+                'reader': _login(samples['reader']),
+                'author': _login(samples['author']),
+            }
+        runners = {
+            role: bench.WSGIRunner({
+                name: morsel.value for name, morsel in client.cookies.items()
+            }) for role, client in clients.items()
+        }
+        anonymous = bench.WSGIRunner()
+        # Запросы идут без общей транзакции: обработчик закрывает
+        # соединение после каждого, как в работе.
+        follow = Follow.objects.filter(
+            user=samples['reader'], author=samples['author']
+        )
+        following = follow.exists()
+        # Превышения бюджета видны в таблице, а не в логе каждого запроса.
+        budget_log = logging.getLogger('yatube.queries')
+        level = budget_log.level
+        budget_log.setLevel(logging.ERROR)
+        results = {}
+        try:
+            for name, path, query in self.routes(samples, options['routes']):
+                role = 'author' if name.endswith(':post_edit') else 'reader'
+                runner = runners.get(role, anonymous)
+                results[name] = bench.measure(
+                    lambda: runner(path, query),
+                    repeat=options['repeat'], warmup=options['warmup'],
+                    alloc_repeat=options['alloc_repeat'],
+                )
+                results[name].update(path=path, budget=budget_for(name))
+                self.report(name, results[name])
+        finally:
+            budget_log.setLevel(level)
+            for client in clients.values():
+                client.logout()
+            if following:
+                Follow.objects.get_or_create(
+                    user=samples['reader'], author=samples['author']
+                )
+            else:
+                follow.delete()
+        data = {'meta': self.meta(options), 'routes': results}
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            json.dump(data, stream, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+        if previous is not None:
+            self.report_changes(bench.compare(previous, data))
+
+    def meta(self, options):
+        return {
+            'commit': _commit(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'debug': settings.DEBUG,
+            'anonymous': options['anonymous'],
+            'repeat': options['repeat'],
+            'rows': {
+                model.__name__.lower(): model.objects.count()
+                for model in (User, Group, Post, Comment, Follow)
+            },
+        }
+
+    def report(self, name, result):
+        peak = result['alloc_peak_kb']
+        memory = '-' if peak is None else f'{peak:.1f} КБ'
+        queries = f'{result["queries"]}/{result["budget"] or "-"}'
+        if result['budget'] and result['queries'] > result['budget']:
+            queries += ' !'
+        self.stdout.write(
+            f'{name:<28} {result["status"]:>4} '
+            f'p50 {result["p50_ms"]:>8.2f} мс  p95 {result["p95_ms"]:>8.2f} мс'
+            f'  запросов {queries:<7}  память {memory:>11}'
+        )
+
+    def report_changes(self, changes):
+        for name, fields in changes.items():
+            parts = [
+                f'{field} {was} -> {now} ({delta:+.1f}%)'
+                for field, (was, now, delta) in fields.items()
+            ]
+            self.stdout.write(f'{name:<28} ' + ', '.join(parts))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import related
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает похожие посты по TF-IDF текста. По умолчанию только '
+        'для постов без соседей — новых и отредактированных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать соседей всех постов.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = related.build(full=options['full'])
+        backend = 'SciPy' if related.sparse is not None else 'Python'
+        self.stdout.write(
+            f'Пересчитано постов: {count} за '
+            f'{time.perf_counter() - started:.1f} с ({backend})'
+        )
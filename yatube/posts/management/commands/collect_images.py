@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.blobs import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет ссылки постов на файлы картинок и удаляет картинки, '
+        'на которые не ссылается ни один пост.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы без ссылок моложе стольких секунд.'
+        )
+
+    def handle(self, *args, **options):
+        fixed, removed = reconcile(options['min_age'])
+        self.stdout.write(f'Исправлено ссылок: {fixed}')
+        self.stdout.write(f'Удалено файлов: {removed}')
@@ -0,0 +1,34 @@
+import gzip
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в JSONL '
+        '(файл с .gz сжимается).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию стандартный вывод.'
+        )
+        parser.add_argument(
+            '--models', nargs='+', choices=list(transfer.EXPORTS),
+            default=list(transfer.EXPORTS),
+            help='Какие модели выгрузить (по умолчанию все).'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path == '-':
+            written = transfer.export(self.stdout, options['models'])
+        else:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'wt', encoding='utf-8') as stream:
+                written = transfer.export(stream, options['models'])
+        for model in options['models']:
+            self.stderr.write(f'Выгружено {model}: {written[model]}')
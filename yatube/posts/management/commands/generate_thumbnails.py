@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import forget_pages, generate_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Нарезает миниатюры картинок уже опубликованных постов и сбрасывает '
+        'кеш страниц, которые могли попасть в него без миниатюр.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов (0 — в текущем процессе).'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        names = posts.values_list('image', flat=True).distinct().iterator()
+        created = generate_many(names, options['workers'])
+        if created:
+            forget_pages(posts)
+        self.stdout.write(f'Готово миниатюр: {created}')
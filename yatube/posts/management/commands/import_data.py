@@ -0,0 +1,52 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии и подписки из JSONL '
+        'команды export_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл выгрузки (.gz читается со сжатием), '
+                         'или - для стандартного ввода.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить прерванную загрузку того же файла.'
+        )
+        parser.add_argument(
+            '--commit-size', type=int, default=transfer.COMMIT_SIZE,
+            help='Записей в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        importer = transfer.Importer(
+            resume=options['resume'], commit_size=options['commit_size']
+        )
+        path = options['path']
+        try:
+            if path == '-':
+                loaded = importer.load(sys.stdin)
+            else:
+                opener = gzip.open if path.endswith('.gz') else open
+                with opener(path, 'rt', encoding='utf-8') as stream:
+                    loaded = importer.load(stream)
+        except transfer.ConflictError as error:
+            raise CommandError(error)
+        except (OSError, KeyError, ValueError) as error:
+            raise CommandError(
+                f'{error}. Загруженное сохранено, продолжить можно '
+                f'с --resume.'
+            )
+        rebuilt = importer.finish()
+        for model in transfer.EXPORTS:
+            self.stdout.write(f'Загружено {model}: {loaded[model]}')
+        self.stdout.write(f'Создано пользователей: {importer.new_users}')
+        self.stdout.write(f'Пересобрано лент: {rebuilt}')
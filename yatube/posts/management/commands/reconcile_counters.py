@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_groups, reconcile_posts, reconcile_users
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счетчики с данными и чинит расхождения.'
+
+    def handle(self, *args, **options):
+        for title, reconcile in (
+            ('групп', reconcile_groups),
+            ('постов', reconcile_posts),
+            ('пользователей', reconcile_users),
+        ):
+            fixed = reconcile()
+            self.stdout.write(f'Исправлено счетчиков {title}: {fixed}')
@@ -0,0 +1,303 @@
+import json
+import logging
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.middleware.csrf import CSRF_TOKEN_LENGTH
+from django.test import Client
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from core import replay
+from core.bench import WSGIRunner
+from posts.models import Comment, Follow, Group, Post, UserCounters
+from posts.seeding import skewed
+from yatube.wsgi import application
+
+User = get_user_model()
+MIX = {
+    'read': 70, 'follow_index': 10, 'post_create': 5, 'add_comment': 10,
+    'follow': 5,
+}
+READS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'post_comments',
+    'hot', 'api_index',
+)
+# Сколько самых плодовитых авторов и новых постов попадает в сценарий.
+AUTHORS = 200
+POSTS = 1000
+QUIET_LOGGERS = ('django.request', 'yatube.queries')
+
+
+def parse_mix(value):
+    """Доли запросов из строки вида ``read=70,follow=5``."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in MIX:
+            raise CommandError(
+                f'Неизвестный вид запроса {name!r}, есть: {", ".join(MIX)}.'
+            )
+        try:
+            mix[name.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f'Доля {item!r} не число.')
+    return mix
+
+
+class Scenario:
+    """Синтетическая смесь запросов по засеянной базе."""
+
+    def __init__(self, users, seed=0, skew=4.0):
+        self.rng = random.Random(seed)
+        self.skew = skew
+        self.users = users
+        self.authors = list(UserCounters.objects.order_by(
+            '-posts_count'
+        ).values_list('user__username', flat=True)[:AUTHORS])
+        self.slugs = list(Group.objects.order_by(
+            '-posts_count'
+        ).values_list('slug', flat=True))
+        self.posts = list(Post.objects.order_by(
+            '-pk'
+        ).values_list('pk', flat=True)[:POSTS])
+        if not (self.users and self.authors and self.slugs and self.posts):
+            raise CommandError(
+                'Нужны посты, группы и подписки: сначала seed_data.'
+            )
+
+    def pick(self, items):
+        return items[skewed(self.rng, len(items), self.skew)]
+
+    def read(self, number):
+        name = self.rng.choice(READS)
+        kwargs = {}
+        if name == 'group_posts':
+            kwargs['slug'] = self.pick(self.slugs)
+        elif name == 'profile':
+            kwargs['username'] = self.pick(self.authors)
+        elif name in ('post_detail', 'post_comments'):
+            kwargs['post_id'] = self.pick(self.posts)
+        return {'name': name, 'path': reverse(f'posts:{name}', kwargs=kwargs)}
+
+    def follow_index(self, number):
+        return {
+            'name': 'follow_index', 'path': reverse('posts:follow_index'),
+            'user': self.rng.choice(self.users),
+        }
+
+    def post_create(self, number):
+        return {
+            'name': 'post_create', 'method': 'POST',
+            'path': reverse('posts:post_create'),
+            'data': {'text': f'Пост нагрузки {number}'},
+            'user': self.rng.choice(self.users),
+        }
+
+    def add_comment(self, number):
+        return {
+            'name': 'add_comment', 'method': 'POST',
+            'path': reverse('posts:add_comment', args=[self.pick(self.posts)]),
+            'data': {'text': f'Комментарий нагрузки {number}'},
+            'user': self.rng.choice(self.users),
+        }
+
+    def follow(self, number):
+        name = self.rng.choice(('profile_follow', 'profile_unfollow'))
+        return {
+            'name': name,
+            'path': reverse(f'posts:{name}', args=[self.pick(self.authors)]),
+            'user': self.rng.choice(self.users),
+        }
+
+    def requests(self, number, mix):
+        kinds = self.rng.choices(
+            list(mix), weights=list(mix.values()), k=number
+        )
+        return [
+            getattr(self, kind)(index) for index, kind in enumerate(kinds)
+        ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Воспроизводит смесь запросов к yatube.wsgi.application из '
+        'нескольких потоков или процессов и печатает пропускную '
+        'способность, хвосты задержек и ошибки блокировки SQLite для '
+        'каждого уровня параллельности. Созданные посты и комментарии '
+        'после прогона удаляются, подписки возвращаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Запросов в синтетическом сценарии.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+            help='Уровни параллельности.'
+        )
+        parser.add_argument(
+            '--mode', choices=replay.MODES, default='thread',
+            help='Потоки одного процесса или отдельные процессы.'
+        )
+        parser.add_argument(
+            '--mix', type=parse_mix, default=MIX,
+            help='Доли видов запросов: read=70,follow_index=10,'
+                 'post_create=5,add_comment=10,follow=5.'
+        )
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Сколько пользователей входят на сайт.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0, help='Зерно сценария.'
+        )
+        parser.add_argument(
+            '--script', metavar='PATH',
+            help='Записанный сценарий JSONL вместо синтетического.'
+        )
+        parser.add_argument(
+            '--record', metavar='PATH',
+            help='Записать синтетический сценарий в JSONL.'
+        )
+        parser.add_argument(
+            '--output', metavar='PATH', help='Файл для результатов JSON.'
+        )
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не удалять созданное прогоном.'
+        )
+
+    def script(self, options):
+        if options['script']:
+            with open(options['script'], encoding='utf-8') as stream:
+                return [json.loads(line) for line in stream if line.strip()]
+        users = list(UserCounters.objects.order_by(
+            '-following_count'
+        ).values_list('user__username', flat=True)[:options['users']])
+        requests = Scenario(users, seed=options['seed']).requests(
+            options['requests'], options['mix']
+        )
+        if options['record']:
+            with open(options['record'], 'w', encoding='utf-8') as stream:
+                for spec in requests:
+                    stream.write(json.dumps(spec, ensure_ascii=False) + '\n')
+        return requests
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if min(options['concurrency']) < 1:
+            raise CommandError('Параллельность должна быть больше нуля.')
+        requests = self.script(options)
+        names = {spec['user'] for spec in requests if spec.get('user')}
+        users = User.objects.in_bulk(names, field_name='username')
+        if len(users) != len(names):
+            raise CommandError(
+                f'Нет пользователей: {", ".join(sorted(names - set(users)))}'
+            )
+        state = self.snapshot(requests)
+        clients = {}
+        for name, user in users.items():
+            clients[name] = Client()
+            clients[name].force_login(user)
+        runners = {None: WSGIRunner(application=application)}
+        for name, client in clients.items():
+            runners[name] = WSGIRunner(
+                {key: morsel.value for key, morsel in client.cookies.items()},
+                csrf_token=get_random_string(CSRF_TOKEN_LENGTH),
+                application=application,
+            )
+        levels = {}
+        loggers = [logging.getLogger(name) for name in QUIET_LOGGERS]
+        # Трассировки ошибок блокировки сосчитаны в отчете.
+        saved = [logger.level for logger in loggers]
+        for logger in loggers:
+            logger.setLevel(logging.CRITICAL)
+        self.stdout.write(
+            f'{"параллельно":>11} {"запросов/с":>10} {"p50":>8} {"p95":>8} '
+            f'{"p99":>8} {"ошибок":>7} {"блокировок":>10}  (мс)'
+        )
+        try:
+            for concurrency in options['concurrency']:
+                summary = replay.replay(
+                    requests, runners, concurrency, options['mode']
+                )
+                levels[concurrency] = summary
+                self.report(concurrency, summary)
+        finally:
+            for logger, level in zip(loggers, saved):
+                logger.setLevel(level)
+            for client in clients.values():
+                client.logout()
+            if not options['keep']:
+                self.restore(state)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump({
+                    'meta': {
+                        'created': timezone.now().isoformat(),
+                        'mode': options['mode'],
+                        'requests': len(requests),
+                        'users': len(users),
+                    },
+                    'levels': levels,
+                }, stream, ensure_ascii=False, indent=2)
+
+    def snapshot(self, requests):
+        """Что вернуть после прогона: границы id и затронутые подписки."""
+        pairs = set()
+        for spec in requests:
+            if spec['name'] in ('profile_follow', 'profile_unfollow'):
+                author = resolve(spec['path']).kwargs['username']
+                pairs.add((spec['user'], author))
+        followed = {
+            pair for pair in pairs if Follow.objects.filter(
+                user__username=pair[0], author__username=pair[1]
+            ).exists()
+        }
+        return {
+            'post': Post.objects.aggregate(last=Max('pk'))['last'] or 0,
+            'comment': Comment.objects.aggregate(last=Max('pk'))['last'] or 0,
+            'pairs': pairs,
+            'followed': followed,
+        }
+
+    def restore(self, state):
+        # Удаление по одному объекту: сигналы поправят счетчики и ленты.
+        for comment in Comment.objects.filter(pk__gt=state['comment']):
+            comment.delete()
+        for post in Post.objects.filter(pk__gt=state['post']):
+            post.delete()
+        for username, author in state['pairs']:
+            follows = Follow.objects.filter(
+                user__username=username, author__username=author
+            )
+            if (username, author) in state['followed']:
+                if not follows.exists():
+                    Follow.objects.create(
+                        user=User.objects.get(username=username),
+                        author=User.objects.get(username=author),
+                    )
+            else:
+                for follow in follows:
+                    follow.delete()
+
+    def report(self, concurrency, summary):
+        self.stdout.write(
+            f'{concurrency:>11} {summary["throughput_rps"]:>10.1f} '
+            f'{summary["p50_ms"]:>8.1f} {summary["p95_ms"]:>8.1f} '
+            f'{summary["p99_ms"]:>8.1f} {summary["errors"]:>7} '
+            f'{summary["lock_errors"]:>10}'
+        )
+        if self.verbosity < 2:
+            return
+        for name, stats in summary['kinds'].items():
+            self.stdout.write(
+                f'    {name:<18} {stats["requests"]:>6} '
+                f'p95 {stats["p95_ms"]:>8.1f}  ошибок {stats["errors"]}'
+                f'  блокировок {stats["lock_errors"]}'
+            )
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import seeding, transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Засевает базу пользователями, группами, постами, комментариями '
+        'и подписками с перекошенным распределением авторов. Похожие '
+        'посты после засева строит build_related_posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000, help='Сколько пользователей.'
+        )
+        parser.add_argument(
+            '--groups', type=int, default=20, help='Сколько групп.'
+        )
+        parser.add_argument(
+            '--posts', type=int, default=20000, help='Сколько постов.'
+        )
+        parser.add_argument(
+            '--comments', type=int, default=60000,
+            help='Сколько комментариев.'
+        )
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Сколько подписок в среднем у пользователя.'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=4.0,
+            help='Перекос распределения авторов, 1 — равномерно.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до сегодня распределить посты.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора для повторяемого засева.'
+        )
+        parser.add_argument(
+            '--commit-size', type=int, default=transfer.COMMIT_SIZE,
+            help='Записей в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['skew'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и skew >= 1.')
+        seeder = seeding.Seeder(
+            skew=options['skew'], days=options['days'],
+            seed=options['seed'], commit_size=options['commit_size'],
+        )
+        seeder.add_users(options['users'])
+        seeder.add_groups(options['groups'])
+        seeder.add_posts(options['posts'])
+        seeder.add_comments(options['comments'])
+        seeder.add_follows(options['follows'])
+        rebuilt = seeder.finish()
+        importer = seeder.importer
+        self.stdout.write(f'Создано пользователей: {importer.new_users}')
+        for model in transfer.EXPORTS:
+            self.stdout.write(f'Загружено {model}: {importer.loaded[model]}')
+        self.stdout.write(f'Пересобрано лент: {rebuilt}')
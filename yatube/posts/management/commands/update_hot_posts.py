@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import hot
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет рейтинг ленты обсуждаемого: заводит его новым постам '
+        'и учитывает новые комментарии. Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать рейтинг всех постов заново.'
+        )
+
+    def handle(self, *args, **options):
+        posts, comments = hot.update(full=options['full'])
+        self.stdout.write(
+            f'Новых постов: {posts}, учтено комментариев: {comments}'
+        )
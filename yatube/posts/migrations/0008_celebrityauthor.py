@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0007_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CelebrityAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='celebrity', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('since', models.DateTimeField(auto_now_add=True, verbose_name='Популярен с')),
+            ],
+            options={
+                'verbose_name': 'Популярный автор',
+                'verbose_name_plural': 'Популярные авторы',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:35
+
+import core.fts
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_image_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearch',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('text', core.fts.FullTextField(verbose_name='Текст поста')),
+                ('rank', models.FloatField(verbose_name='Ранг')),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_related_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='hot', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('score', models.FloatField(verbose_name='Рейтинг')),
+                ('last_comment_id', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Последний учтенный комментарий')),
+            ],
+            options={
+                'verbose_name': 'Обсуждаемый пост',
+                'verbose_name_plural': 'Обсуждаемые посты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hotpost',
+            index=models.Index(fields=['-score', '-post'], name='hot_post_score_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+def mark_built(apps, schema_editor):
+    # Посты без соседей пересчитает следующий запуск команды.
+    Post = apps.get_model('posts', 'Post')
+    RelatedPost = apps.get_model('posts', 'RelatedPost')
+    Post.objects.filter(
+        pk__in=RelatedPost.objects.values('post_id')
+    ).update(neighbours_built=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_hot_posts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='neighbours_built',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Похожие посты посчитаны'),
+        ),
+        migrations.RunPython(mark_built, migrations.RunPython.noop),
+    ]
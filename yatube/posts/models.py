@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.fts import FullTextField
+from core.storage import content_storage
+
 User = get_user_model()
 
 
@@ -10,6 +13,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов'
+    )
 
     def __str__(self):
         return f"{self.title}"
@@ -44,8 +52,21 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев'
+    )
+    # Пост без похожих тоже отмечается, иначе его считали бы заново
+    # при каждом запуске build_related_posts.
+    neighbours_built = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Похожие посты посчитаны'
+    )
 
     def __str__(self):
         return f"{self.text[:15]}"
@@ -54,6 +75,44 @@ class Post(models.Model):
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'
+            ),
+        ]
+
+
+class PostSearch(models.Model):
+    """Строка полнотекстового индекса постов.
+
+    Это виртуальная таблица FTS5, ее создает и поддерживает
+    ``posts.search``; ``rank`` — встроенная колонка с рангом bm25,
+    доступная только в запросе с ``text__match``.
+    """
+
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search',
+        verbose_name='Пост'
+    )
+    text = FullTextField(verbose_name='Текст поста')
+    rank = models.FloatField(verbose_name='Ранг')
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
 
 
 class Comment(models.Model):
@@ -84,6 +143,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_thread_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -109,3 +174,188 @@ class Follow(models.Model):
                 name='unique follow'
             )
         ]
+
+
+class UserCounters(models.Model):
+    """Счетчики пользователя, которые обновляются при записи."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class Timeline(models.Model):
+    """Модель записи в ленте подписок пользователя.
+
+    Лента материализуется при записи: новый пост раскладывается по лентам
+    подписчиков, поэтому страница подписок читается по одному индексу.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique timeline post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx'
+            )
+        ]
+
+
+class CelebrityAuthor(models.Model):
+    """Автор, чьи посты не раскладываются по лентам подписчиков.
+
+    У таких авторов слишком много подписчиков для раскладки при записи,
+    поэтому их посты подмешиваются в ленту подписок при чтении.
+    """
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='celebrity',
+        verbose_name='Автор'
+    )
+    since = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Популярен с'
+    )
+
+    class Meta:
+        verbose_name = 'Популярный автор'
+        verbose_name_plural = 'Популярные авторы'
+
+
+class ImageBlob(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются.
+
+    Картинки хранятся по хешу содержимого, поэтому один файл может
+    принадлежать нескольким постам; файл удаляется вместе с последней
+    ссылкой.
+    """
+
+    name = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Файл'
+    )
+    refs = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число ссылок'
+    )
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+
+class RelatedPost(models.Model):
+    """Похожий пост, посчитанный заранее по сходству текста.
+
+    Список соседей строит команда ``build_related_posts``, поэтому
+    страница поста читает его по индексу без расчетов.
+    """
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        verbose_name='Пост'
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий пост'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        ordering = ('-score', '-related_id')
+        verbose_name = 'Похожий пост'
+        verbose_name_plural = 'Похожие посты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'related'],
+                name='unique related post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['post', '-score', '-related'],
+                name='related_post_score_idx'
+            )
+        ]
+
+
+class HotPost(models.Model):
+    """Рейтинг поста в ленте обсуждаемого.
+
+    Рейтинг копит команда ``update_hot_posts`` по мере появления
+    комментариев, поэтому лента читается по индексу рейтинга.
+    """
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='hot',
+        verbose_name='Пост'
+    )
+    score = models.FloatField(verbose_name='Рейтинг')
+    last_comment_id = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='Последний учтенный комментарий'
+    )
+
+    class Meta:
+        verbose_name = 'Обсуждаемый пост'
+        verbose_name_plural = 'Обсуждаемые посты'
+        indexes = [
+            models.Index(
+                fields=['-score', '-post'],
+                name='hot_post_score_idx'
+            )
+        ]
@@ -0,0 +1,268 @@
+"""Похожие посты: TF-IDF по тексту и ближайшие соседи по косинусу.
+
+Соседей считает команда ``build_related_posts`` и складывает в
+``RelatedPost``, а страница поста читает готовый список одним запросом
+по индексу. Векторы строятся в разреженном виде (CSR), сходство
+считается пачками строк: с NumPy и SciPy — произведением разреженных
+матриц, без них — по обратному индексу слов на чистом Python.
+
+Посчитанный пост отмечается ``neighbours_built``, даже если похожих
+у него не нашлось. Без ``full`` пересчитываются только неотмеченные
+посты: новые и отредактированные (правка текста стирает их соседей
+и отметку). Новый пост
+попадает и в списки старых постов, если он ближе их худшего соседа.
+"""
+import heapq
+import math
+import re
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from posts import fragments
+from posts.models import Post, RelatedPost
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+WORD = re.compile(r'\w+')
+MIN_WORD = 3
+# Слово из большей доли постов — служебное: оно ничего не говорит
+# о сходстве, а его списки постов самые длинные.
+MAX_DF = 0.5
+MIN_SCORE = 0.05
+# Сколько ячеек «пачка × все посты» считается за раз.
+CHUNK_CELLS = 2 ** 22
+BATCH_SIZE = 500
+
+
+def tokenize(text):
+    return [
+        word for word in WORD.findall(text.lower()) if len(word) >= MIN_WORD
+    ]
+
+
+class Vectors:
+    """Нормированные TF-IDF векторы постов в формате CSR."""
+
+    def __init__(self, texts):
+        df = Counter()
+        for text in texts:
+            df.update(set(tokenize(text)))
+        total = len(texts)
+        idf = {
+            word: math.log((1 + total) / (1 + count)) + 1
+            for word, count in df.items() if count <= MAX_DF * total
+        }
+        # Слово одного поста ни с чем не совпадет: оно входит в норму
+        # вектора, но в матрицу не попадает.
+        columns = {}
+        for word in idf:
+            if df[word] > 1:
+                columns[word] = len(columns)
+        self.width = len(columns)
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        self.data = array('d')
+        for text in texts:
+            weights = {
+                word: (1 + math.log(count)) * idf[word]
+                for word, count in Counter(tokenize(text)).items()
+                if word in idf
+            }
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1
+            for word, weight in weights.items():
+                if word in columns:
+                    self.indices.append(columns[word])
+                    self.data.append(weight / norm)
+            self.indptr.append(len(self.indices))
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def row(self, index):
+        start, end = self.indptr[index], self.indptr[index + 1]
+        return zip(self.indices[start:end], self.data[start:end])
+
+
+def _best(pairs, limit):
+    """Лучшие пары (строка, сходство); при равенстве — более новый пост."""
+    return heapq.nlargest(limit, pairs, key=lambda pair: (pair[1], pair[0]))
+
+
+def python_neighbours(vectors, targets, limit, floors):
+    """Соседи по обратному индексу слов."""
+    postings = defaultdict(list)
+    for index in range(len(vectors)):
+        for column, weight in vectors.row(index):
+            postings[column].append((index, weight))
+    for target in targets:
+        scores = defaultdict(float)
+        for column, weight in vectors.row(target):
+            for other, other_weight in postings[column]:
+                scores[other] += weight * other_weight
+        scores.pop(target, None)
+        pairs = [pair for pair in scores.items() if pair[1] >= MIN_SCORE]
+        closer = []
+        if floors is not None:
+            closer = [pair for pair in pairs if pair[1] > floors[pair[0]]]
+        yield target, _best(pairs, limit), closer
+
+
+def numpy_neighbours(vectors, targets, limit, floors):
+    """Соседи произведением разреженных матриц, пачками строк."""
+    matrix = sparse.csr_matrix((
+        np.frombuffer(vectors.data, dtype=np.float64),
+        np.frombuffer(vectors.indices, dtype=np.int64),
+        np.frombuffer(vectors.indptr, dtype=np.int64),
+    ), shape=(len(vectors), vectors.width))
+    transposed = matrix.T.tocsr()
+    if floors is not None:
+        floors = np.asarray(floors, dtype=np.float64)
+    chunk = max(1, CHUNK_CELLS // max(1, len(vectors)))
+    for start in range(0, len(targets), chunk):
+        part = targets[start:start + chunk]
+        product = (matrix[part] @ transposed).tocsr()
+        for offset, target in enumerate(part):
+            start_, end = product.indptr[offset], product.indptr[offset + 1]
+            columns = product.indices[start_:end]
+            values = product.data[start_:end]
+            keep = (columns != target) & (values >= MIN_SCORE)
+            columns, values = columns[keep], values[keep]
+            closer = []
+            if floors is not None:
+                above = values > floors[columns]
+                closer = list(zip(
+                    columns[above].tolist(), values[above].tolist()
+                ))
+            if len(values) > limit:
+                top = np.argpartition(-values, limit - 1)[:limit]
+                columns, values = columns[top], values[top]
+            order = np.lexsort((-columns, -values))
+            best = list(zip(
+                columns[order].tolist(), values[order].tolist()
+            ))
+            yield target, best, closer
+
+
+def neighbours(vectors, targets, limit, floors=None):
+    """Для каждой строки ``targets`` — ``limit`` ближайших строк.
+
+    Отдает тройки ``(строка, соседи, ближе порога)``: соседи — пары
+    ``(строка, сходство)`` от лучшей к худшей; если заданы ``floors``,
+    третий элемент — все строки, сходство с которыми выше их порога.
+    """
+    if sparse is not None:
+        return numpy_neighbours(vectors, targets, limit, floors)
+    return python_neighbours(vectors, targets, limit, floors)
+
+
+def _floors(ids, position, limit, targets):
+    """Порог для каждой строки: сходство ее худшего соседа.
+
+    Пока соседей меньше ``limit``, порога нет; у пересчитываемых
+    постов он бесконечный — их списки и так строятся заново.
+    """
+    floors = [0.0] * len(ids)
+    # Без order_by() сортировка модели попала бы в GROUP BY.
+    stats = RelatedPost.objects.order_by().values('post').annotate(
+        total=Count('pk'), low=Min('score')
+    ).values_list('post', 'total', 'low')
+    for post_id, total, low in stats.iterator():
+        if total >= limit and post_id in position:
+            floors[position[post_id]] = low
+    for target in targets:
+        floors[target] = math.inf
+    return floors
+
+
+def _merge_closer(additions, limit):
+    """Вставляет новые посты в списки старых, оставляя лучших."""
+    post_ids = list(additions)
+    rows = []
+    for start in range(0, len(post_ids), BATCH_SIZE):
+        batch = post_ids[start:start + BATCH_SIZE]
+        current = defaultdict(dict)
+        for post_id, related_id, score in RelatedPost.objects.filter(
+            post_id__in=batch
+        ).values_list('post_id', 'related_id', 'score'):
+            current[post_id][related_id] = score
+        for post_id in batch:
+            current[post_id].update(additions[post_id])
+            rows.extend(
+                RelatedPost(post_id=post_id, related_id=pk, score=score)
+                for pk, score in _best(current[post_id].items(), limit)
+            )
+        RelatedPost.objects.filter(post_id__in=batch).delete()
+    RelatedPost.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def build(full=False, limit=None):
+    """Пересчитывает похожие посты; возвращает, для скольких постов.
+
+    Без ``full`` пересчитываются только еще не посчитанные посты.
+    """
+    limit = limit or settings.RELATED_POSTS_LIMIT
+    ids, texts = [], []
+    for pk, text in Post.objects.order_by('pk').values_list(
+        'pk', 'text'
+    ).iterator():
+        ids.append(pk)
+        texts.append(text)
+    position = {pk: index for index, pk in enumerate(ids)}
+    if full:
+        targets = list(range(len(ids)))
+    else:
+        pending = set(Post.objects.filter(
+            neighbours_built=False
+        ).order_by().values_list('pk', flat=True))
+        targets = [position[pk] for pk in ids if pk in pending]
+    if not targets:
+        return 0
+    vectors = Vectors(texts)
+    floors = None if full else _floors(ids, position, limit, targets)
+    rows = []
+    additions = defaultdict(dict)
+    for target, best, closer in neighbours(vectors, targets, limit, floors):
+        rows.extend(
+            RelatedPost(post_id=ids[target], related_id=ids[other],
+                        score=score)
+            for other, score in best
+        )
+        for other, score in closer:
+            additions[ids[other]][ids[target]] = score
+    with transaction.atomic():
+        if full:
+            RelatedPost.objects.all().delete()
+        for start in range(0, len(targets), BATCH_SIZE):
+            batch = [
+                ids[index] for index in targets[start:start + BATCH_SIZE]
+            ]
+            if not full:
+                RelatedPost.objects.filter(post_id__in=batch).delete()
+            Post.objects.filter(pk__in=batch).update(neighbours_built=True)
+        RelatedPost.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        _merge_closer(additions, limit)
+    fragments.invalidate({fragments.RELATED})
+    return len(targets)
+
+
+def forget(post_id):
+    """Стирает соседей поста, чтобы следующий запуск пересчитал их."""
+    RelatedPost.objects.filter(post_id=post_id).delete()
+    Post.objects.filter(pk=post_id).update(neighbours_built=False)
+
+
+def related_posts(post_id):
+    """Похожие посты от самого близкого: один запрос по индексу."""
+    return [
+        entry.related for entry in RelatedPost.objects.filter(
+            post_id=post_id
+        ).select_related('related__author')
+    ]
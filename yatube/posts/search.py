@@ -0,0 +1,137 @@
+"""Поиск постов по индексу FTS5.
+
+Индекс — виртуальная таблица ``posts_post_fts`` над ``posts_post``
+(external content): сама таблица хранит только индекс, а текст берет из
+постов. Синхронизацию держат триггеры на ``posts_post``, поэтому индекс
+не расходится с данными и при ``bulk_create``, и при ``update()``.
+
+Таблица и триггеры создаются после каждой ``migrate``, а не в миграции:
+SQLite-бэкенд Django пересоздает ``posts_post`` при изменении полей
+поста, и триггеры исчезают вместе со старой таблицей. Если триггеров не
+было, индекс перестраивается целиком.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, FloatField, Value
+
+from core import fts
+from posts.models import Post, PostSearch
+
+SEARCH_ORDERING = ('rank', 'pk')
+# Ранжируются только столько самых новых совпадений: bm25 считается для
+# каждого кандидата, и частое слово иначе ранжировало бы всю таблицу.
+SEARCH_CANDIDATES = 1000
+TRIGGERS = {
+    'posts_post_fts_insert': '''
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO posts_post_fts(rowid, text)
+            VALUES (new.id, new.text);
+        END''',
+    'posts_post_fts_delete': '''
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END''',
+    'posts_post_fts_update': '''
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO posts_post_fts(rowid, text)
+            VALUES (new.id, new.text);
+        END''',
+}
+
+
+def install(using=DEFAULT_DB_ALIAS):
+    """Создает индекс и триггеры, которых нет; возвращает, перестроен
+    ли индекс."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE 'posts_post_fts_%'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = [name for name in TRIGGERS if name not in existing]
+        if not missing:
+            return False
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5('
+            "text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {TRIGGERS[name]}')
+        cursor.execute(
+            "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')"
+        )
+    return True
+
+
+def _oldest_candidate(match):
+    """rowid самого старого из ``SEARCH_CANDIDATES`` новейших совпадений
+    или ``None``, если совпадений меньше.
+
+    FTS5 отдает совпадения по убыванию rowid прямо из индекса, без
+    ранжирования, поэтому запрос дешевый.
+    """
+    rowids = PostSearch.objects.filter(text__match=match).order_by(
+        '-post_id'
+    ).values_list('post_id', flat=True)
+    found = list(rowids[SEARCH_CANDIDATES - 1:SEARCH_CANDIDATES])
+    return found[0] if found else None
+
+
+def _substring(words):
+    posts = Post.objects.all()
+    for word in words:
+        posts = posts.filter(text__icontains=word)
+    return posts
+
+
+def matching(query):
+    """Все посты, подходящие под строку поиска, без ранга.
+
+    В отличие от ``search``, совпадения не ограничены
+    ``SEARCH_CANDIDATES``: так ищет админка, где важно найти каждый
+    пост, а не порядок. Последнее слово ищется и по префиксу.
+    """
+    words = fts.terms(query)
+    if not words:
+        return Post.objects.none()
+    if not fts.available():
+        return _substring(words)
+    return Post.objects.filter(
+        search__text__match=fts.to_query(words, prefix=True)
+    )
+
+
+def search(query):
+    """Посты, подходящие под строку поиска, с рангом ``rank``.
+
+    Меньший ранг (bm25) — лучшее совпадение, так что выдача сортируется
+    по ``SEARCH_ORDERING`` по возрастанию. bm25 считается для каждого
+    кандидата, поэтому ранжируются только ``SEARCH_CANDIDATES`` самых
+    новых совпадений. Если точных совпадений меньше, последнее слово
+    ищется еще и по префиксу: префикс частого слова пришлось бы сливать
+    по всему индексу, а у редкого он дешев. Без FTS5 поиск идет по
+    подстроке, а ранг у всех постов одинаковый.
+    """
+    words = fts.terms(query)
+    no_rank = Value(0.0, output_field=FloatField())
+    if not words:
+        return Post.objects.none().annotate(rank=no_rank)
+    if not fts.available():
+        return _substring(words).annotate(rank=no_rank)
+    match = fts.to_query(words)
+    oldest = _oldest_candidate(match)
+    if oldest is None:
+        prefixed = fts.to_query(words, prefix=True)
+        if prefixed != match:
+            match = prefixed
+            oldest = _oldest_candidate(match)
+    posts = Post.objects.filter(search__text__match=match)
+    if oldest is not None:
+        posts = posts.filter(search__post_id__gte=oldest)
+    return posts.annotate(rank=F('search__rank'))
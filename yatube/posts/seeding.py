@@ -0,0 +1,170 @@
+"""Засев базы данными производственного объема для замеров.
+
+Записи собираются в формате выгрузки ``transfer`` и пишутся тем же
+``Importer``: пачками ``bulk_create`` без сигналов, а после засева
+``finish`` пересчитывает счетчики, ленты подписок и кеш. Рейтинг
+обсуждаемого обновляется сразу, похожие посты строит своя команда.
+
+Распределения перекошены, как на живом сайте: немногие авторы пишут
+большую часть постов и собирают большую часть подписчиков, новые посты
+обсуждают чаще старых. Тексты склеиваются из запаса предложений
+``Faker``, чтобы генерация не стоила дороже вставки.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts import hot, transfer
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+SENTENCES = 2000
+# Доля постов, опубликованных в группах.
+GROUP_SHARE = 0.6
+
+
+def skewed(rng, size, skew):
+    """Индекс от 0 до ``size - 1``; малые индексы выпадают чаще.
+
+    При ``skew`` 1 распределение равномерное, с ростом ``skew`` первые
+    индексы забирают все больше: при 4 на первый процент приходится
+    около трети выборок.
+    """
+    return min(int(size * rng.random() ** skew), size - 1)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Seeder:
+    """Генератор пользователей, групп, постов, комментариев и подписок."""
+
+    def __init__(self, skew=4.0, days=365, seed=0,
+                 commit_size=transfer.COMMIT_SIZE):
+        self.skew = skew
+        self.rng = random.Random(seed)
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.sentences = [fake.sentence() for _ in range(SENTENCES)]
+        self.words = sorted({
+            word.strip('.').lower() for sentence in self.sentences
+            for word in sentence.split()
+        })
+        self.end = timezone.now()
+        self.start = self.end - timedelta(days=days)
+        self.importer = transfer.Importer(commit_size=commit_size)
+        self.usernames = []
+        self.slugs = []
+        self.posts = 0
+        self.first_post = _next_id(Post)
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(
+            self.sentences, k=self.rng.randint(low, high)
+        ))
+
+    def pick(self, items):
+        return items[skewed(self.rng, len(items), self.skew)]
+
+    def write(self, model, records):
+        """Передает записи загрузчику пачками по ``commit_size``."""
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.importer.commit_size:
+                self.importer.flush(model, batch)
+                batch = []
+        self.importer.flush(model, batch)
+
+    def add_users(self, number):
+        first = _next_id(User)
+        names = [f'seed_{first + index}' for index in range(number)]
+        size = self.importer.commit_size
+        for start in range(0, number, size):
+            with transaction.atomic():
+                self.importer.user_ids(names[start:start + size])
+        self.usernames.extend(names)
+
+    def add_groups(self, number):
+        first = _next_id(Group)
+        slugs = [f'seed-{first + index}' for index in range(number)]
+        self.write('group', (
+            {
+                'model': 'group', 'slug': slug,
+                'title': ' '.join(self.rng.sample(self.words, 2)).title(),
+                'description': self.text(1, 3),
+            } for slug in slugs
+        ))
+        self.slugs.extend(slugs)
+
+    def post_date(self, number):
+        """Дата поста растет с его номером, как у настоящих id."""
+        return self.start + (self.end - self.start) * number / self.posts
+
+    def add_posts(self, number):
+        self.posts = number
+        self.write('post', (
+            {
+                'model': 'post', 'id': self.first_post + index,
+                'text': self.text(1, 8),
+                'pub_date': self.post_date(index).isoformat(),
+                'author': self.pick(self.usernames),
+                'group': (
+                    self.pick(self.slugs)
+                    if self.slugs and self.rng.random() < GROUP_SHARE
+                    else None
+                ),
+                'image': '',
+            } for index in range(number)
+        ))
+
+    def comments(self, number):
+        first = _next_id(Comment)
+        for index in range(number):
+            post = self.posts - 1 - skewed(self.rng, self.posts, self.skew)
+            published = self.post_date(post)
+            created = published + (self.end - published) * self.rng.random()
+            yield {
+                'model': 'comment', 'id': first + index,
+                'post': self.first_post + post,
+                'author': self.rng.choice(self.usernames),
+                'text': self.text(1, 3),
+                'created': created.isoformat(),
+            }
+
+    def add_comments(self, number):
+        if self.posts:
+            self.write('comment', self.comments(number))
+
+    def follows(self, average):
+        users = len(self.usernames)
+        for index, user in enumerate(self.usernames):
+            wanted = min(self.rng.randint(0, 2 * average), users - 1)
+            authors = set()
+            # Популярных авторов выпадает много, поэтому попыток с запасом.
+            for _ in range(wanted * 10):
+                if len(authors) >= wanted:
+                    break
+                author = skewed(self.rng, users, self.skew)
+                if author != index:
+                    authors.add(author)
+            for author in sorted(authors):
+                yield {
+                    'model': 'follow', 'user': user,
+                    'author': self.usernames[author],
+                }
+
+    def add_follows(self, average):
+        self.write('follow', self.follows(average))
+
+    def finish(self):
+        """Пересчитывает производные; возвращает число собранных лент."""
+        rebuilt = self.importer.finish()
+        hot.update()
+        return rebuilt
@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import (
+    blobs, counters, feeds, fragments, lookups, related, thumbnails
+)
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    """Заводит счетчики новому пользователю."""
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    """Запоминает прежние группу, картинку и текст редактируемого поста
+    и байты новой загрузки."""
+    instance._old_group_id = instance._old_image = instance._old_text = None
+    instance._image_content = None
+    if instance.image and not instance.image._committed:
+        instance._image_content = instance.image.file
+    if instance.pk and not raw:
+        (
+            instance._old_group_id, instance._old_image, instance._old_text
+        ) = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text'
+        ).first() or (None, None, None)
+
+
+def _image_changed(instance):
+    """Переносит ссылку на новую картинку и отдает ее на нарезку."""
+    name = instance.image.name
+    old_name = getattr(instance, '_old_image', None)
+    if name == old_name:
+        return
+    blobs.release(old_name)
+    blobs.acquire(name, getattr(instance, '_image_content', None))
+    if name:
+        transaction.on_commit(lambda: thumbnails.schedule(name))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    """Обновляет счетчики и раскладывает новый пост по лентам."""
+    if raw:
+        return
+    _image_changed(instance)
+    if created:
+        counters.add_user(instance.author_id, 'posts_count', 1)
+        if instance.group_id:
+            counters.add(Group, instance.group_id, 'posts_count', 1)
+        followers = feeds.fan_out_post(instance)
+        fragments.invalidate(fragments.post_feeds(instance, followers))
+        return
+    if getattr(instance, '_old_text', None) != instance.text:
+        related.forget(instance.pk)
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id != instance.group_id:
+        if old_group_id:
+            counters.add(Group, old_group_id, 'posts_count', -1)
+        if instance.group_id:
+            counters.add(Group, instance.group_id, 'posts_count', 1)
+    fragments.invalidate(fragments.post_feeds(
+        instance,
+        feeds.push_followers(instance.author_id),
+        old_group_id
+    ))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчики автора и группы, сбрасывает кеш лент."""
+    blobs.release(instance.image.name)
+    counters.add_user(instance.author_id, 'posts_count', -1)
+    if instance.group_id:
+        counters.add(Group, instance.group_id, 'posts_count', -1)
+    fragments.invalidate(fragments.post_feeds(
+        instance, feeds.push_followers(instance.author_id)
+    ))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    """Увеличивает счетчик комментариев поста."""
+    if created and not raw:
+        counters.add(Post, instance.post_id, 'comments_count', 1)
+        fragments.invalidate({fragments.post_key(instance.post_id)})
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Уменьшает счетчик комментариев поста."""
+    counters.add(Post, instance.post_id, 'comments_count', -1)
+    fragments.invalidate({fragments.post_key(instance.post_id)})
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    """Обновляет счетчики и заполняет ленту подписчика."""
+    if created and not raw:
+        counters.add_user(instance.author_id, 'followers_count', 1)
+        counters.add_user(instance.user_id, 'following_count', 1)
+        feeds.follow_added(instance.user_id, instance.author_id)
+        fragments.invalidate(fragments.follow_feeds(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Обновляет счетчики и чистит ленту после отписки."""
+    counters.add_user(instance.author_id, 'followers_count', -1)
+    counters.add_user(instance.user_id, 'following_count', -1)
+    feeds.follow_removed(instance.user_id, instance.author_id)
+    fragments.invalidate(fragments.follow_feeds(instance))
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, raw=False, **kwargs):
+    """Запоминает прежний slug редактируемой группы."""
+    instance._old_slug = None
+    if instance.pk and not raw:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    """Сбрасывает кеш страниц группы и кеш ее поиска по slug."""
+    if not raw:
+        fragments.invalidate({fragments.group_key(instance.pk)})
+        lookups.forget_groups(
+            [instance.slug, getattr(instance, '_old_slug', None)]
+        )
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    """Запоминает прежнее имя пользователя, если оно может смениться."""
+    instance._old_username = None
+    # Вход в систему сохраняет только last_login, имя от этого не меняется.
+    may_change = update_fields is None or 'username' in update_fields
+    if instance.pk and not raw and may_change:
+        instance._old_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, raw=False, **kwargs):
+    """Сбрасывает кеш поиска пользователя по имени."""
+    if not raw:
+        lookups.forget_users(
+            [instance.username, getattr(instance, '_old_username', None)]
+        )
@@ -0,0 +1,20 @@
+from django import template
+
+from posts.models import Post
+from posts.thumbnails import resolve_pictures
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, geometry):
+    """Находит миниатюры картинок сразу всех постов страницы и
+    кладет их в ``post.thumbnail`` в виде ``Picture`` со всеми
+    вариантами ширины и формата."""
+    if isinstance(posts, Post):
+        posts = [posts]
+    posts = list(posts)
+    images = [post.image for post in posts]
+    for post, thumbnail in zip(posts, resolve_pictures(images, geometry)):
+        post.thumbnail = thumbnail
+    return ''
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.queries import capture
+from ..models import CelebrityAuthor, Follow, Group, Post
+
+User = get_user_model()
+POSTS = 13
+
+
+class FeedApiTests(TestCase):
+    """Класс тестирования JSON API лент."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        CelebrityAuthor.objects.create(author=cls.star)
+        for number in range(POSTS):
+            Post.objects.create(
+                author=cls.star if number % 3 else cls.author,
+                text=f'Пост {number}',
+                group=cls.group if number % 2 else None,
+            )
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        cache.clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def collect(self, client, url):
+        """Проходит ленту по ссылкам next и собирает id постов."""
+        ids = []
+        while url:
+            data = client.get(url).json()
+            ids.extend(post['id'] for post in data['results'])
+            url = data['next']
+        return ids
+
+    def test_post_fields(self):
+        """Пост отдается только нужными полями."""
+        post = self.group.posts.first()
+        data = self.client.get(
+            reverse('posts:api_group_posts', args=[self.group.slug])
+        ).json()
+        self.assertEqual(data['results'][0], {
+            'id': post.pk,
+            'text': post.text,
+            'pub_date': post.pub_date.isoformat()[:23] + 'Z',
+            'author': post.author.username,
+            'group': self.group.slug,
+            'image': None,
+        })
+        self.assertIsNone(data['previous'])
+
+    def test_image_url(self):
+        """Картинка отдается полным адресом."""
+        post = Post.objects.first()
+        Post.objects.filter(pk=post.pk).update(image='posts/ab/ab.jpg')
+        data = self.client.get(reverse('posts:api_index')).json()
+        self.assertEqual(
+            data['results'][0]['image'],
+            'http://testserver/media/posts/ab/ab.jpg'
+        )
+
+    def test_feeds_match_querysets(self):
+        """Ленты API проходятся курсором целиком и в том же порядке."""
+        feeds = (
+            ('posts:api_index', [], Post.objects.all()),
+            ('posts:api_group_posts', [self.group.slug],
+             self.group.posts.all()),
+            ('posts:api_profile', [self.star.username],
+             self.star.posts.all()),
+            ('posts:api_follow_index', [], Post.objects.all()),
+        )
+        for name, args, posts in feeds:
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.collect(self.reader_client, reverse(name, args=args)),
+                    list(posts.order_by('-pub_date', '-pk').values_list(
+                        'pk', flat=True
+                    ))
+                )
+
+    def test_unchanged_feed_is_not_modified(self):
+        """Повторный опрос без изменений получает 304 без страницы."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        with capture() as log:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(log.count, 1)
+        self.assertIn('LIMIT 1', ' '.join(log.statements))
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_update_etag(self):
+        """Новый, отредактированный и удаленный пост меняют ETag."""
+        url = reverse('posts:api_group_posts', args=[self.group.slug])
+        etags = [self.client.get(url)['ETag']]
+        post = self.group.posts.last()
+        post.text = 'Правка'
+        post.save()
+        etags.append(self.client.get(url)['ETag'])
+        post.delete()
+        etags.append(self.client.get(url)['ETag'])
+        Post.objects.create(author=self.author, text='Новый', group=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        etags.append(response['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+
+    def test_follow_feed_is_personal(self):
+        """Лента подписок требует входа, ETag у каждого свой."""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        other = Client()
+        other.force_login(self.author)
+        self.assertNotEqual(
+            self.reader_client.get(url)['ETag'], other.get(url)['ETag']
+        )
+        self.assertEqual(other.get(url).json()['results'], [])
+
+    def test_unknown_group(self):
+        """Несуществующая группа — 404 в JSON."""
+        response = self.client.get(
+            reverse('posts:api_group_posts', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
+
+    def test_read_only(self):
+        """Изменять ленты через API нельзя."""
+        response = self.client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code, 405)
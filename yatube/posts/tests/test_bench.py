@@ -0,0 +1,158 @@
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase
+
+from core import bench
+from .. import seeding, urls
+from ..models import (
+    Comment, Follow, Group, HotPost, Post, Timeline, UserCounters
+)
+
+User = get_user_model()
+
+
+class SeedingTests(TestCase):
+    """Класс тестирования засева базы."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.output = StringIO()
+        call_command(
+            'seed_data', users=40, groups=3, posts=300, comments=600,
+            follows=5, commit_size=100, stdout=cls.output
+        )
+
+    def test_counts(self):
+        """Создается ровно заказанное число записей."""
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 600)
+        self.assertIn('Загружено post: 300', self.output.getvalue())
+
+    def test_derived_state(self):
+        """Счетчики, ленты и рейтинг собраны, как после сигналов."""
+        counters = UserCounters.objects.get(
+            user=Post.objects.first().author
+        )
+        self.assertEqual(
+            counters.posts_count,
+            Post.objects.filter(author=counters.user).count()
+        )
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 600
+        )
+        follow = Follow.objects.filter(author__posts__isnull=False).first()
+        self.assertTrue(Timeline.objects.filter(user=follow.user).exists())
+        self.assertEqual(HotPost.objects.count(), 300)
+
+    def test_author_skew(self):
+        """Самый плодовитый автор пишет много больше среднего."""
+        top = Post.objects.values('author').annotate(
+            total=Count('pk')
+        ).order_by('-total')[0]['total']
+        self.assertGreater(top, 300 / 40 * 5)
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')
+        ).exists())
+
+    def test_dates_follow_ids(self):
+        """Даты постов растут вместе с id."""
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+
+
+class SkewedTests(TestCase):
+    """Класс тестирования перекошенной выборки."""
+
+    def test_bounds_and_skew(self):
+        """Индексы в пределах размера, первые выпадают чаще."""
+        rng = random.Random(1)
+        picks = [seeding.skewed(rng, 100, 4) for _ in range(10000)]
+        self.assertEqual((min(picks), max(picks) < 100), (0, True))
+        self.assertGreater(sum(pick < 10 for pick in picks), 4000)
+        uniform = [seeding.skewed(rng, 100, 1) for _ in range(10000)]
+        self.assertLess(sum(pick < 10 for pick in uniform), 1500)
+
+
+class BenchTests(TestCase):
+    """Класс тестирования замеров маршрутов."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        call_command(
+            'seed_data', users=20, groups=2, posts=60, comments=100,
+            follows=4, stdout=StringIO()
+        )
+
+    def test_percentile(self):
+        """Перцентиль по ближайшему рангу."""
+        samples = list(range(1, 101))
+        self.assertEqual(bench.percentile(samples, 0.5), 50)
+        self.assertEqual(bench.percentile(samples, 0.95), 95)
+        self.assertEqual(bench.percentile([7], 0.95), 7)
+
+    def test_measure_without_reset_peak(self):
+        """Без ``reset_peak`` (Python до 3.9) пик все равно считается."""
+        def request():
+            block = bytearray(256 * 1024)
+            return 200, len(block)
+
+        old = SimpleNamespace(
+            start=tracemalloc.start, stop=tracemalloc.stop,
+            get_traced_memory=tracemalloc.get_traced_memory,
+        )
+        with mock.patch.object(bench, 'tracemalloc', old):
+            result = bench.measure(request, repeat=1, warmup=0)
+        self.assertGreaterEqual(result['alloc_peak_kb'], 256)
+
+    def test_compare(self):
+        """Сравнение дает изменение в процентах по общим маршрутам."""
+        old = {'routes': {'a': {'p50_ms': 10.0, 'queries': 4}}}
+        new = {'routes': {
+            'a': {'p50_ms': 12.0, 'queries': 4}, 'b': {'p50_ms': 1.0},
+        }}
+        self.assertEqual(bench.compare(old, new, ('p50_ms', 'queries')), {
+            'a': {'p50_ms': (10.0, 12.0, 20.0), 'queries': (4, 4, 0.0)},
+        })
+
+    def test_every_route(self):
+        """Каждый маршрут замерен без ошибок и записан в JSON."""
+        path = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        follows = set(Follow.objects.values_list('user', 'author'))
+        call_command(
+            'bench_views', repeat=2, warmup=1, alloc_repeat=1, output=path,
+            stdout=StringIO()
+        )
+        with open(path, encoding='utf-8') as stream:
+            data = json.load(stream)
+        self.assertEqual(
+            set(data['routes']),
+            {f'posts:{pattern.name}' for pattern in urls.urlpatterns}
+        )
+        for name, result in data['routes'].items():
+            with self.subTest(name=name):
+                self.assertLess(result['status'], 400)
+                self.assertGreater(result['queries'], 0)
+                self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+        self.assertEqual(data['meta']['rows']['post'], 60)
+        # Маршруты подписки не оставляют следов.
+        self.assertEqual(
+            set(Follow.objects.values_list('user', 'author')), follows
+        )
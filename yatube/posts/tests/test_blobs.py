@@ -0,0 +1,161 @@
+import io
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.storage import content_storage
+from .. import blobs, thumbnails
+from ..models import ImageBlob, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='meme.jpg', color='navy'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 100), color).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def run_on_commit():
+    # TestCase не фиксирует транзакцию, поэтому колбэки вызываются сразу.
+    return mock.patch('posts.blobs.transaction.on_commit', lambda f: f())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TestCase):
+    """Класс тестирования хранения картинок по содержимому."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, image):
+        return Post.objects.create(author=self.user, text='Мем', image=image)
+
+    def test_same_bytes_are_stored_once(self):
+        """Одинаковые загрузки делят один файл."""
+        first = self.create_post(make_image('first.jpg'))
+        second = self.create_post(make_image('second.JPG'))
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(content_storage.path(first.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(ImageBlob.objects.get().refs, 2)
+
+    def test_name_is_content_hash(self):
+        """Имя файла — хеш содержимого с расширением исходного имени."""
+        name = content_storage.save('posts/Meme.PNG', ContentFile(b'data'))
+        self.assertEqual(
+            name,
+            'posts/3a/3a6eb0790f39ac87c94f3856b2dd2c5d'
+            '110e6811602261a9a923d3bb23adc8b7.png'
+        )
+        mode = os.stat(content_storage.path(name)).st_mode & 0o777
+        self.assertEqual(mode, 0o644)
+
+    def test_last_reference_removes_file(self):
+        """Файл удаляется вместе с последним постом."""
+        first = self.create_post(make_image())
+        second = self.create_post(make_image())
+        name = first.image.name
+        thumbnails.schedule(name)
+        thumbnail = thumbnails.thumbnail_file(
+            first.image, '960x339', settings.THUMBNAIL_GEOMETRIES['960x339']
+        )
+        self.assertTrue(thumbnail.exists())
+        with run_on_commit():
+            first.delete()
+            self.assertTrue(content_storage.exists(name))
+            second.delete()
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(thumbnail.exists())
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_replaced_image_is_released(self):
+        """Замена картинки снимает ссылку со старого файла."""
+        post = self.create_post(make_image())
+        old_name = post.image.name
+        with run_on_commit():
+            post.image = make_image(color='red')
+            post.save()
+        self.assertFalse(content_storage.exists(old_name))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', 'refs')),
+            [(post.image.name, 1)]
+        )
+
+    def test_reacquired_file_is_kept(self):
+        """Файл, на который снова сослались, сборка не трогает."""
+        post = self.create_post(make_image())
+        name = post.image.name
+        with mock.patch('posts.blobs.transaction.on_commit') as on_commit:
+            post.delete()
+        self.create_post(make_image())
+        collect = on_commit.call_args[0][0]
+        collect()
+        self.assertTrue(content_storage.exists(name))
+
+    def test_upload_racing_collect_keeps_file(self):
+        """Сборка между сохранением и ссылкой не оставляет пост без файла."""
+        post = self.create_post(make_image())
+        name = post.image.name
+        with mock.patch('posts.blobs.transaction.on_commit') as on_commit:
+            post.delete()
+        collect = on_commit.call_args[0][0]
+        acquire = blobs.acquire
+
+        def racing(name, content=None):
+            # Хранилище уже нашло файл и не стало его писать.
+            collect()
+            acquire(name, content)
+
+        with mock.patch.object(blobs, 'acquire', racing):
+            twin = self.create_post(make_image())
+        self.assertEqual(twin.image.name, name)
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 1)
+
+    def test_collect_command(self):
+        """Команда чинит ссылки и удаляет старые файлы без ссылок."""
+        post = self.create_post(make_image())
+        ImageBlob.objects.update(refs=5)
+        orphan = content_storage.save(
+            'posts/orphan.jpg', make_image(color='red')
+        )
+        fresh = content_storage.save(
+            'posts/fresh.jpg', make_image(color='green')
+        )
+        os.utime(content_storage.path(orphan), (0, 0))
+        out = StringIO()
+        call_command('collect_images', stdout=out)
+        self.assertIn('Исправлено ссылок: 1', out.getvalue())
+        self.assertIn('Удалено файлов: 1', out.getvalue())
+        self.assertFalse(content_storage.exists(orphan))
+        self.assertTrue(content_storage.exists(fresh))
+        self.assertTrue(content_storage.exists(post.image.name))
+        self.assertEqual(ImageBlob.objects.get().refs, 1)
+
+    def test_reconcile_creates_missing_rows(self):
+        """Сверка заводит строки картинкам, у которых их нет."""
+        post = self.create_post(make_image())
+        ImageBlob.objects.all().delete()
+        self.assertEqual(blobs.reconcile(), (1, 0))
+        self.assertEqual(
+            ImageBlob.objects.get(name=post.image.name).refs, 1
+        )
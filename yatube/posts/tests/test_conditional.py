@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import hot, related
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalPageTests(TestCase):
+    """Класс тестирования условных GET-запросов к страницам."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост про котов и собак',
+            group=cls.group,
+        )
+        Post.objects.create(author=cls.author, text='Еще пост про котов')
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def etag(self, client, url):
+        return client.get(url)['ETag']
+
+    def test_not_modified_skips_rendering(self):
+        """Совпавший ETag дает 304 без отрисовки шаблона."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            self.post_url,
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:hot'),
+            reverse('posts:search') + '?q=котов',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertIn('private', response['Cache-Control'])
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertFalse(response.templates)
+
+    def test_last_modified(self):
+        """Last-Modified — время новейшей записи, по нему тоже будет 304."""
+        url = reverse('posts:index')
+        response = self.reader_client.get(url)
+        self.assertIn('Last-Modified', response)
+        response = self.reader_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_changes_etag(self):
+        """Правка поста меняет ETag ленты и страницы поста."""
+        urls = [reverse('posts:index'), self.post_url]
+        before = [self.etag(self.reader_client, url) for url in urls]
+        self.post.text = 'Пост про птиц'
+        self.post.save()
+        after = [self.etag(self.reader_client, url) for url in urls]
+        for old, new in zip(before, after):
+            self.assertNotEqual(old, new)
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        before = self.etag(self.reader_client, self.post_url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertNotEqual(
+            before, self.etag(self.reader_client, self.post_url)
+        )
+
+    def test_user_changes_etag(self):
+        """Разные пользователи получают разные ETag одной страницы."""
+        self.assertNotEqual(
+            self.etag(self.reader_client, self.post_url),
+            self.etag(self.author_client, self.post_url),
+        )
+
+    def test_jobs_change_etag(self):
+        """Пересчет рейтинга и похожих постов меняет ETag их страниц."""
+        hot_url = reverse('posts:hot')
+        before = self.etag(self.reader_client, hot_url)
+        hot.update()
+        self.assertNotEqual(before, self.etag(self.reader_client, hot_url))
+        before = self.etag(self.reader_client, self.post_url)
+        related.build()
+        self.assertNotEqual(
+            before, self.etag(self.reader_client, self.post_url)
+        )
+
+    def test_cached_guest_page(self):
+        """Страница из кеша гостей тоже отвечает 304."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        self.assertNotIn('private', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_post(self):
+        """Несуществующий пост по-прежнему отдает 404 без даты."""
+        url = reverse('posts:post_detail', kwargs={'post_id': 0})
+        response = self.reader_client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_forms_are_not_conditional(self):
+        """Формы создания и правки отрисовываются всегда."""
+        url = reverse('posts:post_create')
+        response = self.author_client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.author_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    """Класс тестирования денормализованных счетчиков."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def refresh(self):
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        return (
+            UserCounters.objects.get(user=self.user),
+            UserCounters.objects.get(user=self.reader),
+        )
+
+    def test_post_counters(self):
+        """Счетчики постов автора и группы следят за постами."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        author, _ = self.refresh()
+        self.assertEqual(author.posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.refresh()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        author, _ = self.refresh()
+        self.assertEqual(author.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Счетчики комментариев и подписок следят за записями."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        Follow.objects.create(user=self.reader, author=self.user)
+        author, reader = self.refresh()
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(reader.following_count, 1)
+        Follow.objects.all().delete()
+        author, reader = self.refresh()
+        self.assertEqual(author.followers_count, 0)
+        self.assertEqual(reader.following_count, 0)
+
+    def test_reconcile_counters(self):
+        """Команда сверки чинит разошедшиеся и пропавшие счетчики."""
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        Group.objects.update(posts_count=7)
+        UserCounters.objects.filter(user=self.user).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        author, _ = self.refresh()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.other_group.posts_count, 0)
+        self.assertEqual(author.posts_count, 1)
+
+    def test_profile_uses_counters(self):
+        """Профиль берет число постов из счетчика, без COUNT(*)."""
+        for i in range(3):
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+        client = Client()
+        url = reverse('posts:profile', args=[self.user.username])
+        response = client.get(url)
+        self.assertEqual(response.context['count_posts'], 3)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..feeds import (
+    MergedFeed, follow_feed, push_followers, rebuild_timeline
+)
+from ..models import CelebrityAuthor, Follow, Post, Timeline
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    """Класс тестирования материализованной ленты подписок."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки'
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(follow_feed(self.reader)), [self.old_post])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(follow_feed(self.reader)[0], new_post)
+        self.assertFalse(follow_feed(self.author).exists())
+
+    def test_unfollow_and_delete_prune_timeline(self):
+        """Отписка и удаление поста чистят ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        new_post.delete()
+        self.assertEqual(Timeline.objects.filter(user=self.reader).count(), 1)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    def test_rebuild_timeline(self):
+        """Пересборка восстанавливает потерянные записи ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Timeline.objects.all().delete()
+        rebuild_timeline(self.reader.pk)
+        self.assertEqual(list(follow_feed(self.reader)), [self.old_post])
+
+
+@override_settings(FEED_CELEBRITY_FOLLOWERS=1)
+class HybridFeedTests(TestCase):
+    """Класс тестирования подмешивания постов популярных авторов."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        for user in (cls.reader, cls.fan):
+            Follow.objects.create(user=user, author=cls.star)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_celebrity_is_not_fanned_out(self):
+        """Посты популярного автора не раскладываются по лентам."""
+        self.assertTrue(CelebrityAuthor.objects.filter(author=self.star))
+        post = Post.objects.create(author=self.star, text='Пост звезды')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+
+    def test_unmarked_author_above_threshold_is_promoted(self):
+        """Автор с подписками в обход сигналов отмечается перед раскладкой."""
+        CelebrityAuthor.objects.filter(author=self.star).delete()
+        self.assertEqual(push_followers(self.star.pk), [])
+        self.assertTrue(CelebrityAuthor.objects.filter(author=self.star))
+        post = Post.objects.create(author=self.star, text='Пост звезды')
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        self.assertIn(post, follow_feed(self.reader))
+        self.assertEqual(push_followers(self.author.pk), [self.reader.pk])
+
+    def test_streams_are_merged_by_date(self):
+        """Лента сливает разложенные и подмешанные посты по дате."""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate(
+                (self.star, self.author, self.star, self.author)
+            )
+        ]
+        feed = follow_feed(self.reader)
+        self.assertIsInstance(feed, MergedFeed)
+        self.assertEqual(feed.count(), 4)
+        self.assertEqual(list(feed), posts[::-1])
+        self.assertEqual(feed[1:3], posts[2:0:-1])
+        self.assertEqual(feed.filter(author=self.star).count(), 2)
+
+    def test_numbered_pages_of_merged_feed(self):
+        """Старые номера страниц листают слитую ленту."""
+        posts = [
+            Post.objects.create(
+                author=(self.star, self.author)[i % 2], text=f'Пост {i}'
+            )
+            for i in range(15)
+        ]
+        self.assertEqual(follow_feed(self.reader).count(), 15)
+        client = Client()
+        client.force_login(self.reader)
+        cache.clear()
+        response = client.get(reverse('posts:follow_index') + '?page=2')
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(page), posts[::-1][10:])
+
+    def test_celebrity_demotion_backfills_timelines(self):
+        """Автор, растерявший подписчиков, снова раскладывает посты."""
+        post = Post.objects.create(author=self.star, text='Пост звезды')
+        with self.settings(FEED_CELEBRITY_FOLLOWERS=2):
+            Follow.objects.filter(user=self.fan, author=self.star).delete()
+        self.assertFalse(CelebrityAuthor.objects.filter(author=self.star))
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=post).exists()
+        )
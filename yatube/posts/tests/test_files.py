@@ -0,0 +1,187 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import Client, SimpleTestCase, override_settings
+
+TEMP_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+MEDIA_ROOT = os.path.join(TEMP_ROOT, 'media')
+STATIC_SOURCE = os.path.join(TEMP_ROOT, 'static')
+STATIC_ROOT = os.path.join(TEMP_ROOT, 'collected')
+CONTENT = bytes(range(256)) * 4
+STYLE = b'body { color: black; }\n' * 200
+
+
+def body(response):
+    return b''.join(response.streaming_content)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaServingTests(SimpleTestCase):
+    """Класс тестирования раздачи медиафайлов."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, 'posts', 'file.bin'), 'wb') as f:
+            f.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        self.client = Client()
+        self.url = '/media/posts/file.bin'
+
+    def test_file(self):
+        """Файл отдается целиком с валидаторами и сроком кеша."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body(response), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(
+            response['Cache-Control'],
+            f'public, max-age={settings.MEDIA_MAX_AGE}'
+        )
+        self.assertIn('Last-Modified', response)
+
+    def test_not_modified(self):
+        """Совпавший ETag дает 304."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_ranges(self):
+        """Один диапазон отдается ответом 206."""
+        size = len(CONTENT)
+        cases = {
+            'bytes=2-5': (2, 5),
+            'bytes=1000-': (1000, size - 1),
+            'bytes=-4': (size - 4, size - 1),
+            'bytes=1020-5000': (1020, size - 1),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(body(response), CONTENT[start:end + 1])
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}'
+                )
+                self.assertEqual(
+                    response['Content-Length'], str(end - start + 1)
+                )
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за концом файла дает 416."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_full_file_instead_of_range(self):
+        """Несколько диапазонов или устаревший If-Range дают весь файл."""
+        etag = self.client.get(self.url)['ETag']
+        for headers in (
+            {'HTTP_RANGE': 'bytes=0-1,5-6'},
+            {'HTTP_RANGE': 'bytes=0-1', 'HTTP_IF_RANGE': '"old"'},
+            {'HTTP_RANGE': 'items=0-1'},
+        ):
+            with self.subTest(headers=headers):
+                response = self.client.get(self.url, **headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(body(response), CONTENT)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 206)
+
+    def test_head(self):
+        """HEAD отдает заголовки без тела."""
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response.content, b'')
+
+    def test_missing_and_outside_files(self):
+        """Несуществующие файлы и пути вне каталога дают 404."""
+        for url in (
+            '/media/posts/missing.bin', '/media/posts/',
+            '/media/../yatube/settings.py',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_session_is_not_read(self):
+        """Файлы отдаются до сессий: SimpleTestCase не пустит к базе."""
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'session'
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+@override_settings(STATICFILES_DIRS=[STATIC_SOURCE], STATIC_ROOT=STATIC_ROOT)
+class StaticServingTests(SimpleTestCase):
+    """Класс тестирования статики с отпечатками и сжатыми копиями."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        os.makedirs(os.path.join(STATIC_SOURCE, 'css'), exist_ok=True)
+        with open(os.path.join(STATIC_SOURCE, 'css', 'site.css'), 'wb') as f:
+            f.write(STYLE)
+        with open(os.path.join(STATIC_SOURCE, 'css', 'noise.js'), 'wb') as f:
+            f.write(os.urandom(2000))
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        self.client = Client()
+        self.url = static('css/site.css')
+
+    def test_fingerprinted_name(self):
+        """Ссылка ведет на имя с отпечатком, и оно кешируется надолго."""
+        self.assertRegex(self.url, r'^/static/css/site\.[0-9a-f]{12}\.css$')
+        response = self.client.get(self.url)
+        self.assertEqual(body(response), STYLE)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_precompressed(self):
+        """Сжатая копия отдается тому, кто ее принимает."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body(response)), STYLE)
+        refused = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity'
+        )
+        self.assertNotIn('Content-Encoding', refused)
+        self.assertNotEqual(response['ETag'], refused['ETag'])
+
+    def test_incompressible_file(self):
+        """Файл, который не сжимается, лежит без сжатой копии."""
+        response = self.client.get(
+            static('css/noise.js'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_original_name_is_revalidated(self):
+        """Имя без отпечатка браузер перепроверяет при каждом запросе."""
+        response = self.client.get('/static/css/site.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
@@ -0,0 +1,125 @@
+import math
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.queries import capture
+from .. import hot
+from ..models import Comment, HotPost, Post
+
+User = get_user_model()
+HOUR = 60 * 60
+
+
+@override_settings(HOT_FEED_HALF_LIFE=HOUR, HOT_FEED_COMMENT_WEIGHT=2)
+class HotFeedTests(TestCase):
+    """Класс тестирования ленты обсуждаемого."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.now = timezone.now()
+
+    def create_post(self, hours_ago):
+        post = Post.objects.create(author=self.user, text='Пост')
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=self.now - timedelta(hours=hours_ago)
+        )
+        return post
+
+    def comment(self, post, hours_ago):
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        Comment.objects.filter(pk=comment.pk).update(
+            created=self.now - timedelta(hours=hours_ago)
+        )
+
+    def ranked(self):
+        return list(hot.hot_posts().order_by(*hot.HOT_ORDERING))
+
+    def test_recent_discussion_beats_fresh_post(self):
+        """Пост с недавними комментариями выше нового без них."""
+        discussed = self.create_post(hours_ago=3)
+        for _ in range(3):
+            self.comment(discussed, hours_ago=0)
+        fresh = self.create_post(hours_ago=0)
+        self.assertEqual(hot.update(), (2, 3))
+        self.assertEqual(self.ranked(), [discussed, fresh])
+
+    def test_old_discussion_decays(self):
+        """Давнее обсуждение уступает свежему посту."""
+        old = self.create_post(hours_ago=24)
+        for _ in range(10):
+            self.comment(old, hours_ago=20)
+        fresh = self.create_post(hours_ago=0)
+        hot.update()
+        self.assertEqual(self.ranked(), [fresh, old])
+
+    def test_score_is_log_of_decayed_sum(self):
+        """Рейтинг — логарифм суммы затухающих вкладов."""
+        post = self.create_post(hours_ago=2)
+        self.comment(post, hours_ago=1)
+        hot.update()
+        tau = HOUR / math.log(2)
+        seconds = (self.now - hot.EPOCH).total_seconds()
+        expected = math.log(
+            math.exp((seconds - 2 * HOUR) / tau - seconds / tau)
+            + 2 * math.exp((seconds - HOUR) / tau - seconds / tau)
+        ) + seconds / tau
+        self.assertAlmostEqual(HotPost.objects.get().score, expected)
+
+    def test_new_comments_are_added_incrementally(self):
+        """Повторный запуск учитывает только новые комментарии."""
+        first = self.create_post(hours_ago=1)
+        second = self.create_post(hours_ago=0)
+        hot.update()
+        self.assertEqual(self.ranked(), [second, first])
+        self.comment(first, hours_ago=0)
+        self.assertEqual(hot.update(), (0, 1))
+        self.assertEqual(hot.update(), (0, 0))
+        self.assertEqual(self.ranked(), [first, second])
+        incremental = HotPost.objects.get(post=first).score
+        hot.update(full=True)
+        self.assertAlmostEqual(
+            HotPost.objects.get(post=first).score, incremental
+        )
+
+    def test_log_add_does_not_overflow(self):
+        """Сложение в логарифмах работает и через сотни лет."""
+        self.assertAlmostEqual(
+            hot._log_add(10 ** 6, 10 ** 6), 10 ** 6 + math.log(2)
+        )
+
+    def test_page_is_range_read(self):
+        """Страница читает рейтинг по индексу, без комментариев."""
+        posts = [self.create_post(hours_ago=hours) for hours in range(12)]
+        self.comment(posts[-1], hours_ago=0)
+        hot.update()
+        client = Client()
+        with capture() as log:
+            response = client.get(reverse('posts:hot'))
+        self.assertNotIn('posts_comment', ' '.join(log.statements))
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), self.ranked()[:10])
+        response = client.get(
+            reverse('posts:hot'), {'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), [
+            post for post in self.ranked()[10:]
+        ])
+
+    def test_command(self):
+        """Команда сообщает, сколько учтено."""
+        self.comment(self.create_post(hours_ago=0), hours_ago=0)
+        out = StringIO()
+        call_command('update_hot_posts', stdout=out)
+        self.assertIn('Новых постов: 1, учтено комментариев: 1',
+                      out.getvalue())
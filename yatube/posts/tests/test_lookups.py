@@ -0,0 +1,159 @@
+import pickle
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import metrics
+from ..lookups import (
+    LOOKUP_METRICS, get_group_or_404, get_user_or_404, groups, users
+)
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class LookupCacheTests(TestCase):
+    """Класс тестирования кеша поиска групп и пользователей."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        cache.clear()
+        groups.clear_local()
+        users.clear_local()
+
+    def test_steady_state_costs_no_queries(self):
+        """Повторный поиск обходится без запросов к базе."""
+        get_group_or_404(self.group.slug)
+        get_user_or_404(self.user.username)
+        with self.assertNumQueries(0):
+            group = get_group_or_404(self.group.slug)
+            user = get_user_or_404(self.user.username)
+        self.assertEqual(group, self.group)
+        self.assertEqual(user, self.user)
+
+    def test_second_tier_serves_other_processes(self):
+        """После сброса локального уровня объект берется из общего кеша."""
+        get_group_or_404(self.group.slug)
+        groups.clear_local()
+        with self.assertNumQueries(0):
+            get_group_or_404(self.group.slug)
+
+    def test_metrics(self):
+        """Попадания и промахи обоих уровней считаются."""
+        metrics.reset(LOOKUP_METRICS)
+        get_group_or_404(self.group.slug)
+        get_group_or_404(self.group.slug)
+        groups.clear_local()
+        get_group_or_404(self.group.slug)
+        self.assertEqual(metrics.snapshot(groups.metrics), {
+            'lookup.group.l1.hit': 1,
+            'lookup.group.l1.miss': 2,
+            'lookup.group.l2.hit': 1,
+            'lookup.group.l2.miss': 1,
+        })
+
+    def test_first_tier_hits_stay_in_process(self):
+        """Попадание в первый уровень не пишет в общий кеш."""
+        metrics.reset(LOOKUP_METRICS)
+        get_group_or_404(self.group.slug)
+        with mock.patch.object(metrics.cache, 'incr') as incr:
+            for _ in range(5):
+                get_group_or_404(self.group.slug)
+        incr.assert_not_called()
+        self.assertEqual(
+            metrics.snapshot(groups.metrics)['lookup.group.l1.hit'], 5
+        )
+
+    def test_group_page_counts_posts_in_database(self):
+        """Число постов для страниц группы не берется из кеша поиска."""
+        get_group_or_404(self.group.slug)
+        # Другой процесс добавил посты: здесь кеш поиска еще старый.
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {number}', group=self.group)
+            for number in range(11)
+        )
+        Group.objects.filter(pk=self.group.pk).update(posts_count=11)
+        response = Client().get(
+            reverse('posts:group_posts', args=[self.group.slug]) + '?page=2'
+        )
+        self.assertEqual(response.context['page_obj'].number, 2)
+
+    def test_missing_object_raises_404(self):
+        """Несуществующий объект дает 404 и не кешируется."""
+        with self.assertRaises(Http404):
+            get_group_or_404('missing')
+        Group.objects.create(title='Новая', slug='missing')
+        self.assertEqual(get_group_or_404('missing').title, 'Новая')
+
+    def test_only_shown_fields_are_cached(self):
+        """В общий кеш не попадают хеш пароля, почта и счетчики."""
+        self.user.email = 'auth@example.com'
+        self.user.save()
+        get_user_or_404(self.user.username)
+        get_group_or_404(self.group.slug)
+        self.assertEqual(
+            pickle.loads(cache.get(users._key(self.user.username))),
+            (self.user.pk, self.user.username, '', '')
+        )
+        self.assertEqual(
+            pickle.loads(cache.get(groups._key(self.group.slug))),
+            (
+                self.group.pk, self.group.title, self.group.slug,
+                self.group.description,
+            )
+        )
+        with self.assertNumQueries(0):
+            user = get_user_or_404(self.user.username)
+            self.assertEqual(user.username, self.user.username)
+        self.assertEqual(user.email, 'auth@example.com')
+
+    def test_returns_independent_copies(self):
+        """Изменения объекта в одном запросе не попадают в кеш."""
+        get_group_or_404(self.group.slug).title = 'Изменено'
+        self.assertEqual(
+            get_group_or_404(self.group.slug).title, self.group.title
+        )
+
+    def test_group_changes_invalidate(self):
+        """Изменение группы и ее постов сбрасывает кеш."""
+        group = get_group_or_404(self.group.slug)
+        posts_count = group.posts_count
+        Post.objects.create(author=self.user, text='Пост', group=group)
+        self.assertEqual(
+            get_group_or_404(self.group.slug).posts_count, posts_count + 1
+        )
+        group.slug = 'new-slug'
+        group.save()
+        with self.assertRaises(Http404):
+            get_group_or_404(self.group.slug)
+        self.assertEqual(get_group_or_404('new-slug').pk, group.pk)
+        group.delete()
+        with self.assertRaises(Http404):
+            get_group_or_404('new-slug')
+
+    def test_user_changes_invalidate(self):
+        """Переименование и удаление пользователя сбрасывают кеш."""
+        user = get_user_or_404(self.user.username)
+        user.username = 'renamed'
+        user.save()
+        with self.assertRaises(Http404):
+            get_user_or_404(self.user.username)
+        self.assertEqual(get_user_or_404('renamed').pk, user.pk)
+        user.delete()
+        with self.assertRaises(Http404):
+            get_user_or_404('renamed')
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.mmap_cache import MmapCache
+
+SMALL_CLASSES = ((256, 2), (1024, 1))
+
+
+def _incr_many(location, times):
+    cache = MmapCache(location, {'OPTIONS': {'SIZE': 4 * 1024 * 1024}})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class MmapCacheTests(SimpleTestCase):
+    """Класс тестирования общего кеша в файле."""
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        options.setdefault('SIZE', 4 * 1024 * 1024)
+        return MmapCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """Кеш поддерживает основной API Django."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertTrue(self.cache.has_key('key'))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertTrue(self.cache.add('other', 2))
+        self.assertEqual(self.cache.incr('other', 3), 5)
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('other'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_many(self):
+        """Пакетные операции читают и пишут все ключи."""
+        data = {f'key-{number}': number for number in range(50)}
+        self.cache.set_many(data)
+        self.assertEqual(self.cache.get_many(list(data) + ['none']), data)
+        self.cache.delete_many(list(data)[:25])
+        self.assertEqual(len(self.cache.get_many(list(data))), 25)
+
+    def test_expiration(self):
+        """Просроченное значение не возвращается."""
+        self.cache.set('key', 'value', timeout=0.05)
+        self.cache.set('forever', 'value', timeout=None)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_shared_between_instances(self):
+        """Запись одного экземпляра видна другому с тем же файлом."""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+
+    def test_changed_geometry_resets_file(self):
+        """Файл другой геометрии пересоздается пустым."""
+        self.cache.set('key', 'value')
+        cache = self.make_cache(CLASSES=SMALL_CLASSES)
+        self.assertIsNone(cache.get('key'))
+
+    def test_value_moves_between_classes(self):
+        """Значение, выросшее до другого класса, не двоится."""
+        self.cache.set('key', 'x')
+        self.cache.set('key', 'x' * 3000)
+        self.assertEqual(self.cache.get('key'), 'x' * 3000)
+        self.cache.set('key', 'y')
+        self.assertEqual(self.cache.get('key'), 'y')
+
+    def test_too_large_value_is_not_stored(self):
+        """Значение больше самого крупного слота не кешируется."""
+        cache = self.make_cache(CLASSES=SMALL_CLASSES, SIZE=1)
+        cache.set('key', 'small')
+        cache.set('key', 'x' * 2000)
+        self.assertIsNone(cache.get('key'))
+
+    def test_lru_eviction(self):
+        """В заполненном наборе вытесняется давно не читанный ключ."""
+        cache = self.make_cache(CLASSES=((256, 2),), SIZE=1)
+        cache.set('first', 1)
+        cache.set('second', 2)
+        cache.get('first')
+        cache.set('third', 3)
+        self.assertEqual(
+            cache.get_many(['first', 'second', 'third']),
+            {'first': 1, 'third': 3}
+        )
+
+    def test_incr_is_atomic_between_processes(self):
+        """Одновременные увеличения из разных процессов не теряются."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_incr_many, args=(self.location, 200))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 800)
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import metrics
+from core.middleware import PAGE_CACHE_HIT, PAGE_CACHE_METRICS
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    """Класс тестирования полностраничного кеша для анонимов."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный запрос анонима отдается из кеша без запросов к БД."""
+        for url in PageCacheTests.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    cached = self.guest_client.get(url)
+                self.assertEqual(cached.content, response.content)
+        self.assertEqual(
+            metrics.snapshot(PAGE_CACHE_METRICS)[PAGE_CACHE_HIT],
+            len(PageCacheTests.urls)
+        )
+
+    def test_authenticated_pages_are_not_cached(self):
+        """Страницы авторизованных пользователей не кешируются целиком."""
+        client = Client()
+        client.force_login(PageCacheTests.user)
+        client.get(PageCacheTests.urls[0])
+        client.get(PageCacheTests.urls[0])
+        self.assertEqual(
+            metrics.snapshot(PAGE_CACHE_METRICS)[PAGE_CACHE_HIT], 0
+        )
+
+    def test_signals_purge_pages(self):
+        """Изменения моделей сбрасывают зависящие от них страницы."""
+        index, group_url, profile_url, detail_url = PageCacheTests.urls
+        for url in PageCacheTests.urls:
+            self.guest_client.get(url)
+        Post.objects.create(author=PageCacheTests.user, text='Новый пост')
+        self.assertContains(self.guest_client.get(index), 'Новый пост')
+        self.assertContains(self.guest_client.get(profile_url), 'Новый пост')
+        Comment.objects.create(
+            post=PageCacheTests.post,
+            author=PageCacheTests.user,
+            text='Новый комментарий'
+        )
+        self.assertContains(
+            self.guest_client.get(detail_url), 'Новый комментарий'
+        )
+        PageCacheTests.group.description = 'Новое описание'
+        PageCacheTests.group.save()
+        self.assertContains(
+            self.guest_client.get(group_url), 'Новое описание'
+        )
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=PageCacheTests.user)
+        self.assertContains(
+            self.guest_client.get(profile_url), 'Подписчиков: 1'
+        )
@@ -0,0 +1,151 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.queries import QueryBudgetExceeded, capture
+from core.testing import assert_query_budget
+from ..lookups import groups, users
+from ..models import CelebrityAuthor, Comment, Follow, Group, Post
+from ..urls import app_name, urlpatterns
+
+User = get_user_model()
+AUTHORS = 12
+
+
+class QueryBudgetTests(TestCase):
+    """Класс тестирования бюджета запросов страниц."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        # Больше страницы постов разных авторов: N+1 сразу виден.
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(AUTHORS)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            cls.post = Post.objects.create(
+                author=author, text='Тестовый пост', group=cls.group
+            )
+        for author in cls.authors:
+            Comment.objects.create(
+                post=cls.post, author=author, text='Комментарий'
+            )
+        cls.author = cls.authors[-1]
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        cache.clear()
+        groups.clear_local()
+        users.clear_local()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def test_every_route_has_budget(self):
+        """У каждого маршрута приложения posts задан бюджет."""
+        for pattern in urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertIn(
+                    f'{app_name}:{pattern.name}', settings.QUERY_BUDGETS
+                )
+
+    def test_read_pages_within_budget(self):
+        """Страницы чтения укладываются в бюджет для всех посетителей."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=пост',
+            reverse('posts:hot'),
+            reverse('posts:api_index'),
+            reverse('posts:api_group_posts', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.author.username]),
+            reverse('posts:api_follow_index'),
+        )
+        for client in (self.guest_client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    # Холодный кеш всех уровней, как в новом процессе.
+                    cache.clear()
+                    groups.clear_local()
+                    users.clear_local()
+                    assert_query_budget(client, url)
+
+    def test_follow_page_within_budget(self):
+        """Лента подписок на всех авторов укладывается в бюджет."""
+        self.authorized_client.force_login(self.reader)
+        assert_query_budget(
+            self.authorized_client, reverse('posts:follow_index')
+        )
+
+    def test_follow_with_celebrity_within_budget(self):
+        """Слитая с лентой знаменитости лента не считает свои выборки."""
+        CelebrityAuthor.objects.create(author=self.authors[0])
+        self.authorized_client.force_login(self.reader)
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?page=2',
+            reverse('posts:api_follow_index'),
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                response = assert_query_budget(self.authorized_client, url)
+                self.assertEqual(response.status_code, 200)
+        # Курсор страницы не должен вычитывать выборки целиком.
+        assert_query_budget(self.authorized_client, response.json()['next'])
+
+    def test_writes_within_budget(self):
+        """Запись постов, комментариев и подписок укладывается в бюджет."""
+        other = self.authors[0].username
+        requests = (
+            ('post', reverse('posts:post_create'),
+             {'text': 'Новый пост', 'group': self.group.pk}),
+            ('post', reverse('posts:post_edit', args=[self.post.pk]),
+             {'text': 'Измененный пост'}),
+            ('post', reverse('posts:add_comment', args=[self.post.pk]),
+             {'text': 'Новый комментарий'}),
+            ('get', reverse('posts:profile_follow', args=[other]), None),
+            ('get', reverse('posts:profile_unfollow', args=[other]), None),
+        )
+        for method, url, data in requests:
+            with self.subTest(url=url):
+                response = assert_query_budget(
+                    self.authorized_client, url, method, data=data
+                )
+                self.assertEqual(response.status_code, 302)
+
+    def test_capture_counts_duplicates(self):
+        """Повторы одного и того же SQL считаются."""
+        with capture() as log:
+            for post in Post.objects.all():
+                post.author.username
+        self.assertEqual(log.count, AUTHORS + 1)
+        self.assertEqual(log.duplicates, AUTHORS - 1)
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': 0}, QUERY_BUDGET_RAISE=True
+    )
+    def test_middleware_raises_over_budget(self):
+        """Превышение бюджета может прерывать запрос ошибкой."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.guest_client.get(reverse('posts:index'))
+
+    def test_server_timing_header(self):
+        """Ответ сообщает число запросов и время базы."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('queries', response['Server-Timing'])
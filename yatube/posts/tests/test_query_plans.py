@@ -0,0 +1,142 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import hot
+from ..feeds import MergedFeed, follow_feed
+from ..models import CelebrityAuthor, Comment, Follow, Group, Post
+
+User = get_user_model()
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+# Формы создания и редактирования поста показывают список всех групп.
+ALLOWED_SCANS = {'posts_group'}
+
+
+def plan_problems(sql):
+    """Возвращает строки плана с сортировкой во временном дереве
+    или полным просмотром таблицы.
+
+    Просмотр подзапроса (``SCAN subquery``) проблемой не считается:
+    его собственный план проверяется отдельными строками.
+    """
+    tables = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        details = [row[-1] for row in cursor.fetchall()]
+    problems = []
+    for detail in details:
+        if 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+        match = FULL_SCAN.match(detail)
+        if (
+            match and 'INDEX' not in detail
+            and match.group(1) in tables
+            and match.group(1) not in ALLOWED_SCANS
+        ):
+            problems.append(detail)
+    return problems
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов для SQLite.')
+class QueryPlanTests(TestCase):
+    """Класс проверки планов запросов страниц приложения posts."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                text=f'Текст поста {i}',
+                group=cls.group
+            )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        hot.update()
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        self.author = Client()
+        self.author.force_login(QueryPlanTests.user)
+        self.reader = Client()
+        self.reader.force_login(QueryPlanTests.reader)
+
+    def assert_plans(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(plan_problems(sql), [])
+
+    def test_feed_plans(self):
+        """Ленты читаются по индексам без сортировки во временном дереве."""
+        post = QueryPlanTests.post
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[QueryPlanTests.group.slug]),
+            reverse('posts:profile', args=[QueryPlanTests.user.username]),
+            reverse('posts:follow_index'),
+            reverse('posts:hot'),
+            reverse('posts:post_detail', args=[post.pk]),
+        )
+        for url in urls:
+            for query in ('', '?page=2', '?cursor='):
+                self.assert_plans(self.reader, url + query)
+            response = self.reader.get(url + '?cursor=')
+            page_obj = response.context.get('page_obj')
+            if page_obj is not None and page_obj.has_next():
+                self.assert_plans(
+                    self.reader, f'{url}?cursor={page_obj.next_cursor}'
+                )
+
+    def test_api_plans(self):
+        """JSON API читает ленты по индексам на всех страницах."""
+        feeds = (
+            ('posts:api_index', []),
+            ('posts:api_group_posts', [QueryPlanTests.group.slug]),
+            ('posts:api_profile', [QueryPlanTests.user.username]),
+            ('posts:api_follow_index', []),
+        )
+        for name, args in feeds:
+            url = reverse(name, args=args)
+            self.assert_plans(self.reader, url)
+            self.assert_plans(self.reader, self.reader.get(url).json()['next'])
+
+    def test_form_plans(self):
+        """Формы создания и редактирования не сканируют посты."""
+        for url in (
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', args=[QueryPlanTests.post.pk]),
+        ):
+            self.assert_plans(self.author, url)
+
+    def test_celebrity_stream_plan(self):
+        """Посты популярных авторов читаются по индексу автора."""
+        CelebrityAuthor.objects.create(author=QueryPlanTests.user)
+        feed = follow_feed(QueryPlanTests.reader)
+        self.assertIsInstance(feed, MergedFeed)
+        for queryset in feed.querysets:
+            sql, params = queryset[:11].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                details = [row[-1] for row in cursor.fetchall()]
+            self.assertFalse(
+                [detail for detail in details if 'TEMP B-TREE' in detail]
+            )
@@ -0,0 +1,156 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import related
+from ..models import Post, RelatedPost
+
+User = get_user_model()
+TEXTS = {
+    'milk': 'Кошка любит молоко и сметану',
+    'morning': 'Кошка пьет молоко утром',
+    'sleep': 'Рыжая кошка спит на диване',
+    'bone': 'Собака грызет кость во дворе',
+    'guard': 'Собака охраняет двор и прячет кость',
+    'garden': 'На огороде морковь, капуста и свекла',
+    'harvest': 'Капуста и морковь выросли к осени',
+    'rocket': 'Ракета улетела на орбиту',
+}
+
+
+def neighbours_of(post):
+    return [post.pk for post in related.related_posts(post.pk)]
+
+
+class RelatedPostsTests(TestCase):
+    """Класс тестирования похожих постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        self.posts = {
+            name: Post.objects.create(author=self.user, text=text)
+            for name, text in TEXTS.items()
+        }
+
+    def test_neighbours_share_words(self):
+        """Соседи поста — посты о том же, самый близкий первым."""
+        self.assertEqual(related.build(), len(TEXTS))
+        posts = self.posts
+        self.assertEqual(neighbours_of(posts['milk']), [
+            posts['morning'].pk, posts['sleep'].pk
+        ])
+        self.assertEqual(neighbours_of(posts['bone']), [posts['guard'].pk])
+        self.assertEqual(neighbours_of(posts['rocket']), [])
+
+    def test_incremental_build(self):
+        """Повторный запуск считает только новые посты."""
+        related.build()
+        post = Post.objects.create(
+            author=self.user, text='Собака нашла кость'
+        )
+        self.assertEqual(related.build(), 1)
+        self.assertEqual(neighbours_of(post), [
+            self.posts['bone'].pk, self.posts['guard'].pk
+        ])
+        self.assertIn(post.pk, neighbours_of(self.posts['bone']))
+
+    @override_settings(RELATED_POSTS_LIMIT=1)
+    def test_new_post_replaces_worse_neighbour(self):
+        """Новый пост вытесняет худшего соседа старого поста."""
+        related.build()
+        milk = self.posts['milk']
+        self.assertEqual(neighbours_of(milk), [self.posts['morning'].pk])
+        twin = Post.objects.create(
+            author=self.user, text='Кошка любит молоко и сметану'
+        )
+        related.build()
+        self.assertEqual(neighbours_of(milk), [twin.pk])
+        self.assertEqual(neighbours_of(self.posts['rocket']), [])
+
+    @override_settings(RELATED_POSTS_LIMIT=1)
+    def test_floor_is_worst_neighbour(self):
+        """Порог поста — сходство его худшего соседа."""
+        related.build()
+        ids = sorted(post.pk for post in self.posts.values())
+        position = {pk: index for index, pk in enumerate(ids)}
+        floors = related._floors(ids, position, 1, [])
+        milk = self.posts['milk']
+        self.assertEqual(
+            floors[position[milk.pk]], milk.neighbours.get().score
+        )
+        self.assertEqual(floors[position[self.posts['rocket'].pk]], 0.0)
+
+    def test_lonely_post_is_not_recomputed(self):
+        """Пост без похожих не пересчитывается при каждом запуске."""
+        related.build()
+        self.assertEqual(neighbours_of(self.posts['rocket']), [])
+        self.assertEqual(related.build(), 0)
+
+    def test_edit_recomputes_neighbours(self):
+        """Правка текста стирает соседей, и их считают заново."""
+        related.build()
+        post = self.posts['rocket']
+        post.text = 'Ракета и собака полетели на орбиту'
+        post.save()
+        self.assertFalse(post.neighbours.exists())
+        related.build()
+        self.assertEqual(neighbours_of(post)[0], self.posts['bone'].pk)
+
+    def test_deleted_post_leaves_lists(self):
+        """Удаленный пост пропадает из списков соседей."""
+        related.build()
+        self.posts['guard'].delete()
+        self.assertEqual(neighbours_of(self.posts['bone']), [])
+
+    def test_full_rebuild(self):
+        """Полный пересчет не оставляет дублей."""
+        related.build()
+        count = RelatedPost.objects.count()
+        self.assertEqual(related.build(full=True), len(TEXTS))
+        self.assertEqual(RelatedPost.objects.count(), count)
+
+    def test_python_and_sparse_agree(self):
+        """Обе реализации находят одних и тех же соседей."""
+        vectors = related.Vectors(list(TEXTS.values()))
+        targets = list(range(len(TEXTS)))
+        floors = [0.3] * len(TEXTS)
+        expected = list(related.python_neighbours(vectors, targets, 2, floors))
+        if related.sparse is None:
+            self.skipTest('нужны NumPy и SciPy')
+        actual = list(related.numpy_neighbours(vectors, targets, 2, floors))
+        for (_, best, closer), (_, sparse_best, sparse_closer) in zip(
+            expected, actual
+        ):
+            self.assertEqual(
+                [pk for pk, _ in best], [pk for pk, _ in sparse_best]
+            )
+            self.assertEqual(sorted(closer), sorted(sparse_closer))
+
+    def test_page_reads_precomputed_list(self):
+        """Страница поста показывает готовых соседей, не считая их."""
+        related.build()
+        with mock.patch.object(related, 'neighbours') as neighbours:
+            response = Client().get(reverse(
+                'posts:post_detail', args=[self.posts['milk'].pk]
+            ))
+        neighbours.assert_not_called()
+        self.assertContains(response, 'Похожие записи')
+        self.assertEqual(
+            response.context['related_posts'][0], self.posts['morning']
+        )
+
+    def test_command(self):
+        """Команда сообщает, сколько постов пересчитано."""
+        out = StringIO()
+        call_command('build_related_posts', '--full', stdout=out)
+        self.assertIn(f'Пересчитано постов: {len(TEXTS)}', out.getvalue())
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core import replay
+from ..models import Comment, Follow, Post
+
+
+class ReplayLoadTests(TransactionTestCase):
+    """Класс тестирования воспроизведения нагрузки.
+
+    Потоки ходят в базу своими соединениями, поэтому данные должны быть
+    записаны, а не лежать в транзакции теста.
+    """
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        call_command(
+            'seed_data', users=20, groups=2, posts=80, comments=100,
+            follows=4, stdout=StringIO()
+        )
+        self.path = os.path.join(tempfile.mkdtemp(), 'replay.json')
+
+    def counts(self):
+        return (
+            Post.objects.count(), Comment.objects.count(),
+            set(Follow.objects.values_list('user', 'author')),
+        )
+
+    def test_threads(self):
+        """Каждый уровень выполняет весь сценарий, база остается прежней."""
+        before = self.counts()
+        call_command(
+            'replay_load', requests=60, concurrency=[1, 3], users=5,
+            output=self.path, stdout=StringIO()
+        )
+        with open(self.path, encoding='utf-8') as stream:
+            levels = json.load(stream)['levels']
+        self.assertEqual(set(levels), {'1', '3'})
+        for level in levels.values():
+            self.assertEqual(level['requests'], 60)
+            # Параллельные записи в базу теста в памяти сразу получают
+            # блокировку; других ошибок быть не должно.
+            self.assertEqual(level['errors'], level['lock_errors'])
+            self.assertGreater(level['throughput_rps'], 0)
+        self.assertEqual(levels['1']['errors'], 0)
+        self.assertIn('follow_index', levels['1']['kinds'])
+        self.assertEqual(self.counts(), before)
+
+    def test_writes_are_made(self):
+        """Запросы записи действительно пишут; --keep их оставляет."""
+        posts = Post.objects.count()
+        call_command(
+            'replay_load', requests=10, concurrency=[1],
+            mix={'post_create': 1}, keep=True, stdout=StringIO()
+        )
+        self.assertEqual(Post.objects.count(), posts + 10)
+
+    def test_record_and_script(self):
+        """Записанный сценарий воспроизводится как есть."""
+        script = os.path.join(tempfile.mkdtemp(), 'script.jsonl')
+        call_command(
+            'replay_load', requests=15, concurrency=[1], record=script,
+            stdout=StringIO()
+        )
+        with open(script, encoding='utf-8') as stream:
+            self.assertEqual(len(stream.readlines()), 15)
+        call_command(
+            'replay_load', script=script, concurrency=[2], output=self.path,
+            stdout=StringIO()
+        )
+        with open(self.path, encoding='utf-8') as stream:
+            self.assertEqual(json.load(stream)['levels']['2']['requests'], 15)
+
+    def test_bad_mix(self):
+        """Неизвестный вид запроса отклоняется."""
+        with self.assertRaisesMessage(CommandError, 'Неизвестный вид'):
+            call_command('replay_load', '--mix', 'delete=5')
+
+
+class LockErrorTests(SimpleTestCase):
+    """Класс тестирования учета ошибок блокировки."""
+
+    def test_lock_errors_counted(self):
+        """Ошибка блокировки отличается от прочих ошибок сервера."""
+
+        def locked(path, query, method, data):
+            try:
+                raise OperationalError('database is locked')
+            except OperationalError:
+                got_request_exception.send(sender=None)
+            return 500, 0
+
+        def broken(path, query, method, data):
+            try:
+                raise ValueError(path)
+            except ValueError:
+                got_request_exception.send(sender=None)
+            return 500, 0
+
+        summary = replay.replay(
+            [
+                {'name': 'write', 'path': '/', 'user': 'a'},
+                {'name': 'read', 'path': '/'},
+            ] * 3,
+            {'a': locked, None: broken}, concurrency=2
+        )
+        self.assertEqual(summary['errors'], 6)
+        self.assertEqual(summary['lock_errors'], 3)
+        self.assertEqual(summary['kinds']['write']['lock_errors'], 3)
+        self.assertEqual(summary['kinds']['read']['lock_errors'], 0)
@@ -0,0 +1,179 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from core.queries import capture
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+def found(query):
+    return list(search.search(query).order_by(*search.SEARCH_ORDERING))
+
+
+class SearchIndexTests(TestCase):
+    """Класс тестирования индекса полнотекстового поиска."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def create_post(self, text):
+        return Post.objects.create(author=self.user, text=text)
+
+    def test_index_follows_posts(self):
+        """Индекс следует за созданием, правкой и удалением поста."""
+        post = self.create_post('Кошка спит на окне')
+        self.assertEqual(found('кошка'), [post])
+        post.text = 'Собака спит у двери'
+        post.save()
+        self.assertEqual(found('кошка'), [])
+        self.assertEqual(found('СОБАКА'), [post])
+        post.delete()
+        self.assertEqual(found('собака'), [])
+
+    def test_bulk_writes_are_indexed(self):
+        """Триггеры видят и массовые операции без сигналов."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пакетный пост {i}')
+            for i in range(3)
+        )
+        self.assertEqual(len(found('пакетный')), 3)
+        Post.objects.update(text='Обновлено разом')
+        self.assertEqual(len(found('разом')), 3)
+        self.assertEqual(found('пакетный'), [])
+
+    def test_better_match_ranks_first(self):
+        """Пост, где слово встречается чаще, выше в выдаче."""
+        weak = self.create_post('Чай и немного кофе, но больше про чай')
+        strong = self.create_post('Кофе, кофе и еще раз кофе')
+        self.assertEqual(found('кофе'), [strong, weak])
+
+    def test_all_words_are_required(self):
+        """Пост должен содержать все слова запроса."""
+        both = self.create_post('Зеленый чай с мятой')
+        self.create_post('Зеленый лес')
+        self.assertEqual(found('зеленый чай'), [both])
+
+    def test_prefix_fallback(self):
+        """Без точных совпадений слово ищется по началу."""
+        post = self.create_post('Новые фотографии с отпуска')
+        self.assertEqual(found('фотограф'), [post])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 и кавычки в запросе не ломают поиск."""
+        post = self.create_post('Кто OR что')
+        for query in ('OR', '"кто', 'NEAR(кто что)', 'кто*', '-что', '^'):
+            with self.subTest(query=query):
+                result = found(query)
+                self.assertIn(result, ([], [post]))
+
+    def test_only_newest_candidates_are_ranked(self):
+        """Ранжируются только самые новые совпадения."""
+        posts = [self.create_post('Частое слово') for _ in range(3)]
+        with mock.patch.object(search, 'SEARCH_CANDIDATES', 2):
+            result = found('частое')
+        self.assertEqual(
+            sorted(post.pk for post in result),
+            [post.pk for post in posts[1:]]
+        )
+
+    def test_install_restores_triggers(self):
+        """Пропавшие триггеры создаются заново, индекс перестраивается."""
+        self.assertFalse(search.install())
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        post = self.create_post('Пост без триггера')
+        self.assertEqual(found('триггера'), [])
+        self.assertTrue(search.install())
+        self.assertEqual(found('триггера'), [post])
+
+
+class SearchViewTests(TestCase):
+    """Класс тестирования страницы поиска."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Поисковый пост номер {i}')
+            for i in range(15)
+        )
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+
+    def test_results_are_paginated_by_cursor(self):
+        """Выдача листается курсором, запрос сохраняется в ссылках."""
+        url = reverse('posts:search')
+        response = Client().get(url, {'q': 'поисковый'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(
+            response,
+            f'?{urlencode({"q": "поисковый"})}&amp;'
+            f'cursor={page_obj.next_cursor}'
+        )
+        response = Client().get(
+            url, {'q': 'поисковый', 'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_empty_query(self):
+        """Без запроса показывается только форма."""
+        response = Client().get(reverse('posts:search'), {'q': '  '})
+        self.assertIsNone(response.context['page_obj'])
+        self.assertNotContains(response, 'Ничего не нашлось')
+
+    def test_nothing_found(self):
+        """Пустая выдача сообщает, что ничего не нашлось."""
+        response = Client().get(reverse('posts:search'), {'q': 'единорог'})
+        self.assertContains(response, 'Ничего не нашлось')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет по индексу, а не LIKE."""
+        client = Client()
+        client.force_login(self.admin)
+        with capture() as log:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'номер'}
+            )
+        self.assertEqual(response.context['cl'].result_count, 15)
+        statements = ' '.join(log.statements)
+        self.assertIn('MATCH', statements)
+        self.assertNotIn('LIKE', statements)
+
+    def test_admin_search_is_not_capped(self):
+        """Админка находит и старые посты сверх кандидатов поиска."""
+        client = Client()
+        client.force_login(self.admin)
+        with mock.patch.object(search, 'SEARCH_CANDIDATES', 2):
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'номер'}
+            )
+        self.assertEqual(response.context['cl'].result_count, 15)
+
+
+class BenchSearchTests(TestCase):
+    """Класс тестирования замера поиска."""
+
+    def test_command_rolls_back(self):
+        """Команда печатает замеры и не оставляет засеянных постов."""
+        out = StringIO()
+        call_command(
+            'bench_search', '--posts', '50', '--repeat', '1', stdout=out
+        )
+        self.assertIn('редкое слово', out.getvalue())
+        self.assertFalse(Post.objects.exists())
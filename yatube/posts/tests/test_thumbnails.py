@@ -0,0 +1,283 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import Future
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+
+from core.queries import capture
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+PAGE_SIZE = 10
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# PNG и JPEG кодирует любая сборка Pillow, в отличие от WebP.
+SRCSET = {
+    '960x339': {
+        'widths': (480,), 'formats': ('PNG', 'JPEG'), 'sizes': '100vw',
+    },
+}
+VARIANTS = 4
+
+
+def make_image(name='picture.jpg', size=(1200, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'navy').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0, THUMBNAIL_SRCSET=SRCSET
+)
+class ThumbnailTests(TestCase):
+    """Класс тестирования заблаговременной нарезки миниатюр."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='Пост с картинкой', image=make_image()
+        )
+
+    def test_rendering_does_not_open_image(self):
+        """После нарезки шаблон не открывает исходную картинку."""
+        thumbnails.schedule(self.post.image.name)
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            response = Client().get(
+                reverse('posts:post_detail', args=[self.post.pk])
+            )
+        get_image.assert_not_called()
+        self.assertContains(response, '<img class="card-img my-2"')
+
+    def test_rendering_does_not_cut_thumbnails(self):
+        """Без миниатюр страница выходит без картинки и не ждет Pillow."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        with mock.patch.object(
+            default.engine, 'get_image'
+        ) as get_image, mock.patch.object(
+            thumbnails, 'get_thumbnail'
+        ) as get_thumbnail:
+            response = Client().get(url)
+        get_image.assert_not_called()
+        get_thumbnail.assert_not_called()
+        self.assertNotContains(response, '<picture>')
+        call_command(
+            'generate_thumbnails', '--workers', '0', stdout=StringIO()
+        )
+        self.assertContains(Client().get(url), '<picture>')
+
+    def test_missing_thumbnails_are_enqueued(self):
+        """Картинка без миниатюр уходит в пул один раз, а готовые
+        миниатюры сбрасывают кеш страниц с ней."""
+        name = self.post.image.name
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        executor = mock.Mock()
+        with self.settings(THUMBNAIL_WORKERS=2), mock.patch.object(
+            thumbnails, '_get_executor', return_value=executor
+        ):
+            self.assertNotContains(Client().get(url), '<picture>')
+            images = [self.post.image, self.post.image]
+            self.assertEqual(
+                thumbnails.resolve_pictures(images, '960x339'), [None, None]
+            )
+        executor.submit.assert_called_once_with(thumbnails.render, name)
+        future = Future()
+        with mock.patch.object(default, 'kvstore', default.kvstore):
+            future.set_result(thumbnails.render(name))
+        # Служебный поток пула закрывает свое соединение, тест — нет.
+        with mock.patch.object(thumbnails, 'connection'):
+            executor.submit.return_value.add_done_callback.call_args[0][0](
+                future
+            )
+        self.assertEqual(thumbnails._pending, set())
+        self.assertContains(Client().get(url), '<picture>')
+
+    def test_pool_records_thumbnails(self):
+        """Записи из процесса пула попадают в хранилище sorl."""
+        name = self.post.image.name
+        with mock.patch.object(default, 'kvstore', default.kvstore):
+            records = thumbnails.render(name)
+        self.assertEqual(thumbnails.record(records), VARIANTS)
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            Client().get(reverse('posts:post_detail', args=[self.post.pk]))
+        get_image.assert_not_called()
+
+    def test_every_geometry_is_generated(self):
+        """Нарезаются все размеры из настроек."""
+        geometries = {
+            '960x339': {'crop': 'center', 'upscale': True},
+            '100x100': {'crop': 'center'},
+        }
+        with self.settings(THUMBNAIL_GEOMETRIES=geometries):
+            self.assertEqual(
+                thumbnails.generate(self.post.image.name), VARIANTS + 1
+            )
+
+    def test_unsupported_formats_are_skipped(self):
+        """Форматы, которых не умеет Pillow, не нарезаются."""
+        srcset = {'960x339': {'widths': (480,), 'formats': ('NOPE', 'JPEG')}}
+        with self.settings(THUMBNAIL_SRCSET=srcset):
+            self.assertEqual(
+                [fmt for fmt, _, _ in thumbnails.variants('960x339')],
+                ['JPEG', 'JPEG']
+            )
+
+    def test_missing_file_is_skipped(self):
+        """Отсутствующая картинка не ломает нарезку."""
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            thumbnails.schedule('posts/missing.jpg')
+        generate.assert_not_called()
+
+    def test_only_new_images_are_scheduled(self):
+        """На нарезку уходит только новая картинка поста."""
+        # TestCase не фиксирует транзакцию, поэтому колбэки вызываются
+        # сразу.
+        with mock.patch(
+            'posts.signals.transaction.on_commit', lambda func: func()
+        ), mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.post.text = 'Новый текст'
+            self.post.save()
+            schedule.assert_not_called()
+            self.post.image = make_image('other.jpg', (600, 300))
+            self.post.save()
+        schedule.assert_called_once_with(self.post.image.name)
+
+    def test_shared_image_is_not_cut_again(self):
+        """Миниатюры одинаковой картинки режутся один раз."""
+        thumbnails.schedule(self.post.image.name)
+        twin = Post.objects.create(
+            author=self.user, text='Тот же мем', image=make_image('copy.jpg')
+        )
+        self.assertEqual(twin.image.name, self.post.image.name)
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            thumbnails.schedule(twin.image.name)
+        generate.assert_not_called()
+
+    def test_worker_imports_before_setup(self):
+        """Процесс пула может импортировать модуль до настройки Django."""
+        subprocess.run(
+            [sys.executable, '-c', 'import posts.thumbnails'],
+            cwd=settings.BASE_DIR, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yatube.settings'},
+        )
+
+    def test_backfill_command(self):
+        """Команда нарезает миниатюры уже опубликованных постов."""
+        out = StringIO()
+        call_command('generate_thumbnails', '--workers', '0', stdout=out)
+        self.assertIn(f'Готово миниатюр: {VARIANTS}', out.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0, THUMBNAIL_SRCSET=SRCSET
+)
+class ThumbnailResolverTests(TestCase):
+    """Класс тестирования пакетного поиска миниатюр страницы."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост {i}',
+                image=make_image(f'picture{i}.jpg', (300, 100))
+            )
+            for i in range(PAGE_SIZE)
+        ]
+        for post in cls.posts:
+            thumbnails.generate(post.image.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        cache.clear()
+
+    def test_thumbnail_file_matches_sorl(self):
+        """Имя миниатюры совпадает с тем, что дает sorl."""
+        image = self.posts[0].image
+        options = settings.THUMBNAIL_GEOMETRIES['960x339']
+        self.assertEqual(
+            thumbnails.thumbnail_file(image, '960x339', options).name,
+            get_thumbnail(image, '960x339', **options).name
+        )
+
+    def test_page_is_resolved_in_one_query(self):
+        """Миниатюры страницы ищутся одним запросом к базе."""
+        with capture() as log:
+            response = Client().get(reverse('posts:index'))
+        kvstore_queries = [
+            sql for sql in log.statements if 'thumbnail_kvstore' in sql
+        ]
+        self.assertEqual(kvstore_queries, [kvstore_queries[0]])
+        self.assertEqual(log.statements[kvstore_queries[0]], 1)
+        self.assertContains(
+            response, '<img class="card-img my-2"', count=PAGE_SIZE
+        )
+
+    def test_cached_page_needs_no_query(self):
+        """С прогретым кешем миниатюры не требуют запросов."""
+        images = [post.image for post in self.posts]
+        thumbnails.resolve_pictures(images, '960x339')
+        with self.assertNumQueries(0):
+            resolved = thumbnails.resolve_pictures(images, '960x339')
+        self.assertEqual(
+            [picture.width for picture in resolved], [960] * PAGE_SIZE
+        )
+
+    def test_picture_markup(self):
+        """Карточка поста отдает srcset всех ширин и форматов."""
+        response = Client().get(
+            reverse('posts:post_detail', args=[self.posts[0].pk])
+        )
+        picture = response.context['post'].thumbnail
+        self.assertEqual(picture.srcset.count('w, '), 1)
+        self.assertContains(response, '<source type="image/png"')
+        self.assertContains(response, ' 480w, ', count=2)
+        self.assertContains(response, 'sizes="100vw"', count=2)
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_broken_and_empty_images(self):
+        """Пустые и отсутствующие картинки не ломают страницу."""
+        post = Post(
+            author=self.user, text='Пост', image='posts/missing.jpg'
+        )
+        resolved = thumbnails.resolve_many(
+            [post.image, Post().image], '960x339'
+        )
+        self.assertIsNone(resolved[1])
+        pictures = thumbnails.resolve_pictures(
+            [post.image, Post().image], '960x339'
+        )
+        self.assertEqual(pictures, [None, None])
@@ -0,0 +1,173 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import transfer
+from ..models import (
+    Comment, Follow, Group, ImageBlob, Post, Timeline, UserCounters
+)
+
+User = get_user_model()
+PUB_DATE = datetime(2021, 5, 4, 3, 2, 1, 123456, tzinfo=timezone.utc)
+
+
+class TransferTests(TestCase):
+    """Класс тестирования выгрузки и загрузки JSONL."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(5):
+            post = Post.objects.create(
+                author=cls.author,
+                text=f'Пост {number}',
+                group=cls.group if number % 2 else None,
+                image='posts/ab/ab.jpg' if number == 0 else '',
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'Комментарий {number}'
+            )
+        Post.objects.filter(text='Пост 0').update(pub_date=PUB_DATE)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def dump(self, **options):
+        stream = StringIO()
+        call_command('export_data', stdout=stream, stderr=StringIO(),
+                     **options)
+        return stream.getvalue()
+
+    def restore(self, data, *args):
+        path = os.path.join(tempfile.mkdtemp(), 'dump.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(data)
+        output = StringIO()
+        call_command('import_data', path, *args, stdout=output)
+        return output.getvalue()
+
+    def wipe(self):
+        for model in (Follow, Comment, Post, Group, ImageBlob, Timeline):
+            model.objects.all().delete()
+        User.objects.exclude(pk=self.author.pk).delete()
+
+    def snapshot(self):
+        return {
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'pub_date', 'author__username', 'group__slug',
+                'image', 'comments_count'
+            )),
+            'comments': list(Comment.objects.order_by('pk').values_list(
+                'pk', 'post_id', 'author__username', 'text', 'created'
+            )),
+            'follows': list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+            'groups': list(Group.objects.values_list(
+                'title', 'slug', 'description', 'posts_count'
+            )),
+        }
+
+    def test_export_format(self):
+        """Каждая строка — запись модели со ссылками по именам."""
+        records = [json.loads(line) for line in self.dump().splitlines()]
+        self.assertEqual(
+            [record['model'] for record in records],
+            ['group'] + ['post'] * 5 + ['comment'] * 5 + ['follow']
+        )
+        self.assertEqual(
+            records[-1],
+            {'model': 'follow', 'user': 'reader', 'author': 'author'}
+        )
+        self.assertEqual(records[1]['pub_date'], PUB_DATE.isoformat())
+
+    def test_export_models(self):
+        """Можно выгрузить только часть моделей."""
+        data = self.dump(models=['group'])
+        self.assertEqual(len(data.splitlines()), 1)
+
+    def test_round_trip(self):
+        """Загрузка выгрузки восстанавливает данные и производные."""
+        data = self.dump()
+        before = self.snapshot()
+        self.wipe()
+        output = self.restore(data)
+        self.assertEqual(self.snapshot(), before)
+        self.assertIn('Создано пользователей: 1', output)
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 5
+        )
+        self.assertEqual(
+            UserCounters.objects.get(user=reader).following_count, 1
+        )
+        self.assertEqual(Timeline.objects.filter(user=reader).count(), 5)
+        self.assertEqual(ImageBlob.objects.get(name='posts/ab/ab.jpg').refs, 1)
+
+    def test_resume(self):
+        """Продолжение пропускает уже загруженные записи."""
+        data = self.dump()
+        before = self.snapshot()
+        self.wipe()
+        lines = data.splitlines(keepends=True)
+        # Загрузка оборвалась на середине постов.
+        with self.assertRaises(CommandError):
+            self.restore(''.join(lines[:4]) + 'не json\n')
+        self.assertEqual(Post.objects.count(), 3)
+        self.restore(data, '--resume')
+        self.assertEqual(self.snapshot(), before)
+
+    def test_conflicts_without_resume(self):
+        """Без --resume совпавшие id останавливают загрузку до записи."""
+        data = self.dump()
+        before = self.snapshot()
+        with self.assertRaisesMessage(CommandError, 'уже есть'):
+            self.restore(data)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_resume_into_base_with_newer_posts(self):
+        """Продолжение не пропускает посты из-за новых id в базе."""
+        data = self.dump(models=['group', 'post'])
+        self.wipe()
+        lines = data.splitlines(keepends=True)
+        with self.assertRaises(CommandError):
+            self.restore(''.join(lines[:3]) + 'не json\n')
+        # До продолжения на сайте появился пост с id больше файловых.
+        Post.objects.create(pk=1000, author=self.author, text='Новый')
+        self.restore(data, '--resume')
+        self.assertEqual(Post.objects.count(), 6)
+
+    def test_unknown_model(self):
+        """Запись неизвестной модели останавливает загрузку."""
+        with self.assertRaisesMessage(CommandError, 'Неизвестная модель'):
+            self.restore('{"model": "user", "username": "x"}\n')
+
+    def test_batches(self):
+        """Пачки меньше числа записей дают тот же результат."""
+        data = self.dump()
+        before = self.snapshot()
+        self.wipe()
+        self.restore(data, '--commit-size', '2')
+        self.assertEqual(self.snapshot(), before)
+
+    def test_dates_keep_auto_now_add(self):
+        """После загрузки новые записи снова получают текущее время."""
+        data = self.dump(models=['group', 'post'])
+        self.wipe()
+        transfer.Importer().load(data.splitlines())
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertGreater(post.pub_date, PUB_DATE)
@@ -0,0 +1,193 @@
+import io
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_upload(name='photo.jpg', size=(1000, 600), mode='RGB',
+                fmt='JPEG', **params):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'red').save(buffer, fmt, **params)
+    return SimpleUploadedFile(name, buffer.getvalue(), f'image/{fmt}')
+
+
+def rotated_exif():
+    exif = Image.Exif()
+    exif[images.ORIENTATION] = 6
+    exif[0x010F] = 'Камера'
+    return exif.tobytes()
+
+
+def located_exif():
+    exif = Image.Exif()
+    exif[0x010F] = 'Камера'
+    # Указатель на GPS IFD с широтой.
+    exif[0x8825] = {2: (55.0, 45.0, 0.0)}
+    return exif.tobytes()
+
+
+@override_settings(IMAGE_MAX_SIDE=400)
+class ImagePipelineTests(SimpleTestCase):
+    """Класс тестирования подготовки загруженных картинок."""
+
+    def test_photo_is_downscaled(self):
+        """Крупная картинка уменьшается до IMAGE_MAX_SIDE."""
+        prepared = images.prepare_upload(make_upload())
+        image = Image.open(prepared)
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (400, 240))
+        self.assertEqual(prepared.name, 'photo.jpg')
+
+    def test_jpeg_is_decoded_in_draft_mode(self):
+        """JPEG декодируется сразу в уменьшенном масштабе."""
+        upload = make_upload(size=(1600, 800))
+        image = images.decode(Image.open(upload), 400)
+        self.assertEqual(image.size, (400, 200))
+        draft = Image.open(upload)
+        draft.draft('RGB', (400, 200))
+        self.assertEqual(draft.size, (400, 200))
+
+    def test_metadata_is_stripped(self):
+        """EXIF удаляется, а поворот из него применяется."""
+        upload = make_upload(size=(600, 300), exif=rotated_exif())
+        image = Image.open(images.prepare_upload(upload))
+        self.assertEqual(image.size, (200, 400))
+        self.assertNotIn('exif', image.info)
+
+    def test_transparency_is_kept(self):
+        """Прозрачная картинка остается PNG."""
+        upload = make_upload('logo.gif', (50, 50), 'RGBA', 'PNG')
+        prepared = images.prepare_upload(upload)
+        self.assertEqual(prepared.name, 'logo.png')
+        self.assertEqual(Image.open(prepared).mode, 'RGBA')
+
+    def test_transparent_metadata_is_stripped(self):
+        """У прозрачной картинки в PNG тоже не остается EXIF."""
+        upload = make_upload(
+            'logo.png', (50, 50), 'RGBA', 'PNG', exif=located_exif()
+        )
+        self.assertIn(0x8825, Image.open(upload).getexif())
+        image = Image.open(images.prepare_upload(upload))
+        self.assertEqual(image.format, 'PNG')
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_palette_image_is_converted(self):
+        """Картинка с палитрой сохраняется как JPEG."""
+        upload = make_upload('small.gif', (800, 80), 'P', 'GIF')
+        image = Image.open(images.prepare_upload(upload))
+        self.assertEqual((image.format, image.size), ('JPEG', (400, 40)))
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_pixel_limit(self):
+        """Слишком большая по пикселям картинка отвергается."""
+        with self.assertRaisesMessage(ValidationError, 'мегапикселей'):
+            images.prepare_upload(make_upload(size=(100, 100)))
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=100)
+    def test_size_limit(self):
+        """Слишком большой файл отвергается до открытия."""
+        with self.assertRaisesMessage(ValidationError, 'Файл больше'):
+            images.prepare_upload(make_upload())
+
+    def test_broken_image(self):
+        """Файл, который не является картинкой, отвергается."""
+        upload = SimpleUploadedFile('photo.jpg', b'not an image')
+        with self.assertRaisesMessage(ValidationError, 'прочитать'):
+            images.prepare_upload(upload)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=400)
+class UploadViewTests(TestCase):
+    """Класс тестирования загрузки картинки через страницу поста."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_upload_is_streamed_to_disk(self):
+        """Загрузка попадает во временный файл, а не в память."""
+        uploads = []
+        original = images.prepare_upload
+
+        def spy(file_):
+            uploads.append(file_)
+            return original(file_)
+
+        with mock.patch('posts.forms.prepare_upload', spy):
+            self.client.post(reverse('posts:post_create'), {
+                'text': 'Пост с фотографией', 'image': make_upload(),
+            })
+        self.assertTrue(hasattr(uploads[0], 'temporary_file_path'))
+
+    def test_canonical_original_is_stored(self):
+        """Хранится уменьшенный оригинал без метаданных."""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с фотографией',
+            'image': make_upload(exif=rotated_exif()),
+        })
+        post = Post.objects.get()
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w{64}\.jpg$')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (240, 400))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=1000)
+    def test_large_upload_is_rejected(self):
+        """Файл сверх лимита не сохраняется, форма сообщает об ошибке."""
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с фотографией', 'image': make_upload(),
+        })
+        self.assertFalse(Post.objects.exists())
+        error, = response.context['form'].errors['image']
+        self.assertTrue(error.startswith('Файл больше'))
+
+    def test_edit_keeps_image(self):
+        """Правка без новой картинки не трогает старую."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=make_upload()
+        )
+        name = post.image.name
+        self.client.post(
+            reverse('posts:post_edit', args=[post.pk]), {'text': 'Правка'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+
+
+class BenchUploadsTests(SimpleTestCase):
+    """Класс тестирования замера памяти загрузки."""
+
+    def test_command_reports_rss(self):
+        """Команда печатает строку замера на каждый размер."""
+        out = StringIO()
+        call_command('bench_uploads', '--sizes', '64x48', stdout=out)
+        self.assertIn('64x48', out.getvalue())
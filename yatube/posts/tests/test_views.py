@@ -1,13 +1,19 @@
+import base64
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
 from ..forms import PostForm
 from ..models import Post, Group, Follow, Comment
+from ..views import COMMENTS_LIMIT
 
 User = get_user_model()
 LIMIT = 10
 REMAINS = 6
+COMMENTS = COMMENTS_LIMIT + 5
 
 
 class ViewsTests(TestCase):
@@ -129,6 +135,78 @@ class ViewsTests(TestCase):
                 f'количество постов на второй странице {view}.'
             )
 
+    def test_cursor_paginator(self):
+        """Проверяем курсорную пагинацию лент."""
+        views = (
+            ViewsTests.index_url,
+            ViewsTests.group_url,
+            ViewsTests.profile_url
+        )
+        for view in views:
+            with self.subTest(view=view):
+                response = self.author.get(view + '?cursor=')
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), LIMIT)
+                self.assertFalse(page_obj.has_previous())
+                response = self.author.get(
+                    view + f'?cursor={page_obj.next_cursor}'
+                )
+                second_page = response.context['page_obj']
+                self.assertEqual(len(second_page), REMAINS)
+                self.assertFalse(second_page.has_next())
+                response = self.author.get(
+                    view + f'?cursor={second_page.previous_cursor}'
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    list(page_obj)
+                )
+
+    def test_numbered_page_links_to_cursor(self):
+        """Со старой страницы переходим дальше по курсору."""
+        response = self.author.get(ViewsTests.index_url + '?page=1')
+        page_obj = response.context['page_obj']
+        response = self.author.get(
+            ViewsTests.index_url + f'?cursor={page_obj.next_cursor}'
+        )
+        self.assertEqual(len(response.context['page_obj']), REMAINS)
+
+    def test_broken_cursor_opens_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        for cursor in ('мусор', 'WzAsWyJ4IiwieCJdXQ'):
+            response = self.author.get(
+                ViewsTests.profile_url + f'?cursor={cursor}'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['page_obj']), LIMIT)
+
+    def test_out_of_range_cursor_opens_first_page(self):
+        """Курсор с чужими для базы значениями открывает первую страницу."""
+        forged = (
+            [0, ['2099-01-01T00:00:00+00:00', 10 ** 30]],
+            [0, ['2099-01-01T00:00:00', 10]],
+            [0, [12, 10]],
+            [0, ['2099-01-01T00:00:00+00:00', [1]]],
+        )
+        urls = (
+            ViewsTests.index_url, ViewsTests.group_url,
+            ViewsTests.profile_url, reverse('posts:api_index'),
+            ViewsTests.post_detail_url,
+            reverse('posts:post_comments', args=[ViewsTests.post.pk]),
+        )
+        for values in forged:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(values).encode()
+            ).decode()
+            for url in urls:
+                with self.subTest(values=values, url=url):
+                    response = self.author.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+                    if response.context and 'page_obj' in response.context:
+                        self.assertEqual(
+                            len(response.context['page_obj']), LIMIT
+                        )
+
     def test_context_pages(self):
         """Проверяем контексты страниц index, group, profile."""
         views = (
@@ -233,6 +311,16 @@ class ViewsTests(TestCase):
         response = self.author.get(ViewsTests.post_detail_url)
         self.assertEqual(response.context['comments'][0].text, data['text'])
 
+    def test_empty_comment_redirects(self):
+        """Пустой комментарий или GET возвращают на страницу поста."""
+        count = Comment.objects.count()
+        for response in (
+            self.author.get(ViewsTests.add_comment_url),
+            self.author.post(ViewsTests.add_comment_url, data={'text': ''}),
+        ):
+            self.assertRedirects(response, f'/posts/{ViewsTests.post.pk}/')
+        self.assertEqual(Comment.objects.count(), count)
+
     def test_guest_cant_create_comment(self):
         """Проверяем что гость не может создавать комментарии."""
         data = {'text': 'тестовый комментарий'}
@@ -258,10 +346,38 @@ class ViewsTests(TestCase):
         )
         response = self.author.get(ViewsTests.index_url)
         page_index = response.content
+        # Изменение в обход моделей не сбрасывает кеш.
+        Post.objects.filter(pk=new_post.pk).update(text='Тихая правка')
+        response = self.author.get(ViewsTests.index_url)
+        self.assertEqual(response.content, page_index)
+        # Удаление поста сбрасывает кеш лент сигналом.
         new_post.delete()
         response = self.author.get(ViewsTests.index_url)
-        new_page_index = response.content
-        self.assertEqual(new_page_index, page_index)
+        self.assertNotIn('Тихая правка', response.content.decode())
+
+    def test_cache_varies_by_page(self):
+        """Кеш лент различает страницы и курсоры."""
+        views = (
+            ViewsTests.index_url,
+            ViewsTests.group_url,
+            ViewsTests.profile_url
+        )
+        for view in views:
+            with self.subTest(view=view):
+                first = self.author.get(view).content.decode()
+                second = self.author.get(view + '?page=2').content.decode()
+                self.assertIn('Текст поста 15', first)
+                self.assertNotIn('Текст поста 15', second)
+                self.assertIn('Тестовый пост', second)
+
+    def test_cache_invalidated_by_comment(self):
+        """Новый комментарий сразу виден на закешированной странице."""
+        self.author.get(ViewsTests.post_detail_url)
+        self.author.post(
+            ViewsTests.add_comment_url, data={'text': 'Свежий комментарий'}
+        )
+        response = self.author.get(ViewsTests.post_detail_url)
+        self.assertIn('Свежий комментарий', response.content.decode())
 
     def test_following(self):
         """Проверяем что пользователь может подписываться на авторов."""
@@ -285,3 +401,67 @@ class ViewsTests(TestCase):
         response = self.authorized_client.get(ViewsTests.unfollow_url)
         response = self.authorized_client.get(ViewsTests.follow_index_url)
         self.assertEqual(response.context['posts'].count(), 0)
+
+
+class CommentPaginationTests(TestCase):
+    """Класс тестирования постраничного вывода комментариев."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Метод с фикстурами."""
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            author=User.objects.create_user(username='auth'),
+            text='Тестовый пост',
+        )
+        for i in range(COMMENTS):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'user{i}'),
+                text=f'Комментарий {i}'
+            )
+        cls.post_detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.comments_url = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        """Метод с фикстурами."""
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_first_page_of_comments(self):
+        """На странице поста только последние комментарии."""
+        response = self.guest_client.get(self.post_detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_LIMIT)
+        self.assertEqual(comments[0].text, f'Комментарий {COMMENTS - 1}')
+        self.assertTrue(comments.has_next())
+
+    def test_fragment_loads_rest(self):
+        """Фрагмент по курсору отдает оставшиеся комментарии."""
+        first = self.guest_client.get(self.post_detail_url)
+        cursor = first.context['comments'].next_cursor
+        response = self.guest_client.get(
+            self.comments_url, {'cursor': cursor}
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS - COMMENTS_LIMIT)
+        self.assertEqual(comments[-1].text, 'Комментарий 0')
+        self.assertFalse(comments.has_next())
+        self.assertNotContains(response, '<html')
+
+    def test_queries_do_not_grow_with_comments(self):
+        """Авторы комментариев читаются одним запросом со страницей.
+
+        Третий запрос — свежесть фрагмента для условного GET.
+        """
+        with self.assertNumQueries(3):
+            self.guest_client.get(self.comments_url)
+
+    def test_missing_post(self):
+        """Фрагмент несуществующего поста отдает 404."""
+        url = reverse('posts:post_comments', kwargs={'post_id': 0})
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
@@ -0,0 +1,464 @@
+"""Заблаговременная нарезка миниатюр картинок постов.
+
+Миниатюры всех размеров из ``THUMBNAIL_GEOMETRIES`` готовятся сразу
+после сохранения поста в пуле процессов, поэтому тег ``thumbnail``
+при отрисовке находит готовую запись в хранилище sorl и не открывает
+картинку. Отрисовка и сама никогда не режет миниатюры: картинка без
+них выводится без ``<picture>`` и отдается в пул (``enqueue``), а без
+пула ее догонит команда ``generate_thumbnails``.
+
+Процессы пула запускаются методом ``spawn`` и к базе не обращаются:
+они только декодируют, уменьшают и сохраняют картинки, а записи о
+миниатюрах возвращают родителю, который кладет их в хранилище sorl.
+Так пул не зависит от соединений родителя и от того, какая база
+у него открыта.
+
+Геометрии из ``THUMBNAIL_SRCSET`` нарезаются набором ширин в каждом
+формате, который умеет кодировать Pillow, для разметки ``<picture>``
+со ``srcset``; последний формат набора служит запасным.
+
+Процесс пула импортирует модуль до ``django.setup()``, поэтому модели
+здесь импортируются только внутри функций.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import (
+    ImageFile, deserialize_image_file, serialize_image_file
+)
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+from core.storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+# Картинки в пуле и те из них, что уже отрисованы без миниатюр.
+_pending = set()
+_stale = set()
+_pending_lock = threading.Lock()
+
+
+class _MemoryKVStore(KVStoreBase):
+    """Хранилище sorl в памяти процесса пула на время одной картинки."""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {}
+
+    def _get_raw(self, key):
+        return self.data.get(key)
+
+    def _set_raw(self, key, value):
+        self.data[key] = value
+
+    def _delete_raw(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def _find_keys_raw(self, prefix):
+        return [key for key in self.data if key.startswith(prefix)]
+
+
+def _init_worker():
+    django.setup()
+
+
+def _make_executor(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = _make_executor(settings.THUMBNAIL_WORKERS)
+    return _executor
+
+
+def encodable(fmt):
+    """Умеет ли установленный Pillow сохранять картинки в формате."""
+    Image.init()
+    return fmt in Image.SAVE
+
+
+def scaled(geometry, width):
+    """Геометрия с пропорциями ``geometry`` и шириной ``width``."""
+    base_width, base_height = map(int, geometry.split('x'))
+    return f'{width}x{round(base_height * width / base_width)}'
+
+
+def variants(geometry):
+    """Все миниатюры, которые нарезаются для ``geometry``.
+
+    Возвращает список троек (формат, геометрия, параметры sorl); для
+    геометрий без ``THUMBNAIL_SRCSET`` — одну миниатюру с параметрами
+    из ``THUMBNAIL_GEOMETRIES``.
+    """
+    options = settings.THUMBNAIL_GEOMETRIES[geometry]
+    srcset = settings.THUMBNAIL_SRCSET.get(geometry)
+    if srcset is None:
+        return [(options.get('format'), geometry, options)]
+    width = int(geometry.split('x')[0])
+    widths = sorted(set(srcset['widths']) | {width})
+    return [
+        (fmt, scaled(geometry, width), {**options, 'format': fmt})
+        for fmt in srcset['formats'] if encodable(fmt)
+        for width in widths
+    ]
+
+
+def all_variants():
+    for geometry in settings.THUMBNAIL_GEOMETRIES:
+        for _, size, options in variants(geometry):
+            yield size, options
+
+
+def source(name):
+    """Картинка поста по имени в хранилище картинок.
+
+    sorl учитывает хранилище в ключе миниатюры, поэтому картинку нужно
+    открывать в том же хранилище, что и поле ``Post.image``.
+    """
+    return ImageFile(name, content_storage)
+
+
+def exists(name):
+    """Есть ли картинка ``name`` в хранилище картинок."""
+    try:
+        return bool(name) and content_storage.exists(name)
+    except SuspiciousFileOperation:
+        logger.warning('Image %s is outside of the media storage', name)
+        return False
+
+
+def render(name):
+    """Нарезает миниатюры картинки ``name`` в процессе пула.
+
+    Возвращает пары (картинка, миниатюра) в виде строк sorl.
+    """
+    if not exists(name):
+        return []
+    store = default.kvstore = _MemoryKVStore()
+    records = []
+    for geometry, options in all_variants():
+        try:
+            thumbnail = get_thumbnail(source(name), geometry, **options)
+        except Exception:
+            logger.exception('Thumbnail %s of %s failed', geometry, name)
+            continue
+        image = store.get(source(name))
+        if image is not None and store.get(thumbnail) is not None:
+            records.append((
+                serialize_image_file(image), serialize_image_file(thumbnail)
+            ))
+    return records
+
+
+def record(records):
+    """Кладет записи о готовых миниатюрах в хранилище sorl."""
+    for source, thumbnail in records:
+        source = deserialize_image_file(source)
+        default.kvstore.get_or_set(source)
+        default.kvstore.set(deserialize_image_file(thumbnail), source)
+    return len(records)
+
+
+def generate(name):
+    """Нарезает все миниатюры картинки в текущем процессе."""
+    created = 0
+    for geometry, options in all_variants():
+        try:
+            get_thumbnail(source(name), geometry, **options)
+        except Exception:
+            logger.exception('Thumbnail %s of %s failed', geometry, name)
+        else:
+            created += 1
+    return created
+
+
+def forget_pages(posts):
+    """Сбрасывает кеш страниц с постами ``posts``: они могли попасть
+    в кеш без миниатюр."""
+    from posts import feeds, fragments
+
+    pages = set()
+    authors = set()
+    for post in posts.only('author', 'group').iterator():
+        pages |= fragments.post_feeds(post)
+        authors.add(post.author_id)
+    for author in authors:
+        pages.update(map(fragments.follow_key, feeds.push_followers(author)))
+    if pages:
+        fragments.invalidate(pages)
+
+
+def _record_result(name, future):
+    # Вызывается в служебном потоке пула со своим соединением с базой.
+    from posts.models import Post
+
+    recorded = 0
+    try:
+        recorded = record(future.result())
+    except Exception:
+        logger.exception('Thumbnail worker failed')
+    # Страницы, отрисованные до записи, помечены в ``_stale``.
+    with _pending_lock:
+        _pending.discard(name)
+        stale = name in _stale
+        _stale.discard(name)
+    try:
+        if recorded and stale:
+            forget_pages(Post.objects.filter(image=name))
+    except Exception:
+        logger.exception('Pages with %s were not invalidated', name)
+    finally:
+        connection.close()
+
+
+def _submit(name):
+    future = _get_executor().submit(render, name)
+    future.add_done_callback(partial(_record_result, name))
+    return future
+
+
+def schedule(name):
+    """Отдает картинку в пул процессов, не дожидаясь миниатюр.
+
+    При ``THUMBNAIL_WORKERS = 0`` миниатюры режутся сразу в текущем
+    процессе. Картинки, которых нет в хранилище, и картинки, чьи
+    миниатюры уже есть (тот же файл у другого поста), пропускаются.
+    """
+    if not exists(name):
+        return None
+    if ready(name):
+        return None
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+        return None
+    with _pending_lock:
+        if name in _pending:
+            return None
+        _pending.add(name)
+    return _submit(name)
+
+
+def enqueue(names):
+    """Отдает в пул картинки, миниатюр которых не нашлось при отрисовке.
+
+    Картинка, которая уже в пуле, повторно не отдается; когда пул ее
+    нарежет, кеш страниц с ней сбрасывается. Без пула
+    (``THUMBNAIL_WORKERS = 0``) ничего не происходит: страницу нельзя
+    задерживать нарезкой, миниатюры догонит ``generate_thumbnails``.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        return
+    with _pending_lock:
+        names = set(names)
+        _stale.update(names)
+        names -= _pending
+        _pending.update(names)
+    for name in names:
+        _submit(name)
+
+
+def generate_many(names, workers=None):
+    """Нарезает миниатюры пачки картинок; возвращает число миниатюр."""
+    if workers is None:
+        workers = settings.THUMBNAIL_WORKERS
+    if not workers:
+        return sum(map(generate, names))
+    with _make_executor(workers) as executor:
+        return sum(
+            record(records)
+            for records in executor.map(render, names, chunksize=16)
+        )
+
+
+def thumbnail_file(file_, geometry, options):
+    """Файл миниатюры, который вернул бы ``get_thumbnail``, без его
+    создания и без обращения к хранилищу sorl.
+
+    Параметры дополняются так же, как в ``ThumbnailBackend``, поэтому
+    имя и ключ миниатюры совпадают с теми, что кладет sorl.
+    """
+    backend = default.backend
+    source = ImageFile(file_)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def _lookup_many(keys):
+    """Сырые записи хранилища sorl: один ``get_many`` к кешу и один
+    запрос к базе на промахи."""
+    from sorl.thumbnail.kvstores import cached_db_kvstore
+    from sorl.thumbnail.models import KVStore
+
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    found = {
+        key: value for key, value in kvstore.cache.get_many(keys).items()
+        if value != cached_db_kvstore.EMPTY_VALUE
+    }
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(KVStore.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kvstore.cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(stored)
+    return found
+
+
+def _resolve(files, wanted):
+    """Миниатюры ``wanted`` — списка пар (геометрия, параметры) — для
+    каждой картинки из ``files``; записи ищутся одним ``_lookup_many``.
+
+    Возвращает по строке на картинку: ``ImageFile`` для каждого
+    варианта или ``None`` на месте ненарезанных; для пустых картинок
+    строка равна ``None``. Картинки с ненарезанными вариантами уходят
+    в ``enqueue``.
+    """
+    planned = [
+        [thumbnail_file(file_, size, options) for size, options in wanted]
+        if file_ else None
+        for file_ in files
+    ]
+    keys = [
+        add_prefix(thumbnail.key)
+        for row in planned if row for thumbnail in row
+    ]
+    found = _lookup_many(keys) if keys else {}
+    resolved = []
+    missing = []
+    for file_, row in zip(files, planned):
+        if row is None:
+            resolved.append(None)
+            continue
+        values = [found.get(add_prefix(thumbnail.key)) for thumbnail in row]
+        if not all(values):
+            missing.append(file_.name)
+        resolved.append([
+            deserialize_image_file(value) if value else None
+            for value in values
+        ])
+    if missing:
+        enqueue(missing)
+    return resolved
+
+
+def ready(name):
+    """Нарезаны ли уже все миниатюры картинки."""
+    image = source(name)
+    keys = [
+        add_prefix(thumbnail_file(image, geometry, options).key)
+        for geometry, options in all_variants()
+    ]
+    found = _lookup_many(keys)
+    return all(found.get(key) for key in keys)
+
+
+def resolve_many(files, geometry):
+    """Миниатюры размера ``geometry`` для списка картинок.
+
+    Возвращает список той же длины: ``ImageFile`` с адресом и размерами
+    или ``None`` для пустых и еще не нарезанных картинок.
+    """
+    wanted = [(geometry, settings.THUMBNAIL_GEOMETRIES[geometry])]
+    return [row and row[0] for row in _resolve(files, wanted)]
+
+
+class Picture:
+    """Варианты одной картинки для разметки ``<picture>``.
+
+    ``sources`` — форматы кроме запасного, каждый со своим ``srcset``;
+    ``url``, ``width`` и ``height`` относятся к запасной миниатюре
+    размера самой геометрии.
+    """
+
+    def __init__(self, geometry, images, sizes=''):
+        self.sizes = sizes
+        self.formats = {}
+        fallback = None
+        for (fmt, size, _), image in images:
+            # Для отсутствующей картинки sorl отдает миниатюру без размера.
+            if image is None or not image.size:
+                continue
+            self.formats.setdefault(fmt, []).append(image)
+            if size == geometry:
+                fallback = image
+        self.fallback = fallback
+
+    def __bool__(self):
+        return self.fallback is not None
+
+    @property
+    def url(self):
+        return self.fallback.url
+
+    @property
+    def width(self):
+        return self.fallback.width
+
+    @property
+    def height(self):
+        return self.fallback.height
+
+    @staticmethod
+    def _srcset(images):
+        return ', '.join(f'{image.url} {image.width}w' for image in images)
+
+    @property
+    def srcset(self):
+        fmt = list(self.formats)[-1]
+        return self._srcset(self.formats[fmt])
+
+    @property
+    def sources(self):
+        return [
+            {
+                'type': Image.MIME.get(fmt, 'image/jpeg'),
+                'srcset': self._srcset(images),
+            }
+            for fmt, images in list(self.formats.items())[:-1]
+        ]
+
+
+def resolve_pictures(files, geometry):
+    """Наборы вариантов ``geometry`` для списка картинок.
+
+    Возвращает список той же длины из ``Picture`` или ``None``. Все
+    варианты всех картинок ищутся одним обращением к кешу и к базе.
+    """
+    planned = variants(geometry)
+    wanted = [(size, options) for _, size, options in planned]
+    sizes = settings.THUMBNAIL_SRCSET.get(geometry, {}).get('sizes', '')
+    pictures = []
+    for row in _resolve(files, wanted):
+        picture = row and Picture(geometry, zip(planned, row), sizes)
+        pictures.append(picture or None)
+    return pictures
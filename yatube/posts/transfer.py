@@ -0,0 +1,325 @@
+"""Выгрузка и загрузка групп, постов, комментариев и подписок в JSONL.
+
+Каждая строка файла — одна запись с полем ``model``. Выгрузка читает
+таблицы по первичному ключу через ``iterator()`` кусками и пишет запись
+за записью, поэтому память не зависит от объема. Пользователи и группы
+записываются естественными ключами (имя, slug), а посты и комментарии
+сохраняют свои id: по ним комментарии ссылаются на посты.
+
+Загрузка читает файл построчно и пишет пачками ``bulk_create``, каждая
+пачка — в своей транзакции. Имена пользователей и slug групп
+переводятся в id по словарям в памяти, которые растут с числом
+пользователей и групп, а не строк файла. Недостающие пользователи
+создаются без пароля. Посты и комментарии с id, которые в базе уже
+заняты, останавливают загрузку ``ConflictError`` до записи их пачки.
+Прерванную загрузку продолжает ``resume``: такие посты и комментарии
+считаются загруженными и пропускаются, группы и подписки и так не
+дублируются.
+
+``bulk_create`` не вызывает сигналов, поэтому после загрузки
+``finish`` сверяет счетчики и ссылки на картинки, отмечает популярных
+авторов, пересобирает затронутые ленты подписок и сбрасывает кеш.
+Похожие посты и рейтинг обсуждаемого новые посты получат при очередном
+запуске своих команд; комментарии с id ниже уже учтенных рейтинг
+увидит только после ``update_hot_posts --full``.
+"""
+import json
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from posts import blobs, counters, feeds, fragments, lookups
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+# Строк в одном INSERT: SQLite-бэкенд Django 2.2 вставляет их через
+# UNION ALL, а в нем не больше 500 частей.
+BATCH_SIZE = 500
+# Записей файла в одной транзакции.
+COMMIT_SIZE = 10000
+CHUNK_SIZE = 2000
+
+
+class ConflictError(ValueError):
+    """Id записей файла уже заняты другими записями базы."""
+
+
+def _rows(queryset, *fields):
+    return queryset.order_by('pk').values_list(*fields).iterator(
+        chunk_size=CHUNK_SIZE
+    )
+
+
+def export_groups():
+    for pk, title, slug, description in _rows(
+        Group.objects, 'pk', 'title', 'slug', 'description'
+    ):
+        yield {
+            'model': 'group', 'id': pk, 'title': title, 'slug': slug,
+            'description': description,
+        }
+
+
+def export_posts():
+    for pk, text, pub_date, author, group, image, comments in _rows(
+        Post.objects, 'pk', 'text', 'pub_date', 'author__username',
+        'group__slug', 'image', 'comments_count'
+    ):
+        yield {
+            'model': 'post', 'id': pk, 'text': text,
+            'pub_date': pub_date.isoformat(), 'author': author,
+            'group': group, 'image': image, 'comments_count': comments,
+        }
+
+
+def export_comments():
+    for pk, post_id, author, text, created in _rows(
+        Comment.objects, 'pk', 'post_id', 'author__username', 'text',
+        'created'
+    ):
+        yield {
+            'model': 'comment', 'id': pk, 'post': post_id, 'author': author,
+            'text': text, 'created': created.isoformat(),
+        }
+
+
+def export_follows():
+    for user, author in _rows(
+        Follow.objects, 'user__username', 'author__username'
+    ):
+        yield {'model': 'follow', 'user': user, 'author': author}
+
+
+# В порядке зависимостей: загрузка идет в том же порядке.
+EXPORTS = {
+    'group': export_groups,
+    'post': export_posts,
+    'comment': export_comments,
+    'follow': export_follows,
+}
+
+
+def export(stream, models=tuple(EXPORTS)):
+    """Пишет записи моделей в ``stream``; возвращает их число по моделям."""
+    written = Counter()
+    for model in EXPORTS:
+        if model not in models:
+            continue
+        for record in EXPORTS[model]():
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+            written[model] += 1
+    return written
+
+
+@contextmanager
+def _keep_dates(model, name):
+    """Без этого ``bulk_create`` подставил бы вместо даты из файла
+    текущее время поля с ``auto_now_add``."""
+    field = model._meta.get_field(name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Importer:
+    """Загрузка записей пачками с разрешением ссылок по словарям."""
+
+    def __init__(self, resume=False, commit_size=COMMIT_SIZE):
+        self.commit_size = commit_size
+        self.users = dict(
+            User.objects.values_list('username', 'pk').iterator()
+        )
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        # Посты до загрузки: кеш их страниц надо сбросить, если к ним
+        # добавятся комментарии.
+        self.old_posts = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.resume = resume
+        self.loaded = Counter()
+        self.new_users = 0
+        self.touched_groups = set()
+        self.touched_authors = set()
+        self.touched_followers = set()
+        self.commented_posts = set()
+
+    def load(self, lines):
+        """Загружает записи из строк JSONL."""
+        model, batch = None, []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                # Все до испорченной строки сохраняется для --resume.
+                self.flush(model, batch)
+                raise ValueError(f'Строка {number}: {error}')
+            if record.get('model') != model or len(batch) >= self.commit_size:
+                self.flush(model, batch)
+                model, batch = record.get('model'), []
+            batch.append(record)
+        self.flush(model, batch)
+        return self.loaded
+
+    def flush(self, model, records):
+        if not records:
+            return
+        if model not in EXPORTS:
+            raise ValueError(f'Неизвестная модель: {model}')
+        with transaction.atomic():
+            self.loaded[model] += getattr(self, f'load_{model}s')(records)
+
+    def user_ids(self, usernames):
+        """Словарь имен в id; недостающие пользователи создаются."""
+        missing = {name for name in usernames if name not in self.users}
+        if missing:
+            # Пользователь без пароля войти не может, пока не сбросит его.
+            User.objects.bulk_create(
+                [
+                    User(username=name, password=make_password(None))
+                    for name in sorted(missing)
+                ],
+                batch_size=BATCH_SIZE
+            )
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+            self.new_users += len(missing)
+        return self.users
+
+    def _fresh(self, model, records):
+        """Записи пачки, чьих id еще нет в базе.
+
+        Без ``resume`` занятый id — чужая запись, и загрузка
+        останавливается, не трогая пачку.
+        """
+        ids = [record['id'] for record in records]
+        taken = set()
+        for start in range(0, len(ids), BATCH_SIZE):
+            taken.update(model.objects.filter(
+                pk__in=ids[start:start + BATCH_SIZE]
+            ).values_list('pk', flat=True))
+        if taken and not self.resume:
+            name = str(model._meta.verbose_name_plural).lower()
+            raise ConflictError(
+                f'В базе уже есть {name} с id из файла: '
+                f'{", ".join(map(str, sorted(taken)[:10]))}. Загрузка '
+                f'сохраняет id, поэтому файл нужно загружать в базу '
+                f'без этих записей.'
+            )
+        return [record for record in records if record['id'] not in taken]
+
+    def load_groups(self, records):
+        fresh = {
+            record['slug']: record for record in records
+            if record['slug'] not in self.groups
+        }
+        Group.objects.bulk_create([
+            Group(
+                title=record['title'], slug=slug,
+                description=record['description']
+            ) for slug, record in fresh.items()
+        ], batch_size=BATCH_SIZE)
+        self.groups.update(Group.objects.filter(
+            slug__in=list(fresh)
+        ).values_list('slug', 'pk'))
+        return len(fresh)
+
+    def load_posts(self, records):
+        records = self._fresh(Post, records)
+        users = self.user_ids(record['author'] for record in records)
+        posts = []
+        for record in records:
+            group_id = None
+            if record['group']:
+                try:
+                    group_id = self.groups[record['group']]
+                except KeyError:
+                    raise ValueError(f'Нет группы {record["group"]}')
+            posts.append(Post(
+                pk=record['id'], text=record['text'],
+                pub_date=datetime.fromisoformat(record['pub_date']),
+                author_id=users[record['author']], group_id=group_id,
+                image=record['image'],
+                comments_count=record.get('comments_count', 0),
+            ))
+            self.touched_authors.add(users[record['author']])
+            if group_id:
+                self.touched_groups.add(group_id)
+        with _keep_dates(Post, 'pub_date'):
+            Post.objects.bulk_create(posts, batch_size=BATCH_SIZE)
+        return len(posts)
+
+    def load_comments(self, records):
+        records = self._fresh(Comment, records)
+        users = self.user_ids(record['author'] for record in records)
+        comments = []
+        for record in records:
+            comments.append(Comment(
+                pk=record['id'], post_id=record['post'],
+                author_id=users[record['author']], text=record['text'],
+                created=datetime.fromisoformat(record['created']),
+            ))
+            if record['post'] <= self.old_posts:
+                self.commented_posts.add(record['post'])
+        with _keep_dates(Comment, 'created'):
+            Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        return len(comments)
+
+    def load_follows(self, records):
+        users = self.user_ids(
+            name for record in records
+            for name in (record['user'], record['author'])
+        )
+        follows = [
+            Follow(user_id=users[record['user']],
+                   author_id=users[record['author']])
+            for record in records
+        ]
+        Follow.objects.bulk_create(
+            follows, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        for follow in follows:
+            self.touched_followers.add(follow.user_id)
+            self.touched_authors.add(follow.author_id)
+        return len(follows)
+
+    def finish(self):
+        """Приводит в порядок то, что обычно делают сигналы.
+
+        Возвращает число пересобранных лент подписок.
+        """
+        counters.reconcile_groups()
+        counters.reconcile_posts()
+        counters.reconcile_users()
+        blobs.reconcile_refs()
+        feeds.mark_celebrities()
+        followers = set(self.touched_followers)
+        authors = list(self.touched_authors)
+        for start in range(0, len(authors), BATCH_SIZE):
+            followers.update(Follow.objects.filter(
+                author_id__in=authors[start:start + BATCH_SIZE]
+            ).values_list('user_id', flat=True).iterator())
+        readers = sorted(followers)
+        for start in range(0, len(readers), BATCH_SIZE):
+            with transaction.atomic():
+                feeds.rebuild_timelines(readers[start:start + BATCH_SIZE])
+        names = {fragments.INDEX, fragments.HOT}
+        names.update(fragments.group_key(pk) for pk in self.touched_groups)
+        names.update(fragments.profile_key(pk) for pk in authors)
+        names.update(fragments.profile_key(pk) for pk in followers)
+        names.update(fragments.follow_key(pk) for pk in followers)
+        names.update(fragments.post_key(pk) for pk in self.commented_posts)
+        names = sorted(names)
+        for start in range(0, len(names), BATCH_SIZE):
+            fragments.invalidate(names[start:start + BATCH_SIZE])
+        lookups.forget_groups(Group.objects.filter(
+            pk__in=self.touched_groups
+        ).values_list('slug', flat=True))
+        return len(followers)
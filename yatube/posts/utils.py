@@ -1,7 +1,245 @@
+import base64
+import json
+import math
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property, lazy
+
+CURSOR_PARAM = 'cursor'
+FEED_ORDERING = ('-pub_date', '-pk')
+# Целые, которые SQLite примет как INTEGER.
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
 
+def get_page(request, item, limit, ordering=FEED_ORDERING, count=None):
+    """Возвращает страницу ленты.
 
-def get_page(request, item, limit):
+    Если в запросе есть параметр ``cursor``, используется курсорная
+    пагинация, иначе — обычная постраничная со старыми номерами страниц.
+    Известное заранее число объектов ``count`` избавляет постраничный
+    режим от запроса ``COUNT(*)``. Сами объекты страницы читаются только
+    при обращении к ним, поэтому закешированный фрагмент шаблона
+    обходится без запроса страницы.
+    """
+    if CURSOR_PARAM in request.GET:
+        paginator = CursorPaginator(item, limit, ordering)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
     paginator = Paginator(item, limit)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    page = paginator.get_page(page_number)
+    if page.has_next():
+        # Переход «дальше» со старой страницы уже идет по курсору.
+        page.next_cursor = lazy(
+            lambda: CursorPaginator(
+                item, limit, ordering
+            ).encode_cursor(page[len(page) - 1]),
+            str
+        )()
+    return page
+
+
+class InvalidCursor(Exception):
+    """Курсор поврежден или не подходит к выборке."""
+
+
+def _field_value(obj, name):
+    if isinstance(obj, dict):
+        if name == 'pk' and name not in obj:
+            name = 'id'
+        return obj[name]
+    return getattr(obj, name)
+
+
+class CursorPage:
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс ``django.core.paginator.Page`` в той части,
+    которая нужна шаблонам, но вместо номеров страниц отдает курсоры.
+    Запрос выполняется при первом обращении к объектам или курсорам.
+    """
+
+    is_cursor = True
+
+    def __init__(self, queryset, paginator, backwards=False,
+                 has_cursor=False):
+        self.queryset = queryset
+        self.paginator = paginator
+        self.backwards = backwards
+        self.has_cursor = has_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    @cached_property
+    def _window(self):
+        per_page = self.paginator.per_page
+        rows = list(self.queryset[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if self.backwards:
+            rows.reverse()
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or self.backwards:
+                next_cursor = self.paginator.encode_cursor(rows[-1])
+            if self.has_cursor and (has_more or not self.backwards):
+                previous_cursor = self.paginator.encode_cursor(
+                    rows[0], backwards=True
+                )
+        return rows, next_cursor, previous_cursor
+
+    @property
+    def object_list(self):
+        return self._window[0]
+
+    @property
+    def next_cursor(self):
+        return self._window[1]
+
+    @property
+    def previous_cursor(self):
+        return self._window[2]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу (keyset) вместо LIMIT/OFFSET.
+
+    Страница выбирается условием «строго после курсора» по полям
+    ``ordering``, поэтому стоимость запроса не зависит от глубины
+    и не нужен ``COUNT(*)``. Все поля сортируются в одну сторону,
+    последнее поле должно быть уникальным (обычно ``pk``).
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+        self.descending = self.ordering[0].startswith('-')
+
+    def encode_cursor(self, obj, backwards=False):
+        """Упаковывает ключ объекта в непрозрачную строку."""
+        values = []
+        for name in self.fields:
+            value = _field_value(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        payload = json.dumps([int(backwards), values], separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление назад, значения ключа) из курсора."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            backwards, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode())
+            )
+        except (TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        try:
+            values = [
+                self._coerce(name, value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError, FieldDoesNotExist):
+            raise InvalidCursor(cursor)
+        return bool(backwards), values
+
+    def _key_field(self, name):
+        """Поле модели или аннотации, по которому идет сортировка."""
+        # У слитой ленты подписок выборок несколько, поля у них общие.
+        queryset = getattr(self.object_list, 'querysets', None)
+        queryset = self.object_list if queryset is None else queryset[0]
+        query = getattr(queryset, 'query', None)
+        if query is None:
+            return None
+        if name in query.annotations:
+            return query.annotations[name].output_field
+        meta = query.get_meta()
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+    def _coerce(self, name, value):
+        """Значение курсора в типе поля; недопустимое — ``ValueError``.
+
+        Проверка идет сразу: запрос страницы ленивый, и ошибка базы
+        на чужом значении случилась бы уже при выводе шаблона.
+        """
+        field = self._key_field(name)
+        if field is not None:
+            value = field.to_python(value)
+        if isinstance(value, bool):
+            raise ValueError(value)
+        if isinstance(value, int) and value not in INTEGER_RANGE:
+            raise ValueError(value)
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError(value)
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            raise ValueError(value)
+        return value
+
+    def _seek(self, values, backwards):
+        """Условие «строго после ключа» в направлении обхода."""
+        after_lookup = 'lt' if self.descending != backwards else 'gt'
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            step = Q(**{f'{name}__{after_lookup}': values[index]})
+            for prev_name, prev_value in zip(self.fields, values[:index]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def _order(self, backwards):
+        if not backwards:
+            return self.ordering
+        return tuple(
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        )
+
+    def page(self, cursor=None):
+        """Возвращает страницу, начинающуюся сразу после курсора."""
+        backwards, values = False, None
+        if cursor:
+            backwards, values = self.decode_cursor(cursor)
+        queryset = self.object_list.order_by(*self._order(backwards))
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._seek(values, backwards))
+            except (TypeError, ValueError, ValidationError):
+                raise InvalidCursor(cursor)
+        return CursorPage(queryset, self, backwards, values is not None)
+
+    def get_page(self, cursor=None):
+        """Как ``page``, но битый курсор ведет на первую страницу."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
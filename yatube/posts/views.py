@@ -1,47 +1,80 @@
-from django.contrib.auth import get_user
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
 
+from core.cache import depend_on
+from core.conditional import conditional_page
+from posts import fragments, freshness
+from posts.counters import for_user
+from posts.feeds import (
+    FOLLOW_FEED_ORDERING, follow_feed, followed_celebrities
+)
 from posts.forms import PostForm, CommentForm
-from posts.models import Group, Post, User, Follow
-from posts.utils import get_page
+from posts.hot import HOT_ORDERING, hot_posts
+from posts.lookups import get_group_or_404, get_user_or_404
+from posts.models import Comment, Post, Follow
+from posts.related import related_posts
+from posts.search import SEARCH_ORDERING, search as search_posts
+from posts.utils import CURSOR_PARAM, CursorPaginator, get_page
 
 LIMIT = 10
+COMMENTS_LIMIT = 20
+COMMENT_ORDERING = ('-created', '-pk')
+
+
+def _comments_page(request, post_id):
+    """Страница комментариев поста вместе с их авторами."""
+    comments = Comment.objects.filter(
+        post_id=post_id
+    ).select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_LIMIT, COMMENT_ORDERING)
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
 
 
+@conditional_page(freshness.index)
 def index(request):
     """Метод отображения главной страницы сайта."""
     template = 'posts/index.html'
-    posts = Post.objects.all()
+    posts = Post.objects.select_related('author')
     page_obj = get_page(request, posts, LIMIT)
     context = {
         'page_obj': page_obj,
-        'posts': posts
+        'posts': posts,
+        'fragment_key': fragments.fragment_key(request, [fragments.INDEX]),
     }
     return render(request, template, context)
 
 
+@conditional_page(freshness.group_posts)
 def group_posts(request, slug):
     """Метод отображения страницы с постами группы."""
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
+    group = get_group_or_404(slug)
     posts = group.posts.select_related('author')
-    page_obj = get_page(request, posts, LIMIT)
+    # Без функции свежести (не GET) число посчитает Paginator.
+    count = getattr(request, 'group_posts_count', None)
+    page_obj = get_page(request, posts, LIMIT, count=count)
     context = {
         'group': group,
         'posts': posts,
         'page_obj': page_obj,
+        'fragment_key': fragments.fragment_key(
+            request, [fragments.group_key(group.pk)]
+        ),
     }
     return render(request, template, context)
 
 
+@conditional_page(freshness.profile)
 def profile(request, username):
     """Метод отображения страницы профиля пользователя."""
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
-    posts = user.posts.all()
-    page_obj = get_page(request, posts, LIMIT)
-    count_posts = posts.count()
+    user = get_user_or_404(username)
+    posts = user.posts.select_related('author', 'group')
+    counters = for_user(user)
+    page_obj = get_page(request, posts, LIMIT, count=counters.posts_count)
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -51,40 +84,66 @@ def profile(request, username):
         'username': user,
         'posts': posts,
         'page_obj': page_obj,
-        'count_posts': count_posts,
-        'following': following
+        'count_posts': counters.posts_count,
+        'counters': counters,
+        'following': following,
+        'fragment_key': fragments.fragment_key(
+            request, [fragments.profile_key(user.pk)]
+        ),
     }
     return render(request, template, context)
 
 
+@conditional_page(freshness.post_detail)
 def post_detail(request, post_id):
     """Метод отображения страницы с описанием поста."""
     post = get_object_or_404(
-        Post.objects.select_related('group', 'author'),
+        Post.objects.select_related('group', 'author', 'author__counters'),
         pk=post_id
     )
     comment_form = CommentForm()
+    # Страница показывает группу и число постов автора.
+    dependencies = [fragments.profile_key(post.author_id)]
+    if post.group_id:
+        dependencies.append(fragments.group_key(post.group_id))
+    depend_on(request, dependencies)
     context = {
         'post': post,
-        'comments': post.comments.all(),
-        'comment_form': comment_form
+        'comments': _comments_page(request, post.pk),
+        'comment_form': comment_form,
+        'related_posts': related_posts(post.pk),
+        'fragment_key': fragments.fragment_key(
+            request, [fragments.post_key(post.pk)]
+        ),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional_page(freshness.post_comments)
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев поста."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404('No Post matches the given query.')
+    depend_on(request, [fragments.post_key(post_id)])
+    context = {
+        'post_id': post_id,
+        'comments': _comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     """Создание новой записи."""
     template = 'posts/create_post.html'
-    user = get_user(request)
-    form = PostForm(request.POST or None)
+    user = request.user
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST':
         if form.is_valid():
             post = form.save(commit=False)
             post.author = user
             post.save()
             return redirect('posts:profile', user.username)
-    form = PostForm()
     return render(request, template, {'form': form})
 
 
@@ -107,7 +166,7 @@ def post_edit(request, post_id):
         if form.is_valid():
             form.save()
             return redirect('posts:post_detail', post_id)
-    if post.author == request.user:
+    if post.author_id == request.user.pk:
         return render(request, template, context)
     else:
         return redirect('posts:post_detail', post_id)
@@ -124,27 +183,62 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
-        return redirect('posts:post_detail', post_id=post_id)
+    return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@conditional_page(freshness.follow_index)
 def follow_index(request):
     """Страница подписок."""
     user = request.user
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page(request, posts, LIMIT)
+    celebrities = getattr(request, 'followed_celebrities', None)
+    if celebrities is None:
+        celebrities = followed_celebrities(user)
+    posts = follow_feed(user, celebrities)
+    page_obj = get_page(request, posts, LIMIT, FOLLOW_FEED_ORDERING)
+    feeds = [fragments.follow_key(user.pk)]
+    feeds.extend(fragments.profile_key(author) for author in celebrities)
     context = {
         'user': user,
         'page_obj': page_obj,
-        'posts': posts
+        'posts': posts,
+        'fragment_key': fragments.fragment_key(request, feeds),
     }
     return render(request, 'posts/follow.html', context)
 
 
+@conditional_page(freshness.hot)
+def hot(request):
+    """Лента обсуждаемого: рейтинг заранее посчитан командой."""
+    posts = hot_posts().select_related('author', 'group')
+    paginator = CursorPaginator(posts, LIMIT, HOT_ORDERING)
+    context = {
+        'page_obj': paginator.get_page(request.GET.get(CURSOR_PARAM)),
+    }
+    return render(request, 'posts/hot.html', context)
+
+
+@conditional_page(freshness.search)
+def search(request):
+    """Поиск постов по тексту, лучшие совпадения первыми."""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        posts = search_posts(query).select_related('author', 'group')
+        paginator = CursorPaginator(posts, LIMIT, SEARCH_ORDERING)
+        page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     """Подписаться на автора."""
-    author = get_object_or_404(User, username=username)
+    author = get_user_or_404(username)
     user = request.user
     is_exist = Follow.objects.filter(user=user, author=author).exists()
     if author != user and not is_exist:
@@ -155,6 +249,6 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     """Отписаться от автора."""
-    author = get_object_or_404(User, username=username)
+    author = get_user_or_404(username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username)
@@ -44,6 +44,28 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# LocMemCache у каждого воркера свой, поэтому на сервере с несколькими
+# процессами кеш включается общим файлом в памяти: путь к нему задает
+# переменная окружения YATUBE_SHARED_CACHE (например, /dev/shm/yatube).
+if os.environ.get('YATUBE_SHARED_CACHE'):
+    CACHES['default'] = {
+        'BACKEND': 'core.mmap_cache.MmapCache',
+        'LOCATION': os.environ['YATUBE_SHARED_CACHE'],
+        'OPTIONS': {
+            'SIZE': 64 * 1024 * 1024,
+        },
+    }
+# Копии страниц для анонимов сбрасываются сигналами моделей, срок
+# хранения нужен только для вытеснения давно не запрошенных страниц.
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Поиск групп и пользователей: локальный LRU процесса перед общим кешем.
+# Срок жизни локальной копии ограничивает, насколько другие процессы
+# могут отставать от изменений.
+LOOKUP_CACHE_L1_SIZE = 1024
+LOOKUP_CACHE_L1_TTL = 10
+LOOKUP_CACHE_TIMEOUT = 60 * 60
+# Как часто процесс переносит накопленные счетчики метрик в общий кеш.
+METRICS_FLUSH_INTERVAL = 10
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -59,11 +81,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.FileServingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Снаружи кеша страниц: на копию из кеша тоже можно ответить 304.
+    'django.middleware.http.ConditionalGetMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -119,9 +146,80 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Сколько запросов к базе может сделать один запрос к странице, включая
+# сессию и пользователя. Бюджет не должен зависеть от числа постов на
+# странице; превышение пишется в лог yatube.queries.
+QUERY_BUDGETS = {
+    'posts:index': 5,
+    'posts:group_posts': 5,
+    'posts:profile': 7,
+    'posts:post_detail': 6,
+    'posts:post_comments': 5,
+    'posts:post_create': 12,
+    'posts:post_edit': 10,
+    'posts:add_comment': 6,
+    'posts:follow_index': 7,
+    'posts:search': 6,
+    'posts:hot': 4,
+    'posts:profile_follow': 12,
+    'posts:profile_unfollow': 10,
+    'posts:api_index': 4,
+    'posts:api_group_posts': 4,
+    'posts:api_profile': 4,
+    'posts:api_follow_index': 6,
+}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_RAISE = False
+
+# Авторы, у которых подписчиков больше этого числа, не раскладывают
+# посты по лентам подписчиков: их посты подмешиваются при чтении.
+FEED_CELEBRITY_FOLLOWERS = 1000
+
+# Сколько похожих постов показывать на странице поста.
+RELATED_POSTS_LIMIT = 5
+
+# Лента обсуждаемого: вклад поста и его комментариев затухает вдвое
+# за HOT_FEED_HALF_LIFE секунд, комментарий весит как столько постов.
+HOT_FEED_HALF_LIFE = 6 * 60 * 60
+HOT_FEED_COMMENT_WEIGHT = 2
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки любого размера пишутся во временный файл кусками и не
+# держатся в памяти; файл больше FILE_UPLOAD_MAX_SIZE форма отвергает,
+# не декодируя.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+# Картинка поста проверяется по заголовку и хранится уменьшенной до
+# IMAGE_MAX_SIDE по большей стороне, без метаданных. 1920 — вдвое шире
+# карточки поста и не больше половины 12-мегапиксельного снимка, так что
+# такие снимки JPEG-декодер сразу читает в масштабе 1/2.
+IMAGE_MAX_PIXELS = 50 * 10 ** 6
+IMAGE_MAX_SIDE = 1920
+IMAGE_JPEG_QUALITY = 85
+
+# Размеры миниатюр, которые шаблоны запрашивают у тега thumbnail. Они
+# нарезаются заранее при сохранении поста; параметры должны совпадать
+# с шаблонами, иначе sorl посчитает миниатюру другой.
+THUMBNAIL_GEOMETRIES = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+# Адаптивные наборы: геометрия нарезается всеми ширинами с теми же
+# пропорциями в каждом формате, который умеет Pillow. Последний формат —
+# запасной для <img>; sizes описывает ширину картинки в верстке.
+THUMBNAIL_SRCSET = {
+    '960x339': {
+        'widths': (480, 960, 1440),
+        'formats': ('WEBP', 'JPEG'),
+        'sizes': '(min-width: 992px) 960px, 100vw',
+    },
+}
+# Процессы пула нарезки; 0 — резать сразу в процессе, сохранившем пост.
+THUMBNAIL_WORKERS = 2
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
 
@@ -141,4 +239,12 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# Имена с отпечатком содержимого и сжатые .gz/.br копии текстовых файлов.
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+# Статику и медиа раздает само приложение (core.files); выключить, если
+# перед ним стоит файловый сервер.
+SERVE_FILES = True
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+MEDIA_MAX_AGE = 30 * 24 * 60 * 60
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'